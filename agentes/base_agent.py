@@ -1,9 +1,16 @@
 import google.generativeai as genai
 from datetime import datetime
 from typing import Dict, Any, Optional, List
+import asyncio
 import json
 import logging
-from config import GOOGLE_API_KEY
+from config import GOOGLE_API_KEY, LLM_SCHEDULER_CONFIG, ESCRITOR_LOTES_CONFIG
+from models import LogAgente, TipoAgente
+from servicios.escritor_lotes import get_escritor
+from agentes.llm_cache import LLMCache, get_llm_cache
+from agentes.single_flight import SingleFlight
+from agentes.message_history import MessageHistory
+from agentes.llm_scheduler import LLMScheduler, get_llm_scheduler
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -12,33 +19,66 @@ logger = logging.getLogger(__name__)
 # Configurar Google AI
 genai.configure(api_key=GOOGLE_API_KEY)
 
+# Tipo de agente en logs_agentes según el nombre registrado en el bus
+TIPOS_AGENTE = {
+    "Planificador": TipoAgente.PLANIFICADOR,
+    "Ejecutor": TipoAgente.EJECUTOR,
+    "Notificador": TipoAgente.NOTIFICADOR,
+    "Interfaz": TipoAgente.INTERFAZ,
+    "KnowledgeBase": TipoAgente.KNOWLEDGE_BASE,
+    "Monitor": TipoAgente.MONITOR
+}
+
 class BaseAgent:
     """
     Clase base para todos los agentes del sistema multiagente
     """
     
-    def __init__(self, name: str, model_name: str, role: str):
+    # Compartido entre agentes: prompts idénticos en vuelo comparten una sola llamada
+    single_flight = SingleFlight()
+    
+    def __init__(self, name: str, model_name: str, role: str, cache_ttl: int = 0, priority: int = 1):
         self.name = name
         self.model_name = model_name
         self.role = role
+        self.cache_ttl = cache_ttl
+        self.priority = priority
         self.model = genai.GenerativeModel(model_name)
-        self.message_history = []
+        self.message_history = MessageHistory.for_agent(name)
+        self.log_writer = get_escritor("logs_agentes", LogAgente.__table__)
         logger.info(f"✅ Agente {self.name} iniciado con modelo {self.model_name}")
     
-    def log_message(self, protocol: str, message_type: str, content: Dict[str, Any]):
+    def log_message(self, protocol: str, message_type: str, content: Dict[str, Any], peer: Optional[str] = None):
         """
-        Registrar mensaje en el historial del agente
+        Registrar mensaje en el historial del agente y encolarlo para logs_agentes
         """
-        log_entry = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "protocol": protocol,
-            "message_type": message_type,
-            "content": content
-        }
-        self.message_history.append(log_entry)
-        logger.info(f"[{self.name}] {protocol} - {message_type}: {json.dumps(content)[:100]}")
+        serialized = json.dumps(content, default=str)
+        self.message_history.append(protocol, message_type, content, serialized=serialized)
+        logger.info(f"[{self.name}] {protocol} - {message_type}: {serialized[:100]}")
+        self._persist_log(protocol, message_type, serialized, peer)
+    
+    def _persist_log(self, protocol: str, message_type: str, serialized: str, peer: Optional[str]):
+        """
+        Encolar el mensaje para el escritor por lotes (nunca escribe en la petición)
+        """
+        tipo_agente = TIPOS_AGENTE.get(self.name)
+        if tipo_agente is None:
+            return
+        serialized = serialized[:ESCRITOR_LOTES_CONFIG["logs_agentes"]["max_caracteres_mensaje"]]
+        received = message_type.startswith("RECEIVE-")
+        self.log_writer.encolar({
+            "tipo_agente": tipo_agente,
+            "accion": message_type[:100],
+            "protocolo_usado": protocol[:50] if protocol else None,
+            "mensaje_enviado": None if received else serialized,
+            "mensaje_recibido": serialized if received else None,
+            "datos_extra": json.dumps({"peer": peer}, separators=(",", ":")) if peer else None,
+            "exito": True,
+            "error": None,
+            "timestamp": datetime.utcnow()
+        })
     
-    def send_message(self, to_agent: str, protocol: str, message_type: str, content: Dict[str, Any]) -> Dict[str, Any]:
+    async def send_message(self, to_agent: str, protocol: str, message_type: str, content: Dict[str, Any]) -> Dict[str, Any]:
         """
         Enviar mensaje a otro agente usando un protocolo específico
         """
@@ -50,66 +90,141 @@ class BaseAgent:
             "content": content,
             "timestamp": datetime.utcnow().isoformat()
         }
-        self.log_message(protocol, f"SEND-{message_type}", content)
+        self.log_message(protocol, f"SEND-{message_type}", content, peer=to_agent)
         try:
             # Delivery via message bus to ensure inter-agent collaboration
             from agentes import message_bus
-            response = message_bus.deliver(message)
+            response = await message_bus.deliver(message)
             return response
         except Exception:
             # Fallback: return the message if bus not available
             return message
     
-    def receive_message(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def post_message(self, to_agent: str, protocol: str, message_type: str, content: Dict[str, Any]) -> bool:
+        """
+        Enviar mensaje sin esperar respuesta (fire-and-forget)
+        Devuelve False si el buzón del destinatario está lleno y el mensaje se descartó
+        """
+        message = {
+            "from": self.name,
+            "to": to_agent,
+            "protocol": protocol,
+            "type": message_type,
+            "content": content,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        self.log_message(protocol, f"POST-{message_type}", content, peer=to_agent)
+        from agentes import message_bus
+        return message_bus.post(message)
+    
+    async def receive_message(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         Recibir y procesar mensaje de otro agente
         """
-        self.log_message(message["protocol"], f"RECEIVE-{message['type']}", message["content"])
-        return self.process_message(message)
+        self.log_message(message["protocol"], f"RECEIVE-{message['type']}", message["content"], peer=message.get("from"))
+        return await self.process_message(message)
     
-    def process_message(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    async def process_message(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         Procesar mensaje recibido (debe ser implementado por cada agente específico)
         """
         raise NotImplementedError("Cada agente debe implementar process_message")
     
-    def generate_with_ai(self, prompt: str, temperature: float = 0.7) -> str:
+    async def agenerate_with_ai(self, prompt: str, temperature: float = 0.7) -> str:
         """
-        Generar respuesta usando el modelo Gemini asignado
+        Generar respuesta usando el cliente asíncrono de Gemini
+        No bloquea el event loop mientras se espera la respuesta del modelo
         """
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=temperature,
+        cache = get_llm_cache() if self.cache_ttl > 0 else None
+        cache_key = LLMCache.make_key(self.model_name, prompt, temperature)
+        if cache:
+            cached = await cache.aget(cache_key)
+            if cached is not None:
+                return cached
+        
+        # Llamadas concurrentes con la misma clave esperan la misma respuesta
+        return await self.single_flight.do(
+            cache_key,
+            lambda: self._agenerate_uncached(prompt, temperature, cache, cache_key)
+        )
+    
+    async def _agenerate_uncached(self, prompt: str, temperature: float,
+                                  cache: Optional[LLMCache], cache_key: str) -> str:
+        """
+        Llamar a Gemini a través del planificador central y guardar la respuesta en caché
+        Ante un 429 se frena el modelo y se reencola la petición
+        """
+        scheduler = get_llm_scheduler()
+        estimated_tokens = LLMScheduler.estimate_tokens(prompt)
+        retries = LLM_SCHEDULER_CONFIG["max_reintentos_429"]
+        attempt = 0
+        while True:
+            try:
+                response = await scheduler.run(
+                    self.model_name,
+                    self.priority,
+                    estimated_tokens,
+                    lambda: self.model.generate_content_async(
+                        prompt,
+                        generation_config=genai.types.GenerationConfig(
+                            temperature=temperature,
+                        )
+                    )
                 )
-            )
-            # Limpiar formato markdown de la respuesta
-            text = response.text.strip()
-            
-            # Remover bloques de código markdown si existen
-            if text.startswith("```json"):
-                text = text[7:]  # Remover ```json
-            elif text.startswith("```"):
-                text = text[3:]  # Remover ```
-            
-            if text.endswith("```"):
-                text = text[:-3]  # Remover ```
-            
-            return text.strip()
-        except Exception as e:
-            logger.error(f"Error al generar con IA: {str(e)}")
-            return "{}"
+                text = self._clean_response(response.text)
+                break
+            except asyncio.TimeoutError:
+                logger.error(f"[{self.name}] Sin cuota disponible para {self.model_name} tras esperar en cola")
+                return "{}"
+            except Exception as e:
+                if self._is_rate_limited(e):
+                    scheduler.report_throttled(self.model_name)
+                    if attempt < retries:
+                        attempt += 1
+                        logger.warning(f"[{self.name}] 429 de {self.model_name}; reintento {attempt}/{retries}")
+                        continue
+                logger.error(f"Error al generar con IA: {str(e)}")
+                return "{}"
+        
+        # Los errores no se cachean: solo respuestas obtenidas del modelo
+        if cache:
+            await cache.aset(cache_key, text, self.cache_ttl)
+        return text
+    
+    @staticmethod
+    def _is_rate_limited(error: Exception) -> bool:
+        """
+        Detectar errores de cuota (HTTP 429 / ResourceExhausted) del proveedor
+        """
+        return type(error).__name__ == "ResourceExhausted" or "429" in str(error)
+    
+    @staticmethod
+    def _clean_response(raw_text: str) -> str:
+        """
+        Limpiar formato markdown de la respuesta del modelo
+        """
+        text = raw_text.strip()
+        
+        # Remover bloques de código markdown si existen
+        if text.startswith("```json"):
+            text = text[7:]  # Remover ```json
+        elif text.startswith("```"):
+            text = text[3:]  # Remover ```
+        
+        if text.endswith("```"):
+            text = text[:-3]  # Remover ```
+        
+        return text.strip()
     
     def get_history(self) -> List[Dict[str, Any]]:
         """
         Obtener historial de mensajes del agente
         """
-        return self.message_history
+        return self.message_history.to_list()
     
     def clear_history(self):
         """
         Limpiar historial de mensajes
         """
-        self.message_history = []
+        self.message_history.clear()
         logger.info(f"🗑️ Historial de {self.name} limpiado")
@@ -1,10 +1,18 @@
 from agentes.base_agent import BaseAgent
 from typing import Dict, Any, List
-from config import GEMINI_MODELS
-from sqlalchemy.orm import Session
-from models import Transaccion, Presupuesto, Usuario, TipoTransaccion
+from config import GEMINI_MODELS, LLM_CACHE_CONFIG, LLM_SCHEDULER_CONFIG
+from database import SessionLocal
+from servicios import analitica
+from servicios.consultas import ingreso_mensual_usuario
 from datetime import datetime, timedelta
+import asyncio
 import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cálculos por usuario que se resuelven con el motor de analítica local
+CALCULOS_USUARIO = ("balance", "metricas", "gastos_por_categoria", "serie_mensual")
 
 class EjecutorAgent(BaseAgent):
     """
@@ -16,10 +24,12 @@ class EjecutorAgent(BaseAgent):
         super().__init__(
             name="Ejecutor",
             model_name=GEMINI_MODELS["ejecutor"],
-            role="Ejecutar cálculos y operaciones financieras"
+            role="Ejecutar cálculos y operaciones financieras",
+            cache_ttl=LLM_CACHE_CONFIG["ttl_por_agente"]["ejecutor"],
+            priority=LLM_SCHEDULER_CONFIG["prioridades"]["ejecutor"]
         )
     
-    def process_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+    async def process_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """
         Procesar mensajes recibidos
         """
@@ -27,13 +37,13 @@ class EjecutorAgent(BaseAgent):
         content = message.get("content")
         
         if msg_type == "EXECUTE_TASK":
-            return self.execute_financial_task(content)
+            return await self.execute_financial_task(content)
         elif msg_type == "CALCULATE":
-            return self.perform_calculation(content)
+            return await self.perform_calculation(content)
         else:
             return {"status": "unknown_message_type", "type": msg_type}
     
-    def execute_financial_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+    async def execute_financial_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """
         Ejecutar tarea financiera específica
         """
@@ -53,38 +63,62 @@ class EjecutorAgent(BaseAgent):
                 task["presupuestos_reales"] = context.get("presupuestos_reales")
             if "tiene_datos" in context:
                 task["tiene_datos"] = context.get("tiene_datos")
+            if "periodo_dias" in context:
+                task.setdefault("periodo_dias", context.get("periodo_dias"))
 
         task_type = task.get("tipo") if isinstance(task, dict) else None
         
         if task_type == "calcular_balance":
-            return self.calculate_balance(task)
+            return await self.calculate_balance(task)
         elif task_type == "verificar_presupuestos":
-            return self.verify_budgets(task)
+            return await self.verify_budgets(task)
         elif task_type == "analizar_gastos":
-            return self.analyze_expenses(task)
+            return await self.analyze_expenses(task)
         elif task_type in ["obtener_ingresos", "obtener_gastos", "calcular_total_ingresos", 
                             "calcular_total_gastos", "calcular_balance_final", "comparar_gastos_presupuesto",
                             "calcular_ratio_endeudamiento", "calcular_ingresos_netos", "calcular_porcentaje_ahorro"]:
             # Mapear tareas genéricas a métodos específicos
             if "balance" in task_type or "ingresos" in task_type or "gastos" in task_type:
-                return self.calculate_balance(task)
+                return await self.calculate_balance(task)
             elif "presupuesto" in task_type:
-                return self.verify_budgets(task)
+                return await self.verify_budgets(task)
             else:
-                return self.analyze_expenses(task)
+                return await self.analyze_expenses(task)
         else:
             return {"status": "unknown_task_type", "task_type": task_type}
     
-    def calculate_balance(self, task: Dict[str, Any]) -> Dict[str, Any]:
+    async def calculate_balance(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """
         Calcular balance financiero del usuario con datos reales
         Usa ACP para comunicación estructurada
         """
         usuario_id = task.get("usuario_id")
         periodo_dias = task.get("periodo_dias", 30)
-        datos_reales = task.get("datos_reales", {})
+        datos_reales = task.get("datos_reales")
         tiene_datos = task.get("tiene_datos", False)
         
+        # Métricas exactas calculadas localmente (NumPy): son la fuente de verdad del resultado
+        metricas = None
+        if usuario_id is not None:
+            try:
+                metricas = await asyncio.to_thread(self._metricas_usuario, usuario_id, periodo_dias)
+            except Exception as e:
+                logger.error(f"Error calculando métricas locales: {e}")
+        if metricas is not None:
+            datos_reales = metricas
+            tiene_datos = metricas["total_transacciones"] > 0
+        # Sin métricas locales ni datos en el plan: consultarlos a Knowledge Base (protocolo ACP)
+        elif not datos_reales and usuario_id is not None:
+            respuesta = await self.send_message(
+                to_agent="KnowledgeBase",
+                protocol="ACP",
+                message_type="QUERY_TRANSACTIONS",
+                content={"usuario_id": usuario_id, "periodo_dias": periodo_dias, "solo_resumen": True}
+            )
+            datos_reales = self._datos_query_result(respuesta).get("resumen") or {}
+            tiene_datos = datos_reales.get("total_transacciones", 0) > 0
+        datos_reales = datos_reales or {}
+        
         if not tiene_datos:
             return {
                 "status": "balance_calculated",
@@ -98,26 +132,13 @@ class EjecutorAgent(BaseAgent):
                 "protocol_used": "ACP"
             }
         
-        # Enviar mensaje a Knowledge Base (protocolo ACP)
-        # Enviar mensaje a Knowledge Base (protocolo ACP) y adjuntar contexto de datos reales
-        self.send_message(
-            to_agent="KnowledgeBase",
-            protocol="ACP",
-            message_type="QUERY_TRANSACTIONS",
-            content={
-                "usuario_id": usuario_id,
-                "periodo_dias": periodo_dias,
-                "context": {"datos_reales": datos_reales, "tiene_datos": tiene_datos}
-            }
-        )
-        
         # Preparar datos para análisis de IA
         datos_json = json.dumps(datos_reales, indent=2)
         
         prompt = f"""
         Analiza el balance financiero REAL del usuario {usuario_id} en los últimos {periodo_dias} días:
 
-        DATOS REALES:
+        DATOS REALES (ya calculados y exactos; no los recalcules ni cambies ninguna cifra):
         {datos_json}
 
         Proporciona un análisis detallado que incluya:
@@ -139,7 +160,7 @@ class EjecutorAgent(BaseAgent):
         }}
         """
         
-        response = self.generate_with_ai(prompt, temperature=0.3)
+        response = await self.agenerate_with_ai(prompt, temperature=0.3)
         
         try:
             analisis_ia = json.loads(response)
@@ -158,6 +179,8 @@ class EjecutorAgent(BaseAgent):
             "balance": datos_reales.get("balance", 0.0),
             "total_transacciones": datos_reales.get("total_transacciones", 0),
             "gastos_por_categoria": datos_reales.get("gastos_por_categoria", {}),
+            "serie_mensual": datos_reales.get("serie_mensual", []),
+            "tasa_ahorro": datos_reales.get("tasa_ahorro"),
             "analisis_ia": analisis_ia
         }
         
@@ -167,14 +190,26 @@ class EjecutorAgent(BaseAgent):
             "protocol_used": "ACP"
         }
     
-    def verify_budgets(self, task: Dict[str, Any]) -> Dict[str, Any]:
+    async def verify_budgets(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """
         Verificar estado de presupuestos usando datos reales de la base de datos
         """
         usuario_id = task.get("usuario_id")
-        presupuestos_reales = task.get("presupuestos_reales", [])
+        presupuestos_reales = task.get("presupuestos_reales")
         tiene_datos = task.get("tiene_datos", False)
         
+        # Sin presupuestos en el plan: consultarlos a Knowledge Base (protocolo ACP)
+        if presupuestos_reales is None and usuario_id is not None:
+            respuesta = await self.send_message(
+                to_agent="KnowledgeBase",
+                protocol="ACP",
+                message_type="QUERY_BUDGETS",
+                content={"usuario_id": usuario_id, "mes": task.get("mes"), "anio": task.get("anio")}
+            )
+            presupuestos_reales = self._datos_query_result(respuesta).get("results") or []
+            tiene_datos = len(presupuestos_reales) > 0
+        presupuestos_reales = presupuestos_reales or []
+        
         if not tiene_datos or len(presupuestos_reales) == 0:
             return {
                 "status": "budgets_verified",
@@ -189,26 +224,8 @@ class EjecutorAgent(BaseAgent):
                 "protocol_used": "ACP"
             }
         
-        # Calcular estado de cada presupuesto
-        presupuestos_analizados = []
-        for p in presupuestos_reales:
-            porcentaje = p.get("porcentaje", 0)
-            
-            # Determinar estado
-            if porcentaje <= 75:
-                estado = "dentro"
-            elif porcentaje <= 100:
-                estado = "cerca"
-            else:
-                estado = "excedido"
-            
-            presupuestos_analizados.append({
-                "categoria": p.get("categoria"),
-                "limite": p.get("limite"),
-                "gastado": p.get("gastado"),
-                "porcentaje": porcentaje,
-                "estado": estado
-            })
+        # Porcentaje de uso y estado de cada presupuesto (vectorizado)
+        presupuestos_analizados = analitica.utilizacion_presupuestos(presupuestos_reales)
         
         # Preparar datos para análisis de IA
         datos_json = json.dumps(presupuestos_analizados, indent=2)
@@ -237,7 +254,7 @@ class EjecutorAgent(BaseAgent):
         }}
         """
         
-        response = self.generate_with_ai(prompt, temperature=0.4)
+        response = await self.agenerate_with_ai(prompt, temperature=0.4)
         
         try:
             analisis_ia = json.loads(response)
@@ -250,7 +267,7 @@ class EjecutorAgent(BaseAgent):
         # Notificar sobre presupuestos críticos
         for presupuesto in presupuestos_analizados:
             if presupuesto.get("porcentaje", 0) >= 80:
-                self.send_message(
+                await self.send_message(
                     to_agent="Notificador",
                     protocol="A2A",
                     message_type="ALERT_REQUIRED",
@@ -271,7 +288,31 @@ class EjecutorAgent(BaseAgent):
             "protocol_used": "ACP"
         }
     
-    def analyze_expenses(self, task: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def _metricas_usuario(usuario_id: int, periodo_dias: int) -> Dict[str, Any]:
+        """
+        Calcular las métricas del período con una sesión propia
+        """
+        db = SessionLocal()
+        try:
+            ingreso_mensual = ingreso_mensual_usuario(db, usuario_id)
+            return analitica.analizar_usuario(db, usuario_id, periodo_dias, ingreso_mensual)
+        finally:
+            db.close()
+    
+    @staticmethod
+    def _datos_query_result(respuesta: Any) -> Dict[str, Any]:
+        """
+        Extraer `data` de un query_result MCP devuelto por Knowledge Base
+        """
+        if not isinstance(respuesta, dict):
+            return {}
+        resultado = respuesta.get("result")
+        if not isinstance(resultado, dict) or not isinstance(resultado.get("data"), dict):
+            return {}
+        return resultado["data"]
+    
+    async def analyze_expenses(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """
         Analizar patrones de gastos
         """
@@ -289,7 +330,7 @@ class EjecutorAgent(BaseAgent):
         Devuelve JSON con análisis detallado.
         """
         
-        response = self.generate_with_ai(prompt, temperature=0.5)
+        response = await self.agenerate_with_ai(prompt, temperature=0.5)
         
         return {
             "status": "expenses_analyzed",
@@ -297,13 +338,25 @@ class EjecutorAgent(BaseAgent):
             "protocol_used": "ACP"
         }
     
-    def perform_calculation(self, calc: Dict[str, Any]) -> Dict[str, Any]:
+    async def perform_calculation(self, calc: Dict[str, Any]) -> Dict[str, Any]:
         """
         Realizar cálculo específico
         """
         calc_type = calc.get("type")
         data = calc.get("data")
         
+        # Aritmética y métricas conocidas: resultado exacto sin llamar al modelo
+        resultado = analitica.calcular(calc_type, data)
+        if resultado is None and calc_type in CALCULOS_USUARIO and isinstance(data, dict) and data.get("usuario_id") is not None:
+            metricas = await asyncio.to_thread(self._metricas_usuario, data["usuario_id"], data.get("periodo_dias", 30))
+            resultado = {"tipo": calc_type, "valor": metricas if calc_type in ("balance", "metricas") else metricas[calc_type]}
+        if resultado is not None:
+            return {
+                "status": "calculation_completed",
+                "resultado": resultado,
+                "motor": "local"
+            }
+        
         # Usar IA para cálculos complejos
         prompt = f"""
         Realiza el siguiente cálculo financiero:
@@ -313,7 +366,7 @@ class EjecutorAgent(BaseAgent):
         Proporciona resultado numérico y explicación.
         """
         
-        response = self.generate_with_ai(prompt, temperature=0.2)
+        response = await self.agenerate_with_ai(prompt, temperature=0.2)
         
         return {
             "status": "calculation_completed",
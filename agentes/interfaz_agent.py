@@ -1,6 +1,6 @@
 from agentes.base_agent import BaseAgent
 from typing import Dict, Any, List
-from config import GEMINI_MODELS
+from config import GEMINI_MODELS, LLM_CACHE_CONFIG, LLM_SCHEDULER_CONFIG
 import json
 
 class InterfazAgent(BaseAgent):
@@ -13,10 +13,12 @@ class InterfazAgent(BaseAgent):
         super().__init__(
             name="Interfaz",
             model_name=GEMINI_MODELS["interfaz"],
-            role="Formatear y presentar información al usuario"
+            role="Formatear y presentar información al usuario",
+            cache_ttl=LLM_CACHE_CONFIG["ttl_por_agente"]["interfaz"],
+            priority=LLM_SCHEDULER_CONFIG["prioridades"]["interfaz"]
         )
     
-    def process_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+    async def process_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """
         Procesar mensajes recibidos
         """
@@ -26,9 +28,9 @@ class InterfazAgent(BaseAgent):
         if msg_type == "DISPLAY_ALERT":
             return self.format_alert_for_ui(content)
         elif msg_type == "DISPLAY_ANALYSIS":
-            return self.format_analysis_for_ui(content)
+            return await self.format_analysis_for_ui(content)
         elif msg_type == "DISPLAY_DASHBOARD":
-            return self.create_dashboard(content)
+            return await self.create_dashboard(content)
         elif msg_type == "EXECUTE_TASK":
             # Soporte para tareas del Planificador
             task = content.get("task") if isinstance(content, dict) else None
@@ -36,7 +38,7 @@ class InterfazAgent(BaseAgent):
                 context = content.get("context") if isinstance(content, dict) else None
                 usuario_id = task.get("usuario_id") or (context.get("usuario_id") if context else None)
                 datos = context.get("datos_reales") if context else {}
-                return self.create_dashboard({"usuario_id": usuario_id, "datos": datos})
+                return await self.create_dashboard({"usuario_id": usuario_id, "datos": datos})
             return {"status": "task_executed", "task": task}
         else:
             return {"status": "unknown_message_type", "type": msg_type}
@@ -69,7 +71,7 @@ class InterfazAgent(BaseAgent):
             "protocol_used": "AGUI"
         }
     
-    def format_analysis_for_ui(self, analysis_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def format_analysis_for_ui(self, analysis_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Formatear análisis financiero para UI
         """
@@ -96,7 +98,7 @@ class InterfazAgent(BaseAgent):
         }}
         """
         
-        response = self.generate_with_ai(prompt, temperature=0.6)
+        response = await self.agenerate_with_ai(prompt, temperature=0.6)
         
         try:
             ui_analysis = json.loads(response)
@@ -114,7 +116,7 @@ class InterfazAgent(BaseAgent):
             "protocol_used": "AGUI"
         }
     
-    def create_dashboard(self, dashboard_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def create_dashboard(self, dashboard_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Crear dashboard completo para el usuario
         """
@@ -137,7 +139,7 @@ class InterfazAgent(BaseAgent):
         Formato JSON estructurado para visualización.
         """
         
-        response = self.generate_with_ai(prompt, temperature=0.5)
+        response = await self.agenerate_with_ai(prompt, temperature=0.5)
         
         try:
             dashboard = json.loads(response)
@@ -178,7 +180,7 @@ class InterfazAgent(BaseAgent):
         }
         return actions.get(nivel, "Revisar")
     
-    def format_transaction_list(self, transacciones: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async def format_transaction_list(self, transacciones: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Formatear lista de transacciones para UI
         """
@@ -196,7 +198,7 @@ class InterfazAgent(BaseAgent):
         Devuelve JSON estructurado para visualización.
         """
         
-        response = self.generate_with_ai(prompt, temperature=0.4)
+        response = await self.agenerate_with_ai(prompt, temperature=0.4)
         
         return {
             "status": "transactions_formatted",
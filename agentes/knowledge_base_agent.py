@@ -1,10 +1,21 @@
 from agentes.base_agent import BaseAgent
 from typing import Dict, Any, List, Optional
-from config import GEMINI_MODELS
-from sqlalchemy.orm import Session
-from models import Transaccion, Presupuesto, Usuario, AnalisisFinanciero
+from config import GEMINI_MODELS, LLM_CACHE_CONFIG, LLM_SCHEDULER_CONFIG, KNOWLEDGE_BASE_CONFIG, PRONOSTICO_CONFIG, ANOMALIAS_CONFIG
+from models import TipoTransaccion, CategoriaGasto
+from database import SessionLocal
+from protocolos.mcp_protocol import MCPProtocol
+from servicios.agregaciones import calcular_datos_reales, obtener_presupuestos_mes
+from servicios.analisis import guardar_analisis
+from servicios.consultas import bloques_transacciones, contar_transacciones, ingreso_mensual_usuario
+from servicios.pronosticos import pronosticar_usuario
+from servicios.anomalias import anomalias_recientes
+from servicios.recurrentes import pagos_recurrentes
 from datetime import datetime, timedelta
+import asyncio
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 class KnowledgeBaseAgent(BaseAgent):
     """
@@ -16,23 +27,29 @@ class KnowledgeBaseAgent(BaseAgent):
         super().__init__(
             name="KnowledgeBase",
             model_name=GEMINI_MODELS["knowledge_base"],
-            role="Almacenar y proporcionar información financiera histórica"
+            role="Almacenar y proporcionar información financiera histórica",
+            cache_ttl=LLM_CACHE_CONFIG["ttl_por_agente"]["knowledge_base"],
+            priority=LLM_SCHEDULER_CONFIG["prioridades"]["knowledge_base"]
         )
     
-    def process_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+    async def process_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """
         Procesar mensajes recibidos
         """
         msg_type = message.get("type")
         content = message.get("content")
         if msg_type == "QUERY_TRANSACTIONS":
-            return self.query_transactions(content)
+            return await self.query_transactions(content)
         elif msg_type == "QUERY_BUDGETS":
-            return self.query_budgets(content)
+            return await self.query_budgets(content)
+        elif msg_type == "QUERY_ANOMALIES":
+            return await self.query_anomalies(content)
+        elif msg_type == "QUERY_RECURRING":
+            return await self.query_recurring(content)
         elif msg_type == "QUERY_HISTORICAL":
-            return self.query_historical_data(content)
+            return await self.query_historical_data(content)
         elif msg_type == "STORE_ANALYSIS":
-            return self.store_analysis(content)
+            return await self.store_analysis(content)
         elif msg_type == "EXECUTE_TASK":
             # Accept tasks dispatched by Planificador
             task = content.get("task") if isinstance(content, dict) else None
@@ -40,8 +57,8 @@ class KnowledgeBaseAgent(BaseAgent):
             if not task:
                 return {"status": "error", "error": "no_task_provided"}
 
-            tipo = task.get("tipo")
-            # If context provides real data, prefer returning that instead of querying DB
+            tipo = task.get("tipo") or ""
+            periodo_dias = task.get("periodo_dias") or (context or {}).get("periodo_dias", 30)
             if tipo == "analizar_patrones":
                 meses = task.get("meses_atras", 6)
                 if context and isinstance(context, dict) and context.get("datos_reales"):
@@ -57,93 +74,126 @@ class KnowledgeBaseAgent(BaseAgent):
                         },
                         "protocol_used": "MCP"
                     }
-                return self.query_historical_data({"usuario_id": task.get("usuario_id"), "meses_atras": meses})
+                return await self.query_historical_data({"usuario_id": task.get("usuario_id"), "meses_atras": meses})
             elif tipo == "recopilar_transacciones" or "transaccion" in tipo.lower() or "datos" in tipo.lower():
-                if context and isinstance(context, dict) and context.get("datos_reales"):
-                    return {
-                        "status": "query_completed",
-                        "result": {
-                            "message_id": f"KB_{datetime.utcnow().timestamp()}",
-                            "protocol": "MCP",
-                            "content_type": "transaction_query_result",
-                            "data": context.get("datos_reales"),
-                            "timestamp": datetime.utcnow().isoformat()
-                        },
-                        "protocol_used": "MCP"
-                    }
-                return self.query_transactions({"usuario_id": task.get("usuario_id"), "periodo_dias": task.get("periodo_dias", 30)})
+                # Consulta real a la base de datos: el plan ya no transporta los datos
+                return await self.query_transactions({"usuario_id": task.get("usuario_id"), "periodo_dias": periodo_dias})
             elif tipo == "verificar_presupuestos" or "presupuesto" in tipo.lower():
-                if context and isinstance(context, dict) and context.get("presupuestos_reales"):
-                    return {
-                        "status": "query_completed",
-                        "result": {
-                            "message_id": f"KB_{datetime.utcnow().timestamp()}",
-                            "protocol": "MCP",
-                            "content_type": "budget_query_result",
-                            "data": {
-                                "usuario_id": task.get("usuario_id"),
-                                "periodo": {"mes": task.get("mes"), "anio": task.get("anio")},
-                                "presupuestos": context.get("presupuestos_reales"),
-                                "total_asignado": sum(p.get("limite", 0) for p in context.get("presupuestos_reales", [])),
-                                "total_gastado": sum(p.get("gastado", 0) for p in context.get("presupuestos_reales", []))
-                            },
-                            "timestamp": datetime.utcnow().isoformat()
-                        },
-                        "protocol_used": "MCP"
-                    }
-                return self.query_budgets({"usuario_id": task.get("usuario_id"), "mes": task.get("mes"), "anio": task.get("anio")})
+                return await self.query_budgets({"usuario_id": task.get("usuario_id"), "mes": task.get("mes"), "anio": task.get("anio")})
             elif tipo == "consultar_historico" or "histor" in tipo.lower():
-                return self.query_historical_data({"usuario_id": task.get("usuario_id"), "meses_atras": task.get("meses_atras", 6)})
+                return await self.query_historical_data({"usuario_id": task.get("usuario_id"), "meses_atras": task.get("meses_atras", 6)})
+            elif task.get("usuario_id") is not None:
+                # Por defecto: resumen del período consultado en la base de datos
+                return await self.query_transactions({"usuario_id": task.get("usuario_id"), "periodo_dias": periodo_dias, "solo_resumen": True})
             else:
-                # Default: return context data if available
-                if context and isinstance(context, dict) and context.get("datos_reales"):
-                    return {
-                        "status": "query_completed",
-                        "result": {
-                            "message_id": f"KB_{datetime.utcnow().timestamp()}",
-                            "protocol": "MCP",
-                            "content_type": "generic_query_result",
-                            "data": context.get("datos_reales"),
-                            "timestamp": datetime.utcnow().isoformat()
-                        },
-                        "protocol_used": "MCP"
-                    }
                 return {"status": "unknown_task_type", "task_type": tipo}
         else:
             return {"status": "unknown_message_type", "type": msg_type}
     
-    def query_transactions(self, query: Dict[str, Any]) -> Dict[str, Any]:
+    async def query_transactions(self, query: Dict[str, Any]) -> Dict[str, Any]:
         """
         Consultar transacciones con filtros
-        Usa MCP para estandarizar formato de respuesta
+        Usa MCP (query_result) para estandarizar formato de respuesta
         """
         usuario_id = query.get("usuario_id")
         periodo_dias = query.get("periodo_dias", 30)
         categoria = query.get("categoria")
         tipo = query.get("tipo")
-        
-        # En implementación real, consultaría la base de datos
-        # Aquí generamos respuesta estructurada usando MCP
-        
-        mcp_response = {
-            "message_id": f"KB_{datetime.utcnow().timestamp()}",
-            "protocol": "MCP",
-            "content_type": "transaction_query_result",
-            "data": {
-                "usuario_id": usuario_id,
-                "periodo": {
-                    "inicio": (datetime.utcnow() - timedelta(days=periodo_dias)).isoformat(),
-                    "fin": datetime.utcnow().isoformat()
-                },
-                "transacciones": [],  # Aquí irían las transacciones reales
-                "total_count": 0,
-                "filters_applied": {
-                    "categoria": categoria,
-                    "tipo": tipo
-                }
+        solo_resumen = bool(query.get("solo_resumen", False))
+        fecha_hasta = datetime.utcnow()
+        fecha_desde = fecha_hasta - timedelta(days=periodo_dias)
+        
+        consulta = {"transacciones": [], "total_count": 0, "truncado": False, "resumen": None}
+        if usuario_id is not None:
+            try:
+                consulta = await asyncio.to_thread(
+                    self._consultar_transacciones, usuario_id, fecha_desde, tipo, categoria, solo_resumen
+                )
+            except Exception as e:
+                logger.error(f"Error consultando transacciones: {e}")
+        
+        mcp_response = MCPProtocol.create_query_result(
+            sender=self.name,
+            query_type="transactions",
+            results=consulta["transacciones"],
+            total_count=consulta["total_count"],
+            filters={"categoria": categoria, "tipo": tipo, "periodo_dias": periodo_dias}
+        )
+        mcp_response["data"].update({
+            "usuario_id": usuario_id,
+            "periodo": {
+                "inicio": fecha_desde.isoformat(),
+                "fin": fecha_hasta.isoformat()
             },
-            "timestamp": datetime.utcnow().isoformat()
+            "resumen": consulta["resumen"],
+            "truncado": consulta["truncado"]
+        })
+        
+        return {
+            "status": "query_completed",
+            "result": mcp_response,
+            "protocol_used": "MCP"
         }
+    
+    @staticmethod
+    def _consultar_transacciones(usuario_id: int, fecha_desde: datetime, tipo: Optional[str],
+                                 categoria: Optional[str], solo_resumen: bool) -> Dict[str, Any]:
+        """
+        Resumen del período y transacciones (por bloques, hasta el máximo configurado) con una sesión propia
+        """
+        tipo = TipoTransaccion(tipo) if tipo else None
+        categoria = CategoriaGasto(categoria) if categoria else None
+        db = SessionLocal()
+        try:
+            resumen = calcular_datos_reales(db, usuario_id, fecha_desde)
+            resumen["ingreso_mensual"] = ingreso_mensual_usuario(db, usuario_id)
+            if solo_resumen:
+                return {"transacciones": [], "total_count": resumen["total_transacciones"], "truncado": False, "resumen": resumen}
+            
+            maximo = KNOWLEDGE_BASE_CONFIG["max_transacciones_respuesta"]
+            transacciones: List[Dict[str, Any]] = []
+            truncado = False
+            for bloque in bloques_transacciones(db, usuario_id, fecha_desde, tipo=tipo, categoria=categoria):
+                restante = maximo - len(transacciones)
+                if len(bloque) > restante:
+                    transacciones.extend(bloque[:restante])
+                    truncado = True
+                    break
+                transacciones.extend(bloque)
+            
+            total = contar_transacciones(db, usuario_id, fecha_desde, tipo=tipo, categoria=categoria) if truncado else len(transacciones)
+            return {"transacciones": transacciones, "total_count": total, "truncado": truncado, "resumen": resumen}
+        finally:
+            db.close()
+    
+    async def query_budgets(self, query: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Consultar presupuestos del mes
+        """
+        usuario_id = query.get("usuario_id")
+        mes = query.get("mes") or datetime.utcnow().month
+        anio = query.get("anio") or datetime.utcnow().year
+        
+        presupuestos: List[Dict[str, Any]] = []
+        if usuario_id is not None:
+            try:
+                presupuestos = await asyncio.to_thread(self._consultar_presupuestos, usuario_id, mes, anio)
+            except Exception as e:
+                logger.error(f"Error consultando presupuestos: {e}")
+        
+        mcp_response = MCPProtocol.create_query_result(
+            sender=self.name,
+            query_type="budgets",
+            results=presupuestos,
+            total_count=len(presupuestos),
+            filters={"mes": mes, "anio": anio}
+        )
+        mcp_response["data"].update({
+            "usuario_id": usuario_id,
+            "periodo": {"mes": mes, "anio": anio},
+            "total_asignado": sum(p["limite"] for p in presupuestos),
+            "total_gastado": sum(p["gastado"] for p in presupuestos)
+        })
         
         return {
             "status": "query_completed",
@@ -151,27 +201,76 @@ class KnowledgeBaseAgent(BaseAgent):
             "protocol_used": "MCP"
         }
     
-    def query_budgets(self, query: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def _consultar_presupuestos(usuario_id: int, mes: int, anio: int) -> List[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            return obtener_presupuestos_mes(db, usuario_id, mes, anio)
+        finally:
+            db.close()
+    
+    async def query_anomalies(self, query: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Consultar presupuestos
+        Consultar los gastos inusuales detectados al registrar transacciones
         """
         usuario_id = query.get("usuario_id")
-        mes = query.get("mes", datetime.utcnow().month)
-        anio = query.get("anio", datetime.utcnow().year)
+        dias = query.get("dias") or ANOMALIAS_CONFIG["dias_consulta"]
+        
+        anomalias: List[Dict[str, Any]] = []
+        if usuario_id is not None:
+            try:
+                anomalias = await asyncio.to_thread(self._consultar_anomalias, usuario_id, dias)
+            except Exception as e:
+                logger.error(f"Error consultando anomalías: {e}")
+        
+        mcp_response = MCPProtocol.create_query_result(
+            sender=self.name,
+            query_type="anomalies",
+            results=anomalias,
+            total_count=len(anomalias),
+            filters={"dias": dias}
+        )
+        mcp_response["data"]["usuario_id"] = usuario_id
         
-        mcp_response = {
-            "message_id": f"KB_{datetime.utcnow().timestamp()}",
-            "protocol": "MCP",
-            "content_type": "budget_query_result",
-            "data": {
-                "usuario_id": usuario_id,
-                "periodo": {"mes": mes, "anio": anio},
-                "presupuestos": [],  # Aquí irían los presupuestos reales
-                "total_asignado": 0.0,
-                "total_gastado": 0.0
-            },
-            "timestamp": datetime.utcnow().isoformat()
+        return {
+            "status": "query_completed",
+            "result": mcp_response,
+            "protocol_used": "MCP"
         }
+    
+    @staticmethod
+    def _consultar_anomalias(usuario_id: int, dias: int) -> List[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            return anomalias_recientes(db, usuario_id, dias)
+        finally:
+            db.close()
+    
+    async def query_recurring(self, query: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Consultar los pagos recurrentes y suscripciones del índice
+        """
+        usuario_id = query.get("usuario_id")
+        incluir_inactivos = bool(query.get("incluir_inactivos", False))
+        
+        recurrentes = {"pagos": [], "total_mensual": 0.0}
+        if usuario_id is not None:
+            try:
+                recurrentes = await asyncio.to_thread(self._consultar_recurrentes, usuario_id, incluir_inactivos)
+            except Exception as e:
+                logger.error(f"Error consultando pagos recurrentes: {e}")
+        
+        mcp_response = MCPProtocol.create_query_result(
+            sender=self.name,
+            query_type="recurring_payments",
+            results=recurrentes["pagos"],
+            total_count=len(recurrentes["pagos"]),
+            filters={"incluir_inactivos": incluir_inactivos}
+        )
+        mcp_response["data"].update({
+            "usuario_id": usuario_id,
+            "costo_mensual_total": recurrentes["total_mensual"]
+        })
         
         return {
             "status": "query_completed",
@@ -179,18 +278,37 @@ class KnowledgeBaseAgent(BaseAgent):
             "protocol_used": "MCP"
         }
     
-    def query_historical_data(self, query: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def _consultar_recurrentes(usuario_id: int, incluir_inactivos: bool) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            return pagos_recurrentes(db, usuario_id, incluir_inactivos)
+        finally:
+            db.close()
+    
+    async def query_historical_data(self, query: Dict[str, Any]) -> Dict[str, Any]:
         """
         Consultar datos históricos con análisis de patrones
         """
         usuario_id = query.get("usuario_id")
         meses_atras = query.get("meses_atras", 6)
         
+        # Las anomalías vienen del detector, no del modelo
+        anomalias: List[Dict[str, Any]] = []
+        if usuario_id is not None:
+            try:
+                anomalias = await asyncio.to_thread(self._consultar_anomalias, usuario_id, meses_atras * 30)
+            except Exception as e:
+                logger.error(f"Error consultando anomalías: {e}")
+        
         prompt = f"""
         Analiza los patrones históricos financieros del usuario {usuario_id}:
         
         Período: últimos {meses_atras} meses
         
+        Gastos inusuales detectados (puntaje frente a la mediana de su categoría):
+        {json.dumps(anomalias, ensure_ascii=False)}
+        
         Identifica:
         1. Patrones de gasto recurrentes
         2. Tendencias de ingreso
@@ -206,7 +324,7 @@ class KnowledgeBaseAgent(BaseAgent):
         }}
         """
         
-        response = self.generate_with_ai(prompt, temperature=0.4)
+        response = await self.agenerate_with_ai(prompt, temperature=0.4)
         
         try:
             analisis = json.loads(response)
@@ -218,6 +336,9 @@ class KnowledgeBaseAgent(BaseAgent):
                 "predicciones": {},
                 "analisis_ia": response
             }
+        if not isinstance(analisis, dict):
+            analisis = {"analisis_ia": analisis}
+        analisis["anomalias"] = anomalias
         
         mcp_response = {
             "message_id": f"KB_{datetime.utcnow().timestamp()}",
@@ -233,22 +354,27 @@ class KnowledgeBaseAgent(BaseAgent):
             "protocol_used": "MCP"
         }
     
-    def store_analysis(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
+    async def store_analysis(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Almacenar análisis financiero
+        Almacenar análisis financiero en analisis_financieros con la huella de sus datos
         """
         usuario_id = analysis.get("usuario_id")
         tipo_analisis = analysis.get("tipo")
-        datos = analysis.get("datos")
         
-        # En implementación real, guardaría en base de datos
+        analisis_id = None
+        if usuario_id is not None and analysis.get("huella") and isinstance(analysis.get("resultado"), dict):
+            try:
+                analisis_id = await asyncio.to_thread(self._guardar_analisis, analysis)
+            except Exception as e:
+                logger.error(f"Error guardando análisis: {e}")
         
         mcp_response = {
             "message_id": f"KB_{datetime.utcnow().timestamp()}",
             "protocol": "MCP",
             "content_type": "storage_confirmation",
             "data": {
-                "stored": True,
+                "stored": analisis_id is not None,
+                "analisis_id": analisis_id,
                 "usuario_id": usuario_id,
                 "tipo": tipo_analisis,
                 "stored_at": datetime.utcnow().isoformat()
@@ -262,7 +388,28 @@ class KnowledgeBaseAgent(BaseAgent):
             "protocol_used": "MCP"
         }
     
-    def get_spending_insights(self, usuario_id: int, categoria: Optional[str] = None, datos_reales: Optional[Dict] = None, tiene_datos: bool = False) -> Dict[str, Any]:
+    @staticmethod
+    def _guardar_analisis(analysis: Dict[str, Any]) -> int:
+        """
+        Insertar el análisis con una sesión propia
+        """
+        ahora = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            return guardar_analisis(
+                db,
+                analysis["usuario_id"],
+                analysis.get("tipo"),
+                analysis["huella"],
+                analysis.get("periodo_inicio") or ahora,
+                analysis.get("periodo_fin") or ahora,
+                analysis.get("datos_reales") or {},
+                analysis["resultado"]
+            )
+        finally:
+            db.close()
+    
+    async def get_spending_insights(self, usuario_id: int, categoria: Optional[str] = None, datos_reales: Optional[Dict] = None, tiene_datos: bool = False) -> Dict[str, Any]:
         """
         Obtener insights de gastos usando IA con datos reales
         """
@@ -292,6 +439,7 @@ class KnowledgeBaseAgent(BaseAgent):
         3. Estado de presupuestos (si hay)
         4. Identificación de categorías problemáticas
         5. Oportunidades de ahorro específicas
+        6. Pagos recurrentes y suscripciones (si hay "pagos_recurrentes"), citándolos por su descripción y costo mensual
         
         IMPORTANTE: Responde SOLO con un objeto JSON válido, sin formato markdown, sin bloques de código, sin ```json ni ```. Solo el JSON puro.
         
@@ -307,7 +455,7 @@ class KnowledgeBaseAgent(BaseAgent):
         }}
         """
         
-        response = self.generate_with_ai(prompt, temperature=0.5)
+        response = await self.agenerate_with_ai(prompt, temperature=0.5)
         
         try:
             insights = json.loads(response)
@@ -324,67 +472,75 @@ class KnowledgeBaseAgent(BaseAgent):
             "insights": insights
         }
     
-    def predict_future_expenses(self, usuario_id: int, meses_futuros: int = 3, datos_reales: Optional[Dict] = None, tiene_datos: bool = False) -> Dict[str, Any]:
+    async def predict_future_expenses(self, usuario_id: int, meses_futuros: int = 3, datos_reales: Optional[Dict] = None, tiene_datos: bool = False) -> Dict[str, Any]:
         """
-        Predecir gastos futuros basado en datos históricos reales
+        Predecir gastos futuros con el pronosticador local sobre el resumen mensual
+        Las cifras no dependen del modelo; Gemini solo añade un comentario opcional
         """
-        if not tiene_datos or not datos_reales:
+        pronostico = None
+        try:
+            pronostico = await asyncio.to_thread(self._pronosticar, usuario_id, meses_futuros)
+        except Exception as e:
+            logger.error(f"Error pronosticando gastos: {e}")
+        
+        if not pronostico or not pronostico.get("meses_historia"):
             return {
                 "status": "prediction_completed",
                 "prediccion": {
                     "predicciones": [],
-                    "tendencia_general": "Datos insuficientes para realizar predicciones. Necesitas al menos 30 días de historial.",
+                    "tendencia_general": "Datos insuficientes para realizar predicciones. Necesitas al menos un mes completo de historial.",
                     "factores_considerados": []
                 },
                 "meses_futuros": meses_futuros
             }
         
-        datos_json = json.dumps(datos_reales, indent=2)
-        
-        prompt = f"""
-        Predice los gastos futuros del usuario {usuario_id} para los próximos {meses_futuros} meses.
-        
-        DATOS HISTÓRICOS REALES:
-        {datos_json}
-        
-        Basándote en:
-        - Promedio mensual real de gastos
-        - Distribución real por categorías
-        - Patrones identificados en los datos
-        - Estacionalidad (considera que estamos en noviembre)
-        
-        IMPORTANTE: Responde SOLO con un objeto JSON válido, sin formato markdown, sin bloques de código, sin ```json ni ```. Solo el JSON puro.
-        
-        Formato JSON requerido:
-        {{
-            "predicciones": [
-                {{"mes": 1, "gasto_estimado": valor_basado_en_datos_reales, "confianza": "alta/media/baja"}},
-                {{"mes": 2, "gasto_estimado": valor_basado_en_datos_reales, "confianza": "alta/media/baja"}},
-                {{"mes": 3, "gasto_estimado": valor_basado_en_datos_reales, "confianza": "alta/media/baja"}}
-            ],
-            "tendencia_general": "descripción basada en datos reales",
-            "factores_considerados": ["factor 1 del análisis de datos reales", "factor 2"]
-        }}
-        """
-        
-        response = self.generate_with_ai(prompt, temperature=0.3)
+        predicciones = pronostico["predicciones"]
+        primero, ultimo = predicciones[0]["gasto_estimado"], predicciones[-1]["gasto_estimado"]
+        if ultimo > primero * 1.05:
+            tendencia = "al alza"
+        elif ultimo < primero * 0.95:
+            tendencia = "a la baja"
+        else:
+            tendencia = "estable"
+        
+        prediccion = {
+            "predicciones": predicciones,
+            "por_categoria": pronostico["por_categoria"],
+            "modelo": pronostico["modelo"],
+            "tendencia_general": (
+                f"Gasto estimado de ${primero:.2f} para el mes en curso, tendencia {tendencia} "
+                f"en los próximos {meses_futuros} meses"
+            ),
+            "factores_considerados": [
+                f"{pronostico['meses_historia']} meses de historial por categoría",
+                "Nivel y tendencia con suavizado exponencial (Holt)"
+                + (" y estacionalidad anual (Holt-Winters)" if pronostico["modelo"] == "holt_winters" else ""),
+                "Intervalos de confianza del 95% a partir de los errores históricos"
+            ]
+        }
         
-        try:
-            prediccion = json.loads(response)
-        except:
-            # Fallback con predicción básica basada en promedio real
-            promedio = datos_reales.get("promedio_mensual", 0)
-            prediccion = {
-                "predicciones": [
-                    {"mes": i+1, "gasto_estimado": round(promedio * (1 + i*0.05), 2), "confianza": "baja"}
-                    for i in range(meses_futuros)
-                ],
-                "tendencia_general": f"Proyección basada en promedio mensual de ${promedio:.2f}",
-                "factores_considerados": ["Promedio histórico simple"]
-            }
+        if PRONOSTICO_CONFIG["comentario_ia"]:
+            prompt = f"""
+            Comenta brevemente (máximo 300 caracteres) este pronóstico de gastos del usuario {usuario_id}.
+            Las cifras ya están calculadas: no las cambies ni inventes otras.
+            
+            {json.dumps({"predicciones": predicciones, "tendencia": tendencia}, ensure_ascii=False)}
+            """
+            try:
+                prediccion["comentario_ia"] = await self.agenerate_with_ai(prompt, temperature=0.3)
+            except Exception as e:
+                logger.warning(f"Sin comentario de IA para el pronóstico: {e}")
         
         return {
             "status": "prediction_completed",
             "prediccion": prediccion,
             "meses_futuros": meses_futuros
         }
+    
+    @staticmethod
+    def _pronosticar(usuario_id: int, meses_futuros: int) -> Optional[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            return pronosticar_usuario(db, usuario_id, meses_futuros)
+        finally:
+            db.close()
@@ -0,0 +1,282 @@
+"""
+Caché de respuestas LLM con dos niveles: LRU en memoria y SQLite en disco
+"""
+
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from config import LLM_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class LLMCache:
+    """
+    Caché de respuestas de Gemini indexada por (modelo, hash del prompt, temperatura)
+
+    - Nivel 1: LRU en memoria acotado por número de entradas y bytes
+    - Nivel 2: archivo SQLite local que sobrevive a reinicios del proceso
+    - TTL por entrada (cada agente define el suyo)
+    - Contadores de aciertos/fallos por nivel
+    """
+
+    def __init__(
+        self,
+        memory_max_entries: int = 512,
+        memory_max_bytes: int = 8 * 1024 * 1024,
+        disk_path: Optional[str] = None,
+        disk_max_bytes: int = 64 * 1024 * 1024
+    ):
+        self.memory_max_entries = memory_max_entries
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_path = disk_path
+        self.disk_max_bytes = disk_max_bytes
+
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+
+        self.stats_counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0
+        }
+
+        if disk_path:
+            self._open_disk()
+
+    @classmethod
+    def from_config(cls) -> "LLMCache":
+        return cls(
+            memory_max_entries=LLM_CACHE_CONFIG["memory_max_entries"],
+            memory_max_bytes=LLM_CACHE_CONFIG["memory_max_bytes"],
+            disk_path=LLM_CACHE_CONFIG["disk_path"] or None,
+            disk_max_bytes=LLM_CACHE_CONFIG["disk_max_bytes"]
+        )
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str, temperature: float) -> str:
+        """
+        Construir la clave de caché a partir del modelo, el prompt y la temperatura
+        """
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{model_name}:{temperature:.3f}:{prompt_hash}"
+
+    # ----- Nivel en disco -----
+
+    def _open_disk(self):
+        try:
+            directory = os.path.dirname(os.path.abspath(self.disk_path))
+            os.makedirs(directory, exist_ok=True)
+            self._disk = sqlite3.connect(self.disk_path, check_same_thread=False)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._disk.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_access ON llm_cache (last_access)")
+            self._disk.commit()
+        except Exception as e:
+            logger.warning(f"llm_cache: nivel en disco deshabilitado ({e})")
+            self._disk = None
+
+    def _disk_get(self, key: str) -> Optional[Tuple[str, float]]:
+        if self._disk is None:
+            return None
+        now = time.time()
+        with self._disk_lock:
+            row = self._disk.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._disk.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._disk.commit()
+                self.stats_counters["expired"] += 1
+                return None
+            self._disk.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._disk.commit()
+        return row[0], row[1]
+
+    def _disk_set(self, key: str, value: str, expires_at: float):
+        if self._disk is None:
+            return
+        size = len(value.encode("utf-8"))
+        now = time.time()
+        with self._disk_lock:
+            self._disk.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, expires_at, now)
+            )
+            # Expulsar expiradas y, si se excede el tamaño, las menos usadas recientemente
+            self._disk.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            total = self._disk.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            while total > self.disk_max_bytes:
+                victim = self._disk.execute(
+                    "SELECT key, size FROM llm_cache ORDER BY last_access LIMIT 1"
+                ).fetchone()
+                if victim is None or victim[0] == key:
+                    break
+                self._disk.execute("DELETE FROM llm_cache WHERE key = ?", (victim[0],))
+                total -= victim[1]
+                self.stats_counters["evictions"] += 1
+            self._disk.commit()
+
+    # ----- Nivel en memoria -----
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                self._memory_remove(key)
+                self.stats_counters["expired"] += 1
+                return None
+            self._memory.move_to_end(key)
+            return value
+
+    def _memory_set(self, key: str, value: str, expires_at: float):
+        size = len(value.encode("utf-8"))
+        if size > self.memory_max_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._memory_remove(key)
+            self._memory[key] = (value, expires_at)
+            self._memory_bytes += size
+            while self._memory and (
+                len(self._memory) > self.memory_max_entries or self._memory_bytes > self.memory_max_bytes
+            ):
+                oldest = next(iter(self._memory))
+                self._memory_remove(oldest)
+                self.stats_counters["evictions"] += 1
+
+    def _memory_remove(self, key: str):
+        value, _ = self._memory.pop(key)
+        self._memory_bytes -= len(value.encode("utf-8"))
+
+    # ----- API pública -----
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Buscar una respuesta en memoria y luego en disco (bloqueante)
+        """
+        value = self._memory_get(key)
+        if value is not None:
+            self.stats_counters["memory_hits"] += 1
+            return value
+        return self._promote(key, self._disk_get(key))
+
+    async def aget(self, key: str) -> Optional[str]:
+        """
+        Igual que get, pero el acceso a disco se hace fuera del event loop
+        """
+        value = self._memory_get(key)
+        if value is not None:
+            self.stats_counters["memory_hits"] += 1
+            return value
+        if self._disk is None:
+            self.stats_counters["misses"] += 1
+            return None
+        return self._promote(key, await asyncio.to_thread(self._disk_get, key))
+
+    def _promote(self, key: str, disk_entry: Optional[Tuple[str, float]]) -> Optional[str]:
+        if disk_entry is None:
+            self.stats_counters["misses"] += 1
+            return None
+        value, expires_at = disk_entry
+        self.stats_counters["disk_hits"] += 1
+        self._memory_set(key, value, expires_at)
+        return value
+
+    def set(self, key: str, value: str, ttl_seconds: int):
+        """
+        Guardar una respuesta en ambos niveles (bloqueante)
+        """
+        if ttl_seconds <= 0:
+            return
+        expires_at = time.time() + ttl_seconds
+        self._memory_set(key, value, expires_at)
+        self._disk_set(key, value, expires_at)
+        self.stats_counters["stores"] += 1
+
+    async def aset(self, key: str, value: str, ttl_seconds: int):
+        """
+        Igual que set, pero la escritura en disco se hace fuera del event loop
+        """
+        if ttl_seconds <= 0:
+            return
+        expires_at = time.time() + ttl_seconds
+        self._memory_set(key, value, expires_at)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk_set, key, value, expires_at)
+        self.stats_counters["stores"] += 1
+
+    def clear(self):
+        """
+        Vaciar ambos niveles de la caché
+        """
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.execute("DELETE FROM llm_cache")
+                self._disk.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtener contadores de aciertos/fallos y ocupación de la caché
+        """
+        hits = self.stats_counters["memory_hits"] + self.stats_counters["disk_hits"]
+        lookups = hits + self.stats_counters["misses"]
+        disk_entries = 0
+        disk_bytes = 0
+        if self._disk is not None:
+            with self._disk_lock:
+                disk_entries, disk_bytes = self._disk.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+                ).fetchone()
+        return {
+            **self.stats_counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": disk_entries,
+            "disk_bytes": disk_bytes
+        }
+
+
+_cache: Optional[LLMCache] = None
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """
+    Obtener la instancia compartida de la caché (None si está deshabilitada)
+    """
+    global _cache
+    if not LLM_CACHE_CONFIG["enabled"]:
+        return None
+    if _cache is None:
+        _cache = LLMCache.from_config()
+    return _cache
@@ -0,0 +1,217 @@
+"""
+Planificador central de llamadas a Gemini: token buckets por modelo y cola de prioridad
+"""
+
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from config import LLM_SCHEDULER_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket clásico: capacidad máxima y reposición continua por segundo
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def time_until(self, amount: float) -> float:
+        """
+        Segundos que faltan para disponer de `amount` tokens (0 si ya hay)
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def drain(self):
+        """
+        Vaciar el bucket (p. ej. tras un 429 del proveedor)
+        """
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+class _ModelQueue:
+    """
+    Estado de un modelo: buckets de peticiones y tokens, cola y métricas
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm, rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self.heap: List[Any] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.dispatched = 0
+        self.throttled = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def wait_for(self, estimated_tokens: int) -> float:
+        return max(self.requests.time_until(1), self.tokens.time_until(estimated_tokens))
+
+    def consume(self, estimated_tokens: int, waited: float):
+        self.requests.consume(1)
+        self.tokens.consume(estimated_tokens)
+        self.dispatched += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+
+class LLMScheduler:
+    """
+    Todas las llamadas LLM de los agentes pasan por aquí
+
+    - Un par de token buckets (peticiones/minuto y tokens/minuto) por modelo
+    - Cola de prioridad por modelo: menor número = más prioritario; a igual
+      prioridad se respeta el orden de llegada
+    - Métricas de profundidad de cola y tiempo de espera
+    """
+
+    def __init__(self, quotas: Dict[str, Dict[str, int]], default_quota: Dict[str, int],
+                 max_wait_seconds: float = 30.0):
+        self.quotas = quotas
+        self.default_quota = default_quota
+        self.max_wait_seconds = max_wait_seconds
+        self._models: Dict[str, _ModelQueue] = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls) -> "LLMScheduler":
+        return cls(
+            quotas=LLM_SCHEDULER_CONFIG["cuotas"],
+            default_quota=LLM_SCHEDULER_CONFIG["cuota_por_defecto"],
+            max_wait_seconds=LLM_SCHEDULER_CONFIG["max_espera_segundos"]
+        )
+
+    @staticmethod
+    def estimate_tokens(prompt: str) -> int:
+        """
+        Estimación barata de tokens: ~4 caracteres por token más la salida esperada
+        """
+        return len(prompt) // 4 + LLM_SCHEDULER_CONFIG["tokens_salida_estimados"]
+
+    def _model(self, model_name: str) -> _ModelQueue:
+        state = self._models.get(model_name)
+        if state is None:
+            quota = self.quotas.get(model_name, self.default_quota)
+            state = _ModelQueue(quota["rpm"], quota["tpm"])
+            self._models[model_name] = state
+        return state
+
+    async def run(self, model_name: str, priority: int, estimated_tokens: int,
+                  fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Esperar turno según prioridad y cuota del modelo y luego ejecutar fn()
+        Lanza asyncio.TimeoutError si la espera supera max_wait_seconds
+        """
+        await self.acquire(model_name, priority, estimated_tokens)
+        return await fn()
+
+    async def acquire(self, model_name: str, priority: int, estimated_tokens: int):
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        enqueued_at = time.monotonic()
+        with self._lock:
+            state = self._model(model_name)
+            heapq.heappush(state.heap, (priority, next(self._seq), waiter, estimated_tokens, enqueued_at))
+        self._pump(model_name)
+        try:
+            await asyncio.wait_for(waiter, timeout=self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            state.timeouts += 1
+            logger.warning(f"llm_scheduler: espera agotada para {model_name} (prioridad {priority})")
+            raise
+
+    def report_throttled(self, model_name: str):
+        """
+        Registrar un 429 del proveedor: vaciar el bucket para frenar el modelo
+        """
+        with self._lock:
+            state = self._model(model_name)
+            state.throttled += 1
+            state.requests.drain()
+        self._pump(model_name)
+
+    def _pump(self, model_name: str):
+        """
+        Despachar las peticiones en cabeza de cola mientras haya cuota
+        """
+        with self._lock:
+            state = self._model(model_name)
+            if state.timer is not None:
+                state.timer.cancel()
+                state.timer = None
+            while state.heap:
+                _, _, waiter, estimated_tokens, enqueued_at = state.heap[0]
+                if waiter.done():
+                    # Cancelada o expirada mientras esperaba
+                    heapq.heappop(state.heap)
+                    continue
+                wait = state.wait_for(estimated_tokens)
+                if wait > 0:
+                    state.timer = waiter.get_loop().call_later(wait, self._pump, model_name)
+                    break
+                heapq.heappop(state.heap)
+                state.consume(estimated_tokens, time.monotonic() - enqueued_at)
+                waiter.set_result(None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtener profundidad de cola, esperas y cuota disponible por modelo
+        """
+        stats = {}
+        with self._lock:
+            for model_name, state in self._models.items():
+                pending = [item for item in state.heap if not item[2].done()]
+                by_priority: Dict[int, int] = {}
+                for item in pending:
+                    by_priority[item[0]] = by_priority.get(item[0], 0) + 1
+                stats[model_name] = {
+                    "queue_depth": len(pending),
+                    "queue_depth_by_priority": by_priority,
+                    "dispatched": state.dispatched,
+                    "throttled_429": state.throttled,
+                    "timeouts": state.timeouts,
+                    "avg_wait_ms": round(state.total_wait / state.dispatched * 1000, 2) if state.dispatched else 0.0,
+                    "max_wait_ms": round(state.max_wait * 1000, 2),
+                    "requests_available": round(max(state.requests.tokens, 0.0), 2),
+                    "tokens_available": int(max(state.tokens.tokens, 0.0))
+                }
+        return stats
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """
+    Obtener la instancia compartida del planificador de llamadas LLM
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler.from_config()
+    return _scheduler
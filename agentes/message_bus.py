@@ -1,29 +1,155 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+import asyncio
 import logging
+import time
+
+from config import BUS_CONFIG
 
 logger = logging.getLogger(__name__)
 
 # Registry of agents by name
 _AGENTS: Dict[str, Any] = {}
+# Mailbox per registered agent
+_MAILBOXES: Dict[str, "Mailbox"] = {}
+
+
+class Mailbox:
+    """Bounded mailbox with a fixed pool of workers for one agent.
+
+    Each queued item carries a future that the worker resolves with the agent's
+    reply, so callers get request/reply semantics while the agent processes at
+    most `workers` messages at a time. A full mailbox makes `deliver` wait
+    (backpressure) and makes `post` drop the message.
+    """
+
+    def __init__(self, name: str, agent: Any, workers: int, maxsize: int):
+        self.name = name
+        self.agent = agent
+        self.workers = workers
+        self.maxsize = maxsize
+        self.queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {
+            "delivered": 0,
+            "posted": 0,
+            "dropped": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "in_service": 0,
+            "total_service_time": 0.0,
+            "max_service_time": 0.0,
+            "total_queue_time": 0.0
+        }
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        if self.running:
+            return
+        self.queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.queue = None
+
+    async def _worker(self):
+        while True:
+            message, future, enqueued_at = await self.queue.get()
+            try:
+                if future is not None and future.done():
+                    # The caller gave up (timeout/cancel) while the message was queued
+                    continue
+                started = time.monotonic()
+                self.stats["total_queue_time"] += started - enqueued_at
+                self.stats["in_service"] += 1
+                try:
+                    response = await _receive(self.agent, message)
+                finally:
+                    self.stats["in_service"] -= 1
+                    elapsed = time.monotonic() - started
+                    self.stats["total_service_time"] += elapsed
+                    self.stats["max_service_time"] = max(self.stats["max_service_time"], elapsed)
+                    self.stats["delivered"] += 1
+                if response.get("status") == "error":
+                    self.stats["errors"] += 1
+                if future is not None and not future.done():
+                    future.set_result(response)
+            finally:
+                self.queue.task_done()
+
+    def get_stats(self) -> Dict[str, Any]:
+        delivered = self.stats["delivered"]
+        return {
+            "workers": self.workers,
+            "mailbox_size": self.maxsize,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "in_service": self.stats["in_service"],
+            "delivered": delivered,
+            "posted": self.stats["posted"],
+            "dropped": self.stats["dropped"],
+            "errors": self.stats["errors"],
+            "timeouts": self.stats["timeouts"],
+            "avg_service_ms": round(self.stats["total_service_time"] / delivered * 1000, 2) if delivered else 0.0,
+            "max_service_ms": round(self.stats["max_service_time"] * 1000, 2),
+            "avg_queue_ms": round(self.stats["total_queue_time"] / delivered * 1000, 2) if delivered else 0.0
+        }
+
+
+async def _receive(agent: Any, message: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        response = await agent.receive_message(message)
+        return response if response is not None else {"status": "delivered"}
+    except Exception as e:
+        logger.exception(f"message_bus: error delivering message to {message.get('to')}: {e}")
+        return {"status": "error", "error": str(e)}
+
 
 def register_agents(agent_map: Dict[str, Any]):
     """Register multiple agent instances by name."""
     for name, agent in agent_map.items():
-        _AGENTS[name] = agent
-        logger.info(f"message_bus: registered agent {name}")
+        register_agent(name, agent)
 
-def register_agent(name: str, agent: Any):
+def register_agent(name: str, agent: Any, workers: Optional[int] = None, mailbox_size: Optional[int] = None):
+    """Register an agent and its mailbox (workers/size default to BUS_CONFIG)."""
+    agent_config = BUS_CONFIG["agentes"].get(name, {})
     _AGENTS[name] = agent
+    _MAILBOXES[name] = Mailbox(
+        name,
+        agent,
+        workers=workers or agent_config.get("workers", BUS_CONFIG["workers_por_defecto"]),
+        maxsize=mailbox_size or agent_config.get("buzon_max", BUS_CONFIG["buzon_max"])
+    )
     logger.info(f"message_bus: registered agent {name}")
 
 def get_agent(name: str):
     return _AGENTS.get(name)
 
-def deliver(message: Dict[str, Any]) -> Dict[str, Any]:
+async def start():
+    """Start the mailbox workers of every registered agent on the running loop."""
+    for mailbox in _MAILBOXES.values():
+        mailbox.start()
+    logger.info(f"message_bus: {len(_MAILBOXES)} mailboxes started")
+
+async def stop():
+    """Stop all mailbox workers; pending messages are discarded."""
+    for mailbox in _MAILBOXES.values():
+        await mailbox.stop()
+
+async def deliver(message: Dict[str, Any]) -> Dict[str, Any]:
     """Deliver a message to the target agent and return its response.
 
     Message structure expected:
     {"from": "AgentA", "to": "AgentB", "protocol": "ACP", "type": "MSG_TYPE", "content": {...}}
+
+    When the bus is started the message goes through the agent's mailbox and the
+    caller awaits the reply future; otherwise it is processed inline. The delivery
+    timeout also bounds the wait for room in a full mailbox.
     """
     to = message.get("to")
     if not to:
@@ -34,9 +160,52 @@ def deliver(message: Dict[str, Any]) -> Dict[str, Any]:
         logger.warning(f"message_bus: agent '{to}' not found")
         return {"status": "error", "error": "agent_not_found", "agent": to}
 
+    mailbox = _MAILBOXES[to]
+    # Self-addressed messages bypass the mailbox: a busy worker pool would deadlock
+    if not mailbox.running or message.get("from") == to:
+        return await _receive(agent, message)
+
+    future = asyncio.get_running_loop().create_future()
+    enqueued = False
+
+    async def enqueue_and_wait():
+        nonlocal enqueued
+        await mailbox.queue.put((message, future, time.monotonic()))
+        enqueued = True
+        return await future
+
+    # One deadline covers waiting for room in a full mailbox and waiting for the reply
     try:
-        response = agent.receive_message(message)
-        return response if response is not None else {"status": "delivered"}
-    except Exception as e:
-        logger.exception(f"message_bus: error delivering message to {to}: {e}")
-        return {"status": "error", "error": str(e)}
+        return await asyncio.wait_for(enqueue_and_wait(), timeout=BUS_CONFIG["timeout_entrega_segundos"])
+    except asyncio.TimeoutError:
+        mailbox.stats["timeouts"] += 1
+        if not enqueued:
+            mailbox.stats["dropped"] += 1
+            logger.warning(f"message_bus: mailbox of {to} full, gave up delivering {message.get('type')}")
+            return {"status": "error", "error": "mailbox_full", "agent": to}
+        logger.warning(f"message_bus: timeout waiting for {to} to process {message.get('type')}")
+        return {"status": "error", "error": "timeout", "agent": to}
+
+def post(message: Dict[str, Any]) -> bool:
+    """Fire-and-forget delivery; returns False if the message was dropped."""
+    to = message.get("to")
+    mailbox = _MAILBOXES.get(to)
+    if mailbox is None:
+        logger.warning(f"message_bus: agent '{to}' not found")
+        return False
+    if not mailbox.running:
+        asyncio.get_running_loop().create_task(_receive(mailbox.agent, message))
+        mailbox.stats["posted"] += 1
+        return True
+    try:
+        mailbox.queue.put_nowait((message, None, time.monotonic()))
+    except asyncio.QueueFull:
+        mailbox.stats["dropped"] += 1
+        logger.warning(f"message_bus: mailbox of {to} full, dropping {message.get('type')}")
+        return False
+    mailbox.stats["posted"] += 1
+    return True
+
+def get_stats() -> Dict[str, Any]:
+    """Queue depth and service time per agent."""
+    return {name: mailbox.get_stats() for name, mailbox in _MAILBOXES.items()}
@@ -0,0 +1,126 @@
+"""
+Historial de mensajes acotado: ring buffer de registros compactos por agente
+"""
+
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Any, Iterator, List, Optional
+import hashlib
+import json
+import logging
+import os
+
+from config import HISTORY_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class MessageRecord:
+    """
+    Registro compacto de un mensaje: metadatos, tamaño y digest del contenido
+    El contenido solo se conserva si el historial se configura con keep_content
+    """
+
+    __slots__ = ("timestamp", "protocol", "message_type", "size", "digest", "content")
+
+    def __init__(self, timestamp: str, protocol: str, message_type: str, size: int,
+                 digest: str, content: Optional[Dict[str, Any]] = None):
+        self.timestamp = timestamp
+        self.protocol = protocol
+        self.message_type = message_type
+        self.size = size
+        self.digest = digest
+        self.content = content
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "timestamp": self.timestamp,
+            "protocol": self.protocol,
+            "message_type": self.message_type,
+            "size": self.size,
+            "digest": self.digest
+        }
+        if self.content is not None:
+            data["content"] = self.content
+        return data
+
+
+class MessageHistory:
+    """
+    Ring buffer de capacidad fija; los registros expulsados pueden volcarse
+    a un journal en disco con rotación por tamaño
+    """
+
+    def __init__(self, capacity: int, keep_content: bool = False, journal_path: Optional[str] = None,
+                 journal_max_bytes: int = 5 * 1024 * 1024, journal_backups: int = 3):
+        self.capacity = capacity
+        self.keep_content = keep_content
+        self.total_appended = 0
+        self._records: deque = deque(maxlen=capacity)
+        self._journal: Optional[logging.Logger] = None
+        if journal_path:
+            self._journal = self._open_journal(journal_path, journal_max_bytes, journal_backups)
+
+    @classmethod
+    def for_agent(cls, agent_name: str) -> "MessageHistory":
+        """
+        Crear el historial de un agente según HISTORY_CONFIG
+        """
+        journal_dir = HISTORY_CONFIG["journal_dir"]
+        return cls(
+            capacity=HISTORY_CONFIG["capacidad_por_agente"].get(agent_name, HISTORY_CONFIG["capacidad_por_defecto"]),
+            keep_content=HISTORY_CONFIG["guardar_contenido"],
+            journal_path=os.path.join(journal_dir, f"{agent_name.lower()}.jsonl") if journal_dir else None,
+            journal_max_bytes=HISTORY_CONFIG["journal_max_bytes"],
+            journal_backups=HISTORY_CONFIG["journal_backups"]
+        )
+
+    @staticmethod
+    def _open_journal(path: str, max_bytes: int, backups: int) -> Optional[logging.Logger]:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            journal = logging.getLogger(f"agent_journal.{os.path.abspath(path)}")
+            journal.propagate = False
+            journal.setLevel(logging.INFO)
+            if not journal.handlers:
+                handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                journal.addHandler(handler)
+            return journal
+        except Exception as e:
+            logger.warning(f"message_history: journal deshabilitado ({e})")
+            return None
+
+    def append(self, protocol: str, message_type: str, content: Any, serialized: Optional[str] = None) -> MessageRecord:
+        """
+        Agregar un registro; si el buffer está lleno se expulsa el más antiguo
+        """
+        if serialized is None:
+            serialized = json.dumps(content, default=str)
+        encoded = serialized.encode("utf-8")
+        record = MessageRecord(
+            timestamp=datetime.utcnow().isoformat(),
+            protocol=protocol,
+            message_type=message_type,
+            size=len(encoded),
+            digest=hashlib.blake2b(encoded, digest_size=8).hexdigest(),
+            content=content if self.keep_content else None
+        )
+        if self._journal is not None and len(self._records) == self.capacity:
+            self._journal.info(json.dumps(self._records[0].to_dict(), default=str))
+        self._records.append(record)
+        self.total_appended += 1
+        return record
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[MessageRecord]:
+        return iter(self._records)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [record.to_dict() for record in self._records]
+
+    def clear(self):
+        self._records.clear()
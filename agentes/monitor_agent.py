@@ -1,8 +1,15 @@
 from agentes.base_agent import BaseAgent
 from typing import Dict, Any, List
-from config import GEMINI_MODELS
+from config import GEMINI_MODELS, LLM_CACHE_CONFIG, LLM_SCHEDULER_CONFIG, MONITOR_CONFIG
 from datetime import datetime
+from typing import Optional
+from collections import deque
+import asyncio
 import json
+import logging
+import random
+
+logger = logging.getLogger(__name__)
 
 class MonitorAgent(BaseAgent):
     """
@@ -14,12 +21,24 @@ class MonitorAgent(BaseAgent):
         super().__init__(
             name="Monitor",
             model_name=GEMINI_MODELS["monitor"],
-            role="Supervisar tráfico y estado del sistema multiagente"
+            role="Supervisar tráfico y estado del sistema multiagente",
+            cache_ttl=LLM_CACHE_CONFIG["ttl_por_agente"]["monitor"],
+            priority=LLM_SCHEDULER_CONFIG["prioridades"]["monitor"]
         )
         self.agent_status = {}
-        self.message_queue = []
+        self.message_queue = deque(maxlen=MONITOR_CONFIG["cola_mensajes_max"])
+        # Pipeline de ingesta en segundo plano (se arranca con start_ingestion)
+        self._ingest_queue: Optional[asyncio.Queue] = None
+        self._ingest_worker: Optional[asyncio.Task] = None
+        self.last_distribution_analysis: Optional[Dict[str, Any]] = None
+        self.ingest_stats = {
+            "recibidas": 0,
+            "descartadas": 0,
+            "analizadas_ia": 0,
+            "lotes_ia": 0
+        }
     
-    def process_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+    async def process_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """
         Procesar mensajes recibidos
         """
@@ -27,28 +46,47 @@ class MonitorAgent(BaseAgent):
         content = message.get("content")
         
         if msg_type == "TASK_DISTRIBUTION":
-            return self.monitor_task_distribution(content)
+            return await self.monitor_task_distribution(content)
         elif msg_type == "AGENT_STATUS":
             return self.update_agent_status(content)
         elif msg_type == "SYSTEM_HEALTH_CHECK":
-            return self.check_system_health()
+            return await self.check_system_health()
         elif msg_type == "EXECUTE_TASK":
             # Soporte para tareas del Planificador
             task = content.get("task") if isinstance(content, dict) else None
             if task and task.get("tipo") in ["registrar_actividad", "monitorear_sistema"]:
-                return self.check_system_health()
+                return await self.check_system_health()
             return {"status": "task_executed", "task": task}
         else:
             return {"status": "unknown_message_type", "type": msg_type}
     
-    def monitor_task_distribution(self, distribution: Dict[str, Any]) -> Dict[str, Any]:
+    async def monitor_task_distribution(self, distribution: Dict[str, Any]) -> Dict[str, Any]:
         """
         Monitorear distribución de tareas entre agentes
+        Solo registra y encola: el análisis con IA ocurre en segundo plano
+        """
+        log_entry = self._register_distribution(distribution)
+        self.ingest_stats["recibidas"] += 1
+        
+        if self._ingest_queue is not None and self._should_analyze():
+            try:
+                self._ingest_queue.put_nowait(distribution)
+            except asyncio.QueueFull:
+                # Nunca se bloquea al llamador por telemetría
+                self.ingest_stats["descartadas"] += 1
+        
+        return {
+            "status": "distribution_queued",
+            "log_entry": log_entry
+        }
+    
+    def _register_distribution(self, distribution: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Registrar distribución (operación barata, sin IA)
         """
         subtareas = distribution.get("subtareas", [])
         estrategia = distribution.get("estrategia")
         
-        # Registrar distribución
         log_entry = {
             "timestamp": datetime.utcnow().isoformat(),
             "tipo": "task_distribution",
@@ -58,12 +96,79 @@ class MonitorAgent(BaseAgent):
         }
         
         self.message_queue.append(log_entry)
+        return log_entry
+    
+    def _should_analyze(self) -> bool:
+        """
+        Muestreo: solo una fracción de las distribuciones recibe comentario de IA
+        """
+        return MONITOR_CONFIG["analisis_ia"] and random.random() < MONITOR_CONFIG["tasa_muestreo"]
+    
+    async def start_ingestion(self):
+        """
+        Arrancar el worker de ingesta en el event loop actual
+        """
+        if self._ingest_worker is not None:
+            return
+        self._ingest_queue = asyncio.Queue(maxsize=MONITOR_CONFIG["cola_max"])
+        self._ingest_worker = asyncio.create_task(self._ingestion_loop())
+        logger.info("Monitor: pipeline de ingesta iniciado")
+    
+    async def stop_ingestion(self):
+        """
+        Detener el worker de ingesta descartando lo pendiente
+        """
+        if self._ingest_worker is None:
+            return
+        self._ingest_worker.cancel()
+        try:
+            await self._ingest_worker
+        except asyncio.CancelledError:
+            pass
+        self._ingest_worker = None
+        self._ingest_queue = None
+    
+    async def _ingestion_loop(self):
+        """
+        Agrupar distribuciones en lotes y analizarlas con una sola llamada a IA
+        """
+        batch_size = MONITOR_CONFIG["tamano_lote"]
+        batch_wait = MONITOR_CONFIG["espera_lote_segundos"]
+        while True:
+            batch = [await self._ingest_queue.get()]
+            deadline = asyncio.get_running_loop().time() + batch_wait
+            while len(batch) < batch_size:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._ingest_queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._analyze_distributions(batch)
+            except Exception as e:
+                logger.error(f"Monitor: error analizando lote de distribuciones: {e}")
+    
+    async def _analyze_distributions(self, batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Analizar la carga de trabajo de un lote de distribuciones
+        """
+        resumen = [
+            {
+                "estrategia": d.get("estrategia"),
+                "subtareas": [
+                    {"tipo": t.get("tipo"), "agente": t.get("agente"), "depends_on": t.get("depends_on", [])}
+                    for t in d.get("subtareas", [])
+                ]
+            }
+            for d in batch
+        ]
         
-        # Analizar carga de trabajo
         prompt = f"""
-        Analiza la distribución de tareas:
+        Analiza la distribución de tareas de {len(batch)} planes recientes:
         
-        {json.dumps(distribution, indent=2)}
+        {json.dumps(resumen, indent=2)}
         
         Determina:
         1. Está balanceada la carga?
@@ -74,7 +179,7 @@ class MonitorAgent(BaseAgent):
         Devuelve JSON con análisis y recomendaciones.
         """
         
-        response = self.generate_with_ai(prompt, temperature=0.4)
+        response = await self.agenerate_with_ai(prompt, temperature=0.4)
         
         try:
             analisis = json.loads(response)
@@ -82,15 +187,17 @@ class MonitorAgent(BaseAgent):
             analisis = {
                 "balanceada": True,
                 "cuellos_botella": [],
-                "orden_sugerido": subtareas,
                 "estimacion_minutos": 5
             }
         
-        return {
-            "status": "distribution_monitored",
-            "analisis": analisis,
-            "log_entry": log_entry
+        self.ingest_stats["analizadas_ia"] += len(batch)
+        self.ingest_stats["lotes_ia"] += 1
+        self.last_distribution_analysis = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "planes_analizados": len(batch),
+            "analisis": analisis
         }
+        return self.last_distribution_analysis
     
     def update_agent_status(self, status: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -111,7 +218,7 @@ class MonitorAgent(BaseAgent):
             "estado": estado
         }
     
-    def check_system_health(self) -> Dict[str, Any]:
+    async def check_system_health(self) -> Dict[str, Any]:
         """
         Verificar salud general del sistema
         """
@@ -132,7 +239,7 @@ class MonitorAgent(BaseAgent):
         Devuelve JSON.
         """
         
-        response = self.generate_with_ai(prompt, temperature=0.3)
+        response = await self.agenerate_with_ai(prompt, temperature=0.3)
         
         try:
             health = json.loads(response)
@@ -162,10 +269,15 @@ class MonitorAgent(BaseAgent):
             "agentes_activos": active_agents,
             "agentes_total": len(self.agent_status),
             "ultima_actividad": datetime.utcnow().isoformat(),
-            "cola_mensajes": self.message_queue[-10:]  # Últimos 10 mensajes
+            "cola_mensajes": list(self.message_queue)[-10:],  # Últimos 10 mensajes
+            "ingesta": {
+                **self.ingest_stats,
+                "pendientes": self._ingest_queue.qsize() if self._ingest_queue is not None else 0
+            },
+            "ultimo_analisis_distribucion": self.last_distribution_analysis
         }
     
-    def analyze_communication_flow(self) -> Dict[str, Any]:
+    async def analyze_communication_flow(self) -> Dict[str, Any]:
         """
         Analizar flujo de comunicación entre agentes
         """
@@ -184,7 +296,7 @@ class MonitorAgent(BaseAgent):
         Devuelve análisis en JSON.
         """
         
-        response = self.generate_with_ai(prompt, temperature=0.5)
+        response = await self.agenerate_with_ai(prompt, temperature=0.5)
         
         return {
             "status": "flow_analyzed",
@@ -196,7 +308,7 @@ class MonitorAgent(BaseAgent):
         Limpiar cola de mensajes
         """
         old_count = len(self.message_queue)
-        self.message_queue = []
+        self.message_queue.clear()
         
         return {
             "status": "queue_cleared",
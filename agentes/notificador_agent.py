@@ -1,9 +1,20 @@
 from agentes.base_agent import BaseAgent
 from typing import Dict, Any, List
-from config import GEMINI_MODELS, FINANCE_CONFIG
+from config import GEMINI_MODELS, LLM_CACHE_CONFIG, LLM_SCHEDULER_CONFIG, FINANCE_CONFIG
+from models import Alerta, NivelAlerta, EstadoAlerta
+from servicios.escritor_lotes import get_escritor
 from datetime import datetime
 import json
 
+# Tipos de alerta que se guardan en la tabla alertas; el resto (p. ej. el aviso
+# de tarea completada del Planificador) solo se muestra en la Interfaz
+TIPOS_ALERTA_PERSISTIDOS = {
+    "presupuesto_cerca_limite",
+    "presupuesto_excedido",
+    "gasto_inusual",
+    "gastos_inusuales_importacion"
+}
+
 class NotificadorAgent(BaseAgent):
     """
     Agente Notificador: Envía alertas y notificaciones sobre estado financiero
@@ -14,11 +25,14 @@ class NotificadorAgent(BaseAgent):
         super().__init__(
             name="Notificador",
             model_name=GEMINI_MODELS["notificador"],
-            role="Generar y enviar alertas financieras"
+            role="Generar y enviar alertas financieras",
+            cache_ttl=LLM_CACHE_CONFIG["ttl_por_agente"]["notificador"],
+            priority=LLM_SCHEDULER_CONFIG["prioridades"]["notificador"]
         )
         self.alert_threshold = FINANCE_CONFIG["alert_threshold_percentage"]
+        self.alert_writer = get_escritor("alertas", Alerta.__table__)
     
-    def process_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+    async def process_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """
         Procesar mensajes recibidos
         """
@@ -26,7 +40,7 @@ class NotificadorAgent(BaseAgent):
         content = message.get("content")
         
         if msg_type == "ALERT_REQUIRED":
-            return self.create_alert(content)
+            return await self.create_alert(content)
         elif msg_type == "SEND_NOTIFICATION":
             return self.send_notification(content)
         elif msg_type == "EXECUTE_TASK":
@@ -35,12 +49,12 @@ class NotificadorAgent(BaseAgent):
             if task and task.get("tipo") in ["generar_alertas", "enviar_notificaciones"]:
                 context = content.get("context") if isinstance(content, dict) else None
                 usuario_id = task.get("usuario_id") or (context.get("usuario_id") if context else None)
-                return self.create_alert({"usuario_id": usuario_id, "tipo": "tarea_completada", "datos": task})
+                return await self.create_alert({"usuario_id": usuario_id, "tipo": "tarea_completada", "datos": task})
             return {"status": "task_executed", "task": task}
         else:
             return {"status": "unknown_message_type", "type": msg_type}
     
-    def create_alert(self, alert_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def create_alert(self, alert_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Crear alerta basada en condiciones financieras
         Usa A2A para comunicación con otros agentes
@@ -71,7 +85,7 @@ class NotificadorAgent(BaseAgent):
         }}
         """
         
-        response = self.generate_with_ai(prompt, temperature=0.6)
+        response = await self.agenerate_with_ai(prompt, temperature=0.6)
         
         try:
             alerta = json.loads(response)
@@ -83,8 +97,11 @@ class NotificadorAgent(BaseAgent):
                 "recomendacion": "Revisar situación financiera"
             }
         
+        # Guardar en la tabla alertas en segundo plano (no bloquea a quien la originó)
+        persistida = self._persist_alert(usuario_id, tipo, datos, alerta)
+        
         # Enviar alerta a Interfaz usando AGUI
-        self.send_message(
+        await self.send_message(
             to_agent="Interfaz",
             protocol="AGUI",
             message_type="DISPLAY_ALERT",
@@ -98,10 +115,35 @@ class NotificadorAgent(BaseAgent):
         return {
             "status": "alert_created",
             "alerta": alerta,
+            "persistida": persistida,
             "protocol_used": "A2A"
         }
     
-    def generate_notification(self, notif_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _persist_alert(self, usuario_id: Any, tipo: Any, datos: Any, alerta: Dict[str, Any]) -> bool:
+        """
+        Encolar la alerta para el escritor por lotes de la tabla alertas (solo tipos persistidos)
+        """
+        if usuario_id is None or tipo not in TIPOS_ALERTA_PERSISTIDOS or not isinstance(alerta, dict):
+            return False
+        try:
+            nivel = NivelAlerta(str(alerta.get("nivel", "")).lower())
+        except ValueError:
+            nivel = NivelAlerta.WARNING
+        extra = {"tipo": tipo, "datos": datos}
+        if alerta.get("recomendacion"):
+            extra["recomendacion"] = alerta["recomendacion"]
+        return self.alert_writer.encolar({
+            "usuario_id": usuario_id,
+            "nivel": nivel,
+            "estado": EstadoAlerta.PENDIENTE,
+            "titulo": str(alerta.get("titulo") or f"Alerta: {tipo}")[:200],
+            "mensaje": str(alerta.get("mensaje") or ""),
+            "datos_extra": json.dumps(extra, separators=(",", ":"), ensure_ascii=False, default=str),
+            "creado_en": datetime.utcnow(),
+            "leido_en": None
+        }, prioritaria=True)
+    
+    async def generate_notification(self, notif_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Generar notificación informativa
         """
@@ -119,7 +161,7 @@ class NotificadorAgent(BaseAgent):
         Máximo 200 caracteres.
         """
         
-        response = self.generate_with_ai(prompt, temperature=0.7)
+        response = await self.agenerate_with_ai(prompt, temperature=0.7)
         
         notificacion = {
             "tipo": "info",
@@ -132,7 +174,7 @@ class NotificadorAgent(BaseAgent):
             "notificacion": notificacion
         }
     
-    def check_budget_alerts(self, presupuestos: List[Dict[str, Any]], usuario_id: int) -> List[Dict[str, Any]]:
+    async def check_budget_alerts(self, presupuestos: List[Dict[str, Any]], usuario_id: int) -> List[Dict[str, Any]]:
         """
         Verificar si hay presupuestos que requieren alertas
         """
@@ -142,7 +184,7 @@ class NotificadorAgent(BaseAgent):
             porcentaje = (presupuesto.get("gastado", 0) / presupuesto.get("limite", 1)) * 100
             
             if porcentaje >= self.alert_threshold:
-                alerta = self.create_alert({
+                alerta = await self.create_alert({
                     "usuario_id": usuario_id,
                     "tipo": "presupuesto_cerca_limite",
                     "datos": {
@@ -156,7 +198,7 @@ class NotificadorAgent(BaseAgent):
         
         return alertas
     
-    def send_savings_recommendation(self, usuario_id: int, analisis: Dict[str, Any]) -> Dict[str, Any]:
+    async def send_savings_recommendation(self, usuario_id: int, analisis: Dict[str, Any]) -> Dict[str, Any]:
         """
         Enviar recomendación de ahorro basada en análisis
         """
@@ -174,9 +216,9 @@ class NotificadorAgent(BaseAgent):
         Devuelve mensaje de máximo 250 caracteres.
         """
         
-        response = self.generate_with_ai(prompt, temperature=0.7)
+        response = await self.agenerate_with_ai(prompt, temperature=0.7)
         
-        return self.generate_notification({
+        return await self.generate_notification({
             "usuario_id": usuario_id,
             "evento": "recomendacion_ahorro",
             "contexto": {"mensaje": response}
@@ -0,0 +1,120 @@
+"""
+Ejecución concurrente de planes como grafo de dependencias (DAG)
+"""
+
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# dispatch(tarea, resultados_dependencias) -> respuesta del agente
+Dispatcher = Callable[[Dict[str, Any], Dict[Any, Any]], Awaitable[Dict[str, Any]]]
+
+
+def _find_cyclic(subtareas: List[Dict[str, Any]]) -> set:
+    """
+    Devolver los ids de subtareas que forman parte de un ciclo (o dependen de uno)
+    """
+    ids = {t.get("id") for t in subtareas}
+    pending = {t.get("id"): {d for d in t.get("depends_on") or [] if d in ids} for t in subtareas}
+    ready = [tid for tid, deps in pending.items() if not deps]
+    resolved = set()
+    while ready:
+        tid = ready.pop()
+        resolved.add(tid)
+        for other, deps in pending.items():
+            if tid in deps:
+                deps.discard(tid)
+                if not deps and other not in resolved and other not in ready:
+                    ready.append(other)
+    return ids - resolved
+
+
+async def execute_plan(
+    subtareas: List[Dict[str, Any]],
+    dispatch: Dispatcher,
+    default_timeout: float,
+    max_concurrency: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Ejecutar las subtareas respetando `depends_on` y en paralelo cuando son independientes
+
+    - Cada subtarea espera solo a sus dependencias y luego se despacha
+    - Timeout por subtarea (`timeout_segundos` en la subtarea o el valor por defecto)
+    - Si una dependencia falla o expira, la subtarea dependiente se omite
+    - Los resultados se devuelven en el orden original del plan
+    """
+    for index, tarea in enumerate(subtareas):
+        tarea.setdefault("id", index + 1)
+    if len({t.get("id") for t in subtareas}) != len(subtareas):
+        # Ids repetidos: las dependencias son ambiguas, se ejecuta todo en paralelo
+        logger.warning("plan_executor: ids de subtarea repetidos; se ignoran las dependencias")
+        for index, tarea in enumerate(subtareas):
+            tarea["id"] = index + 1
+            tarea.pop("depends_on", None)
+
+    cyclic = _find_cyclic(subtareas)
+    if cyclic:
+        logger.warning(f"plan_executor: dependencias cíclicas en subtareas {sorted(cyclic, key=str)}")
+
+    ids = {t.get("id") for t in subtareas}
+    futures: Dict[Any, asyncio.Future] = {}
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async def run(tarea: Dict[str, Any]) -> Dict[str, Any]:
+        tid = tarea.get("id")
+        if tid in cyclic:
+            return {"tarea": tarea, "response": {"status": "error", "error": "dependencia_ciclica"}}
+
+        deps = [d for d in tarea.get("depends_on") or [] if d in ids and d != tid]
+        dep_results: Dict[Any, Any] = {}
+        for dep in deps:
+            dep_entry = await futures[dep]
+            if not dep_entry.get("ok"):
+                return {
+                    "tarea": tarea,
+                    "response": {"status": "skipped", "error": "dependencia_fallida", "dependencia": dep}
+                }
+            dep_results[dep] = dep_entry.get("response")
+
+        timeout = tarea.get("timeout_segundos") or default_timeout
+        started = time.monotonic()
+        try:
+            if semaphore:
+                async with semaphore:
+                    response = await asyncio.wait_for(dispatch(tarea, dep_results), timeout=timeout)
+            else:
+                response = await asyncio.wait_for(dispatch(tarea, dep_results), timeout=timeout)
+            ok = not (isinstance(response, dict) and response.get("status") == "error")
+        except asyncio.TimeoutError:
+            logger.warning(f"plan_executor: subtarea {tid} ({tarea.get('tipo')}) excedió {timeout}s")
+            response = {"status": "error", "error": "timeout", "timeout_segundos": timeout}
+            ok = False
+        except Exception as e:
+            logger.exception(f"plan_executor: error en subtarea {tid}: {e}")
+            response = {"status": "error", "error": str(e)}
+            ok = False
+
+        return {
+            "tarea": tarea,
+            "response": response,
+            "duracion_ms": round((time.monotonic() - started) * 1000, 2),
+            "ok": ok
+        }
+
+    async def run_and_publish(tarea: Dict[str, Any]) -> Dict[str, Any]:
+        entry = await run(tarea)
+        entry.setdefault("ok", False)
+        futures[tarea.get("id")].set_result(entry)
+        return entry
+
+    loop = asyncio.get_running_loop()
+    for tarea in subtareas:
+        futures[tarea.get("id")] = loop.create_future()
+
+    results = await asyncio.gather(*(run_and_publish(t) for t in subtareas))
+    for entry in results:
+        entry.pop("ok", None)
+    return list(results)
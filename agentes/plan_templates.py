@@ -0,0 +1,67 @@
+"""
+Plantillas de plan precompiladas para los objetivos fijos de la API
+
+Los endpoints de análisis envían siempre los mismos objetivos; para ellos el
+plan es conocido de antemano y no hace falta pedírselo a Gemini.
+"""
+
+from typing import Dict, Any, Optional
+import copy
+
+PLAN_TEMPLATES: Dict[str, Dict[str, Any]] = {
+    "calcular_balance": {
+        "subtareas": [
+            {"id": 1, "tipo": "calcular_balance", "descripcion": "Calcular balance financiero del usuario", "agente": "Ejecutor", "prioridad": "alta", "depends_on": []},
+            {"id": 2, "tipo": "recopilar_transacciones", "descripcion": "Obtener historial de transacciones del período", "agente": "KnowledgeBase", "prioridad": "media", "depends_on": []}
+        ],
+        "estrategia": "Cálculo de balance con datos reales y consulta del historial en paralelo"
+    },
+    "verificar_presupuestos": {
+        "subtareas": [
+            {"id": 1, "tipo": "verificar_presupuestos", "descripcion": "Verificar estado de los presupuestos del mes", "agente": "Ejecutor", "prioridad": "alta", "depends_on": []}
+        ],
+        "estrategia": "Verificación de presupuestos del mes actual; el Ejecutor notifica los críticos"
+    },
+    "obtener_recomendaciones": {
+        "subtareas": [
+            {"id": 1, "tipo": "analizar_patrones", "descripcion": "Analizar patrones de gasto con datos reales", "agente": "KnowledgeBase", "prioridad": "alta", "depends_on": []},
+            {"id": 2, "tipo": "calcular_balance", "descripcion": "Calcular balance y recomendaciones del período", "agente": "Ejecutor", "prioridad": "alta", "depends_on": []}
+        ],
+        "estrategia": "Recomendaciones basadas en patrones históricos y balance del período"
+    },
+    "analisis_financiero_completo": {
+        "subtareas": [
+            {"id": 1, "tipo": "calcular_balance", "descripcion": "Calcular balance actual", "agente": "Ejecutor", "prioridad": "alta", "depends_on": []},
+            {"id": 2, "tipo": "verificar_presupuestos", "descripcion": "Verificar estado de presupuestos", "agente": "Ejecutor", "prioridad": "media", "depends_on": []},
+            {"id": 3, "tipo": "consultar_historico", "descripcion": "Consultar patrones históricos", "agente": "KnowledgeBase", "prioridad": "media", "depends_on": []}
+        ],
+        "estrategia": "Análisis financiero completo: balance, presupuestos e histórico en paralelo"
+    }
+}
+
+# Objetivos equivalentes que comparten plantilla
+PLAN_ALIASES: Dict[str, str] = {
+    "optimizar_gastos": "obtener_recomendaciones"
+}
+
+
+def get_plan_template(objetivo: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Devolver una copia del plan precompilado para el objetivo, o None si es libre
+    """
+    if not objetivo:
+        return None
+    template = PLAN_TEMPLATES.get(PLAN_ALIASES.get(objetivo, objetivo))
+    if template is None:
+        return None
+    # Copia profunda: los agentes enriquecen las subtareas durante la ejecución
+    plan = copy.deepcopy(template)
+    plan["origen"] = "plantilla"
+    return plan
+
+
+def register_plan_template(objetivo: str, plan: Dict[str, Any]):
+    """
+    Registrar (o reemplazar) la plantilla de un objetivo
+    """
+    PLAN_TEMPLATES[objetivo] = plan
@@ -1,6 +1,8 @@
 from agentes.base_agent import BaseAgent
 from typing import Dict, Any, List
-from config import GEMINI_MODELS
+from config import GEMINI_MODELS, LLM_CACHE_CONFIG, LLM_SCHEDULER_CONFIG, PLANNER_CONFIG
+from agentes.plan_executor import execute_plan
+from agentes.plan_templates import get_plan_template
 import json
 
 class PlanificadorAgent(BaseAgent):
@@ -13,10 +15,12 @@ class PlanificadorAgent(BaseAgent):
         super().__init__(
             name="Planificador",
             model_name=GEMINI_MODELS["planificador"],
-            role="Descomponer tareas financieras en subtareas y coordinar agentes"
+            role="Descomponer tareas financieras en subtareas y coordinar agentes",
+            cache_ttl=LLM_CACHE_CONFIG["ttl_por_agente"]["planificador"],
+            priority=LLM_SCHEDULER_CONFIG["prioridades"]["planificador"]
         )
     
-    def process_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+    async def process_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """
         Procesar mensajes recibidos
         """
@@ -24,13 +28,13 @@ class PlanificadorAgent(BaseAgent):
         content = message.get("content")
         
         if msg_type == "REQUEST_PLAN":
-            return self.create_financial_plan(content)
+            return await self.create_financial_plan(content)
         elif msg_type == "TASK_COMPLETED":
             return self.handle_task_completion(content)
         else:
             return {"status": "unknown_message_type", "type": msg_type}
     
-    def create_financial_plan(self, request: Dict[str, Any]) -> Dict[str, Any]:
+    async def create_financial_plan(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """
         Crear plan financiero desglosado en subtareas
         Usa ANP (Agent Negotiation Protocol) para negociar distribución de tareas
@@ -38,11 +42,65 @@ class PlanificadorAgent(BaseAgent):
         usuario_id = request.get("usuario_id")
         objetivo = request.get("objetivo", "analizar_finanzas")
         
+        # Objetivos conocidos usan un plan precompilado: sin llamada al LLM
+        plan = get_plan_template(objetivo)
+        if plan is None:
+            plan = await self._generate_plan_with_ai(objetivo)
+        
+        # Enviar subtareas a los agentes correspondientes usando ANP
+        # Las subtareas independientes se ejecutan en paralelo; depends_on define el orden
+        subtareas = plan.get("subtareas", []) if isinstance(plan, dict) else []
+        subtareas = [t for t in subtareas if isinstance(t, dict) and t.get("agente")]
+        estrategia = plan.get("estrategia") if isinstance(plan, dict) else None
+        
+        async def dispatch(tarea: Dict[str, Any], resultados_dependencias: Dict[Any, Any]) -> Dict[str, Any]:
+            content = {
+                "task": tarea,
+                "plan_estrategia": estrategia,
+                "context": request
+            }
+            if resultados_dependencias:
+                content["resultados_dependencias"] = resultados_dependencias
+            return await self.send_message(
+                to_agent=tarea.get("agente"),
+                protocol="ANP",
+                message_type="EXECUTE_TASK",
+                content=content
+            )
+        
+        for tarea in subtareas:
+            # El prompt es común a todos los usuarios; el usuario se asigna aquí
+            tarea.setdefault("usuario_id", usuario_id)
+        task_results = await execute_plan(
+            subtareas,
+            dispatch,
+            default_timeout=PLANNER_CONFIG["subtask_timeout_seconds"],
+            max_concurrency=PLANNER_CONFIG["max_concurrent_subtasks"]
+        )
+
+        # También notificar al Monitor sobre la distribución (sin esperar respuesta)
+        self.post_message(
+            to_agent="Monitor",
+            protocol="ANP",
+            message_type="TASK_DISTRIBUTION",
+            content=plan
+        )
+        
+        return {
+            "status": "plan_created",
+            "plan": plan,
+            "task_results": task_results,
+            "protocol_used": "ANP"
+        }
+    
+    async def _generate_plan_with_ai(self, objetivo: str) -> Dict[str, Any]:
+        """
+        Pedir a Gemini la descomposición de un objetivo libre en subtareas
+        """
         prompt = f"""
         Eres un planificador financiero experto. Descompón la siguiente tarea en subtareas específicas:
         
         Objetivo: {objetivo}
-        Usuario ID: {usuario_id}
         
         AGENTES DISPONIBLES (usa EXACTAMENTE estos nombres):
         - Ejecutor: Realiza cálculos financieros, balances, verificación de presupuestos
@@ -62,19 +120,21 @@ class PlanificadorAgent(BaseAgent):
         1. Usa SOLO los nombres de agentes listados arriba (exactamente como aparecen)
         2. Cada subtarea debe asignarse a UN agente existente
         3. Responde SOLO con un objeto JSON válido, sin markdown, sin ```json
+        4. "depends_on" es opcional: lista los ids de subtareas cuyo resultado se necesita.
+           Las subtareas sin dependencias se ejecutan en paralelo; no agregues dependencias innecesarias.
         
         Formato JSON requerido:
         {{
             "subtareas": [
-                {{"id": 1, "tipo": "calcular_balance", "descripcion": "Calcular balance financiero del usuario", "agente": "Ejecutor", "prioridad": "alta"}},
-                {{"id": 2, "tipo": "recopilar_transacciones", "descripcion": "Obtener historial de transacciones", "agente": "KnowledgeBase", "prioridad": "alta"}},
-                {{"id": 3, "tipo": "generar_alertas", "descripcion": "Generar alertas si hay anomalías", "agente": "Notificador", "prioridad": "media"}}
+                {{"id": 1, "tipo": "calcular_balance", "descripcion": "Calcular balance financiero del usuario", "agente": "Ejecutor", "prioridad": "alta", "depends_on": []}},
+                {{"id": 2, "tipo": "recopilar_transacciones", "descripcion": "Obtener historial de transacciones", "agente": "KnowledgeBase", "prioridad": "alta", "depends_on": []}},
+                {{"id": 3, "tipo": "generar_alertas", "descripcion": "Generar alertas si hay anomalías", "agente": "Notificador", "prioridad": "media", "depends_on": []}}
             ],
             "estrategia": "descripción de la estrategia general"
         }}
         """
         
-        response = self.generate_with_ai(prompt, temperature=0.5)
+        response = await self.agenerate_with_ai(prompt, temperature=0.5)
         
         try:
             # Intentar parsear la respuesta como JSON
@@ -91,40 +151,7 @@ class PlanificadorAgent(BaseAgent):
                 "respuesta_ia": response
             }
         
-        # Enviar subtareas a los agentes correspondientes usando ANP
-        # Distribuir cada subtarea al agente indicado en el plan
-        subtareas = plan.get("subtareas", []) if isinstance(plan, dict) else []
-        task_results = []
-        for tarea in subtareas:
-            agente_destino = tarea.get("agente")
-            if agente_destino:
-                # Enviar ejecución de tarea al agente destino y recoger respuesta
-                response = self.send_message(
-                    to_agent=agente_destino,
-                    protocol="ANP",
-                    message_type="EXECUTE_TASK",
-                    content={
-                        "task": tarea,
-                        "plan_estrategia": plan.get("estrategia") if isinstance(plan, dict) else None,
-                        "context": request
-                    }
-                )
-                task_results.append({"tarea": tarea, "response": response})
-
-        # También notificar al Monitor sobre la distribución
-        self.send_message(
-            to_agent="Monitor",
-            protocol="ANP",
-            message_type="TASK_DISTRIBUTION",
-            content=plan
-        )
-        
-        return {
-            "status": "plan_created",
-            "plan": plan,
-            "task_results": task_results,
-            "protocol_used": "ANP"
-        }
+        return plan
     
     def handle_task_completion(self, completion: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -139,20 +166,20 @@ class PlanificadorAgent(BaseAgent):
             "next_step": "continue_execution"
         }
     
-    def plan_budget_analysis(self, usuario_id: int, mes: int, anio: int) -> Dict[str, Any]:
+    async def plan_budget_analysis(self, usuario_id: int, mes: int, anio: int) -> Dict[str, Any]:
         """
         Planificar análisis de presupuesto mensual
         """
-        return self.create_financial_plan({
+        return await self.create_financial_plan({
             "usuario_id": usuario_id,
             "objetivo": f"analizar_presupuesto_mensual_{mes}_{anio}"
         })
     
-    def plan_savings_strategy(self, usuario_id: int, objetivo_ahorro: float) -> Dict[str, Any]:
+    async def plan_savings_strategy(self, usuario_id: int, objetivo_ahorro: float) -> Dict[str, Any]:
         """
         Planificar estrategia de ahorro
         """
-        return self.create_financial_plan({
+        return await self.create_financial_plan({
             "usuario_id": usuario_id,
             "objetivo": f"crear_estrategia_ahorro_{objetivo_ahorro}"
         })
@@ -0,0 +1,57 @@
+"""
+Coalescencia "single-flight" de llamadas asíncronas idénticas en vuelo
+"""
+
+from typing import Dict, Any, Awaitable, Callable
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas concurrentes con la misma clave en una sola ejecución
+
+    El primer llamador (líder) lanza la corrutina como tarea independiente;
+    los siguientes con la misma clave esperan esa misma tarea y reciben su
+    resultado (o su excepción). Si un llamador se cancela, la tarea compartida
+    sigue corriendo para los demás.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats_counters = {
+            "leaders": 0,
+            "followers": 0
+        }
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Ejecutar fn() una sola vez por clave mientras haya una llamada en vuelo
+        """
+        task = self._inflight.get(key)
+        if task is not None and not task.done():
+            self.stats_counters["followers"] += 1
+        else:
+            self.stats_counters["leaders"] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Marcar la excepción como consumida aunque todos los llamadores se hayan cancelado
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"single_flight: llamada '{key[:40]}' terminó con error: {task.exception()}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtener métricas de coalescencia
+        """
+        return {
+            **self.stats_counters,
+            "in_flight": len(self._inflight)
+        }
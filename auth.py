@@ -7,9 +7,12 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, get_async_db
 from models import Usuario
+import asyncio
 import os
 
 # Configuración
@@ -52,11 +55,18 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[Usuari
         return None
     return usuario
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> Usuario:
-    """Obtener usuario actual desde el token"""
+async def authenticate_user_async(db: AsyncSession, email: str, password: str) -> Optional[Usuario]:
+    """Autenticar usuario con sesión asíncrona (bcrypt se ejecuta fuera del event loop)"""
+    result = await db.execute(select(Usuario).where(Usuario.email == email))
+    usuario = result.scalars().first()
+    if not usuario:
+        return None
+    if not await asyncio.to_thread(verify_password, password, usuario.password_hash):
+        return None
+    return usuario
+
+def _email_from_token(token: str) -> str:
+    """Extraer el email (sub) del token o lanzar 401"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudo validar las credenciales",
@@ -70,10 +80,16 @@ async def get_current_user(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    usuario = db.query(Usuario).filter(Usuario.email == email).first()
+    return email
+
+def _check_user(usuario: Optional[Usuario]) -> Usuario:
+    """Validar que el usuario del token exista y esté activo"""
     if usuario is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="No se pudo validar las credenciales",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
     if not usuario.activo:
         raise HTTPException(
@@ -83,6 +99,24 @@ async def get_current_user(
     
     return usuario
 
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> Usuario:
+    """Obtener usuario actual desde el token"""
+    email = _email_from_token(token)
+    usuario = db.query(Usuario).filter(Usuario.email == email).first()
+    return _check_user(usuario)
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> Usuario:
+    """Obtener usuario actual desde el token con sesión asíncrona"""
+    email = _email_from_token(token)
+    result = await db.execute(select(Usuario).where(Usuario.email == email))
+    return _check_user(result.scalars().first())
+
 async def get_current_active_user(
     current_user: Usuario = Depends(get_current_user)
 ) -> Usuario:
@@ -90,3 +124,11 @@ async def get_current_active_user(
     if not current_user.activo:
         raise HTTPException(status_code=400, detail="Usuario inactivo")
     return current_user
+
+async def get_current_active_user_async(
+    current_user: Usuario = Depends(get_current_user_async)
+) -> Usuario:
+    """Verificar que el usuario esté activo (variante asíncrona)"""
+    if not current_user.activo:
+        raise HTTPException(status_code=400, detail="Usuario inactivo")
+    return current_user
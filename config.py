@@ -59,3 +59,225 @@ FINANCE_CONFIG = {
     "max_transactions_per_query": 100,
     "analysis_period_days": 30
 }
+
+# Caché de respuestas LLM (memoria + SQLite local)
+LLM_CACHE_CONFIG = {
+    "enabled": os.getenv("LLM_CACHE_ENABLED", "True").lower() == "true",
+    "memory_max_entries": 512,
+    "memory_max_bytes": 8 * 1024 * 1024,     # 8 MB en memoria
+    "disk_path": os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3"),
+    "disk_max_bytes": 64 * 1024 * 1024,      # 64 MB en disco
+    "ttl_por_agente": {                       # Segundos que vive cada respuesta
+        "planificador": 24 * 3600,
+        "ejecutor": 3600,
+        "notificador": 3600,
+        "interfaz": 600,
+        "knowledge_base": 3600,
+        "monitor": 60
+    }
+}
+
+# Planificador de llamadas LLM: cuotas por modelo y prioridad por agente
+LLM_SCHEDULER_CONFIG = {
+    "cuotas": {                               # Peticiones y tokens por minuto
+        "gemini-2.0-flash": {"rpm": 15, "tpm": 1000000},
+        "gemini-2.5-flash": {"rpm": 10, "tpm": 250000}
+    },
+    "cuota_por_defecto": {"rpm": 10, "tpm": 250000},
+    "prioridades": {                          # Menor número = se atiende antes
+        "interfaz": 0,                        # Trabajo de cara al usuario
+        "ejecutor": 0,
+        "planificador": 1,
+        "knowledge_base": 1,
+        "notificador": 2,                     # Trabajo de fondo
+        "monitor": 3
+    },
+    "tokens_salida_estimados": 512,
+    "max_espera_segundos": 30,
+    "max_reintentos_429": 2
+}
+
+# Ejecución de planes del Planificador
+PLANNER_CONFIG = {
+    "subtask_timeout_seconds": 45,   # Tiempo máximo por subtarea
+    "max_concurrent_subtasks": 8     # Subtareas despachadas a la vez por plan
+}
+
+# Ingesta de telemetría del Monitor (en segundo plano)
+MONITOR_CONFIG = {
+    "cola_max": 1000,              # Distribuciones pendientes antes de descartar
+    "analisis_ia": True,           # Comentario de IA sobre la carga (opcional)
+    "tasa_muestreo": 0.1,          # Fracción de distribuciones que se analizan
+    "tamano_lote": 20,             # Distribuciones por llamada a IA
+    "espera_lote_segundos": 5.0,   # Espera máxima para completar un lote
+    "cola_mensajes_max": 500       # Entradas recientes que conserva message_queue
+}
+
+# Message bus: buzón acotado y workers por agente
+BUS_CONFIG = {
+    "workers_por_defecto": 2,
+    "buzon_max": 100,                # Mensajes en espera antes de aplicar backpressure
+    "timeout_entrega_segundos": 60,  # Incluye la espera por sitio en un buzón lleno
+    "agentes": {
+        "Planificador": {"workers": 2},
+        "Ejecutor": {"workers": 8, "buzon_max": 200},
+        "KnowledgeBase": {"workers": 4},
+        "Notificador": {"workers": 4},
+        "Interfaz": {"workers": 4},
+        "Monitor": {"workers": 1, "buzon_max": 500}
+    }
+}
+
+# Historial de mensajes de los agentes (ring buffer acotado)
+HISTORY_CONFIG = {
+    "capacidad_por_defecto": 200,
+    "capacidad_por_agente": {
+        "Ejecutor": 500,
+        "Monitor": 500
+    },
+    "guardar_contenido": False,      # True conserva el contenido completo (más memoria)
+    "journal_dir": os.getenv("AGENT_JOURNAL_DIR", ""),  # Vacío = sin volcado a disco
+    "journal_max_bytes": 5 * 1024 * 1024,
+    "journal_backups": 3
+}
+
+# Resumen mensual por categoría (rollup incremental de transacciones)
+RESUMEN_CONFIG = {
+    "usar_resumenes": os.getenv("USAR_RESUMENES", "True").lower() == "true",
+    "reconstruir_si_vacio": True    # Backfill al iniciar si la tabla está vacía
+}
+
+# Paginación por cursor de los listados
+PAGINACION_CONFIG = {
+    "limite_por_defecto": 50,
+    "limite_maximo": 200
+}
+
+# Importación masiva de transacciones (CSV / NDJSON)
+IMPORTACION_CONFIG = {
+    "tamano_lote": 1000,            # Filas por INSERT executemany
+    "max_errores_reportados": 50,
+    "umbral_alerta_presupuesto": 80  # % de uso a partir del cual se alerta
+}
+
+# Consultas de la Knowledge Base sobre la base de datos
+KNOWLEDGE_BASE_CONFIG = {
+    "tamano_bloque": 500,               # Filas por bloque al recorrer rangos grandes
+    "max_transacciones_respuesta": 1000  # Transacciones incluidas en un query_result
+}
+
+# Motor de analítica numérica local (NumPy) del Ejecutor
+ANALITICA_CONFIG = {
+    "tamano_bloque": 2000,           # Filas por bloque al cargar las columnas
+    "umbral_presupuesto_cerca": 75   # % de uso hasta el que un presupuesto está "dentro"
+}
+
+# Pronóstico local de gastos (Holt / Holt-Winters sobre el resumen mensual)
+PRONOSTICO_CONFIG = {
+    "meses_historia": 36,
+    "alphas": (0.2, 0.4, 0.6, 0.8),  # Rejilla de suavizado del nivel
+    "betas": (0.0, 0.1, 0.3),        # Rejilla de suavizado de la tendencia
+    "gammas": (0.1, 0.3, 0.5),       # Rejilla del suavizado estacional (con 24+ meses de historia)
+    "z_intervalo": 1.96,             # Intervalo de confianza del 95%
+    "min_meses": 3,                  # Con menos historia la confianza es "baja"
+    "amplitud_confianza_alta": 0.3,  # Ancho del intervalo relativo al pronóstico
+    "amplitud_confianza_media": 0.8,
+    "comentario_ia": True            # Pedir a Gemini un comentario (opcional) de las cifras
+}
+
+# Detección de gastos inusuales (Welford + mediana/MAD por usuario y categoría)
+ANOMALIAS_CONFIG = {
+    "min_observaciones": 8,         # Gastos previos de la categoría antes de evaluar
+    "umbral_robusto": 3.5,          # Puntaje z robusto (0.6745·(x − mediana)/MAD)
+    "umbral_z": 3.0,                # z clásico cuando la MAD es 0
+    "dias_consulta": 90,
+    "max_resultados": 20,
+    "tamano_bloque": 2000           # Filas por bloque al reconstruir desde el historial
+}
+
+# Índice de pagos recurrentes (descripción normalizada + banda de monto)
+RECURRENTES_CONFIG = {
+    "ancho_banda": 0.15,            # Importes dentro de ~15% comparten banda
+    "max_palabras": 6,              # Palabras de la descripción que forman la clave
+    "periodos": {
+        "semanal": {"dias": 7, "tolerancia_dias": 2, "min_ocurrencias": 3},
+        "mensual": {"dias": 30.44, "tolerancia_dias": 4, "min_ocurrencias": 3},
+        "anual": {"dias": 365.25, "tolerancia_dias": 20, "min_ocurrencias": 2}
+    },
+    "min_intervalo_dias": 1,        # Cargos más cercanos a otro del grupo se toman como duplicados
+    "ciclos_inactivo": 1.5,         # Períodos sin cargo tras los que el pago se da por cancelado
+    "tamano_bloque": 2000           # Filas por bloque al reconstruir desde el historial
+}
+
+# Categorización automática de gastos sin categoría (trie de palabras clave + Bayes ingenuo por usuario)
+CATEGORIZACION_CONFIG = {
+    "habilitado": os.getenv("CATEGORIZACION_ENABLED", "True").lower() == "true",
+    "bits_hash": 12,                # 4096 columnas para los n-gramas
+    "alfa": 0.5,                    # Suavizado de Laplace
+    "min_ejemplos": 20,             # Gastos categorizados por el usuario antes de usar su modelo
+    "max_ejemplos": 5000,           # Gastos más recientes usados para entrenar
+    "probabilidad_minima": 0.6,     # Por debajo se recurre al trie de palabras clave
+    "ttl_modelo_segundos": 900,
+    "max_modelos": 1000,            # Modelos de usuario en memoria (LRU)
+    # Palabras (o frases) completas de la descripción; con "*" al final, cualquier
+    # palabra que empiece así. Gana la coincidencia más larga
+    "palabras_clave": {
+        "alimentacion": [
+            "supermercado*", "super", "mercado", "restaur*", "comida*", "cafe", "cafeter*", "panader*",
+            "carnicer*", "fruter*", "abarrote*", "oxxo", "walmart", "soriana", "chedraui", "costco",
+            "starbucks", "pizza*", "hamburg*", "burger*", "taco", "tacos", "taqueria*", "rappi",
+            "uber eats", "didi food"
+        ],
+        "transporte": [
+            "uber", "didi", "cabify", "taxi*", "gasolin*", "pemex", "estacionamiento*", "parking",
+            "metro", "metrobus", "autobus*", "peaje*", "caseta*", "vuelo*", "aerolinea*", "transporte*"
+        ],
+        "vivienda": [
+            "renta", "alquiler*", "arriendo*", "hipoteca*", "predial", "condominio*", "mueble*",
+            "ferreter*", "home depot"
+        ],
+        "entretenimiento": [
+            "netflix", "spotify", "disney*", "hbo", "prime video", "cine*", "steam", "playstation",
+            "xbox", "nintendo", "concierto*", "teatro*", "boleto*", "ticketmaster"
+        ],
+        "salud": [
+            "farmacia*", "hospital*", "medic*", "doctor*", "consulta", "dentista*", "laboratorio*",
+            "clinica*", "optica*", "seguro medico", "gimnasio*", "gym"
+        ],
+        "educacion": [
+            "colegiatura*", "escuela*", "universidad*", "curso*", "libreria*", "libro*", "udemy",
+            "coursera", "platzi", "inscripcion*"
+        ],
+        "servicios": [
+            "luz", "cfe", "electricidad", "agua", "gas", "internet", "telefon*", "celular*", "telcel",
+            "movistar", "att", "izzi", "totalplay", "megacable", "seguro*"
+        ],
+        "otros": [
+            "mercado libre"
+        ]
+    }
+}
+
+# Reutilización de análisis guardados en analisis_financieros
+ANALISIS_CACHE_CONFIG = {
+    "habilitado": os.getenv("ANALISIS_CACHE_ENABLED", "True").lower() == "true",
+    "vigencia_horas": 24,           # Un análisis con la misma huella se reutiliza durante este tiempo
+    "decimales_huella": 2           # Redondeo de importes al calcular la huella
+}
+
+# Escritores en segundo plano (write-behind por lotes)
+ESCRITOR_LOTES_CONFIG = {
+    "logs_agentes": {
+        "tamano_lote": 200,
+        "intervalo_segundos": 2.0,
+        "cola_max": 5000,
+        "umbral_muestreo": 0.5,      # Con la cola a más del 50%...
+        "tasa_muestreo": 0.2,        # ...solo se conserva el 20% de los mensajes
+        "max_caracteres_mensaje": 4000
+    },
+    "alertas": {
+        "tamano_lote": 50,
+        "intervalo_segundos": 1.0,
+        "cola_max": 2000             # Sin muestreo: las alertas se encolan como prioritarias
+    }
+}
@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import DATABASE_URL
@@ -19,6 +20,35 @@ engine = create_engine(
 # Crear sesión
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def get_async_database_url(url: str) -> str:
+    """
+    Convertir la URL síncrona al driver asíncrono (asyncpg / aiosqlite)
+    """
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    if url.startswith("postgresql://") or url.startswith("postgresql+psycopg2://"):
+        url = "postgresql+asyncpg://" + url.split("://", 1)[1]
+        # asyncpg usa `ssl` en lugar del `sslmode` de libpq
+        url = url.replace("sslmode=", "ssl=")
+    elif url.startswith("sqlite://"):
+        url = "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+# Engine y sesiones asíncronas: las consultas no bloquean el event loop
+async_engine = create_async_engine(
+    get_async_database_url(DATABASE_URL),
+    pool_pre_ping=True,
+    pool_size=10,
+    max_overflow=20
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Base para los modelos
 Base = declarative_base()
 
@@ -32,16 +62,21 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """
+    Dependency para obtener sesión asíncrona de base de datos
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def init_db():
     """
-    Inicializar base de datos creando todas las tablas
+    Inicializar base de datos aplicando las migraciones pendientes
     """
     try:
-        # Importar todos los modelos aquí para que se registren
-        from models import Usuario, Transaccion, Presupuesto, Alerta, AnalisisFinanciero, LogAgente
+        from migraciones import aplicar_migraciones
         
-        # Crear todas las tablas
-        Base.metadata.create_all(bind=engine)
+        aplicar_migraciones(engine)
         logger.info("✅ Base de datos inicializada correctamente")
         return True
     except Exception as e:
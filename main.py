@@ -1,22 +1,35 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, Generic, List, Optional, TypeVar
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
+import asyncio
 import logging
 
 # Importaciones locales
-from database import get_db, init_db, test_connection
+from database import get_db, get_async_db, async_engine, init_db, test_connection, SessionLocal
 from models import (
     Usuario, Transaccion, Presupuesto, Alerta, AnalisisFinanciero, LogAgente,
     TipoTransaccion, CategoriaGasto, EstadoAlerta, NivelAlerta, TipoAgente
 )
-from config import APP_NAME, APP_VERSION, GOOGLE_API_KEY
+from config import APP_NAME, APP_VERSION, GOOGLE_API_KEY, RESUMEN_CONFIG, IMPORTACION_CONFIG
+from servicios.agregaciones import calcular_datos_reales, obtener_presupuestos_mes
+from servicios.resumenes import registrar_transaccion, asegurar_resumenes
+from servicios.presupuestos import consumir_presupuesto
+from servicios.paginacion import apaginar, CursorInvalido
+from servicios.importacion import importar_transacciones, ErrorImportacion
+from servicios.analisis import huella_analisis, buscar_analisis
+from servicios.anomalias import evaluar_transaccion
+from servicios.recurrentes import registrar_recurrente, pagos_recurrentes
+from servicios.categorizacion import categorizar_descripcion, aprender_transaccion
+from servicios import escritor_lotes
 from auth import (
-    authenticate_user, create_access_token, get_password_hash,
-    get_current_active_user, ACCESS_TOKEN_EXPIRE_MINUTES
+    authenticate_user_async, create_access_token, get_password_hash,
+    get_current_active_user_async, ACCESS_TOKEN_EXPIRE_MINUTES
 )
 
 # Importar agentes
@@ -26,6 +39,10 @@ from agentes.notificador_agent import NotificadorAgent
 from agentes.interfaz_agent import InterfazAgent
 from agentes.knowledge_base_agent import KnowledgeBaseAgent
 from agentes.monitor_agent import MonitorAgent
+from agentes.base_agent import BaseAgent
+from agentes import message_bus
+from agentes.llm_cache import get_llm_cache
+from agentes.llm_scheduler import get_llm_scheduler
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -71,7 +88,6 @@ def init_agents():
         monitor = MonitorAgent()
         # Registrar agentes en el message bus para entrega de mensajes
         try:
-            from agentes import message_bus
             message_bus.register_agents({
                 "Planificador": planificador,
                 "Ejecutor": ejecutor,
@@ -136,6 +152,7 @@ class TransaccionResponse(BaseModel):
     categoria: Optional[CategoriaGasto]
     monto: float
     descripcion: Optional[str]
+    categoria_automatica: Optional[bool] = False
     fecha: datetime
     
     class Config:
@@ -173,9 +190,16 @@ class AlertaResponse(BaseModel):
     class Config:
         from_attributes = True
 
+T = TypeVar("T")
+
+class Pagina(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
 class AnalisisRequest(BaseModel):
     usuario_id: int
     periodo_dias: int = Field(default=30, ge=1, le=365)
+    force_refresh: bool = False  # Ignorar análisis guardados con la misma huella
 
 class RecomendacionRequest(BaseModel):
     usuario_id: int
@@ -189,15 +213,70 @@ async def startup_event():
     
     # Probar conexión a base de datos
     if test_connection():
-        init_db()
+        if init_db() and RESUMEN_CONFIG["reconstruir_si_vacio"]:
+            db = SessionLocal()
+            try:
+                asegurar_resumenes(db)
+            finally:
+                db.close()
     else:
         logger.error("❌ No se pudo conectar a la base de datos")
     
     # Inicializar agentes
     init_agents()
     
+    # Buzones y workers del message bus
+    await message_bus.start()
+    
+    # Escritores por lotes (logs de agentes) fuera del camino de las peticiones
+    await escritor_lotes.start()
+    
+    # Telemetría del Monitor fuera del camino de las peticiones
+    if monitor:
+        await monitor.start_ingestion()
+    
     logger.info("✅ Sistema iniciado correctamente")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Detener tareas en segundo plano"""
+    if monitor:
+        await monitor.stop_ingestion()
+    await message_bus.stop()
+    await escritor_lotes.stop()
+    await async_engine.dispose()
+
+def _encolar_alerta(usuario_id: int, tipo: str, datos: Dict[str, Any]) -> bool:
+    """
+    Pedir una alerta al Notificador por el bus sin esperar respuesta
+    El Notificador la genera y la guarda en `alertas` con su escritor por lotes
+    """
+    if not notificador:
+        return False
+    return message_bus.post({
+        "from": "API",
+        "to": "Notificador",
+        "protocol": "A2A",
+        "type": "ALERT_REQUIRED",
+        "content": {"usuario_id": usuario_id, "tipo": tipo, "datos": datos},
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
+def _guardar_analisis_kb(analisis: Dict[str, Any]) -> bool:
+    """
+    Pedir a la Knowledge Base que guarde un análisis completado, sin esperar respuesta
+    """
+    if not knowledge_base:
+        return False
+    return message_bus.post({
+        "from": "API",
+        "to": "KnowledgeBase",
+        "protocol": "MCP",
+        "type": "STORE_ANALYSIS",
+        "content": analisis,
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
 # ===== ENDPOINTS DE SALUD =====
 @app.get("/")
 async def root():
@@ -258,10 +337,10 @@ async def registrar_usuario(usuario: UsuarioRegister, db: Session = Depends(get_
 @app.post("/auth/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Iniciar sesión y obtener token JWT"""
-    usuario = authenticate_user(db, form_data.username, form_data.password)
+    usuario = await authenticate_user_async(db, form_data.username, form_data.password)
     if not usuario:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -271,7 +350,7 @@ async def login(
     
     # Actualizar último login
     usuario.ultimo_login = datetime.utcnow()
-    db.commit()
+    await db.commit()
     
     # Crear token de acceso
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -284,7 +363,7 @@ async def login(
 
 @app.get("/auth/me", response_model=UsuarioResponse)
 async def obtener_usuario_actual(
-    current_user: Usuario = Depends(get_current_active_user)
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
     """Obtener información del usuario autenticado"""
     return current_user
@@ -306,16 +385,28 @@ async def crear_usuario(usuario: UsuarioCreate, db: Session = Depends(get_db)):
     logger.info(f"✅ Usuario creado: {nuevo_usuario.email}")
     return nuevo_usuario
 
-@app.get("/usuarios", response_model=List[UsuarioResponse])
-async def listar_usuarios(db: Session = Depends(get_db)):
-    """Listar todos los usuarios"""
-    usuarios = db.query(Usuario).all()
-    return usuarios
+async def _pagina(db: AsyncSession, stmt, columnas, cursor: Optional[str], limit: Optional[int]):
+    """Aplicar paginación por cursor y traducir un cursor inválido a 400"""
+    try:
+        items, next_cursor = await apaginar(db, stmt, columnas, cursor, limit)
+    except CursorInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return items, next_cursor
+
+@app.get("/usuarios", response_model=Pagina[UsuarioResponse])
+async def listar_usuarios(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Listar usuarios (paginado por cursor, más recientes primero)"""
+    usuarios, next_cursor = await _pagina(db, select(Usuario), [Usuario.creado_en, Usuario.id], cursor, limit)
+    return {"items": usuarios, "next_cursor": next_cursor}
 
 @app.get("/usuarios/{usuario_id}", response_model=UsuarioResponse)
-async def obtener_usuario(usuario_id: int, db: Session = Depends(get_db)):
+async def obtener_usuario(usuario_id: int, db: AsyncSession = Depends(get_async_db)):
     """Obtener usuario por ID"""
-    usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    usuario = await db.get(Usuario, usuario_id)
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     return usuario
@@ -324,8 +415,8 @@ async def obtener_usuario(usuario_id: int, db: Session = Depends(get_db)):
 @app.post("/transacciones", response_model=TransaccionResponse, status_code=status.HTTP_201_CREATED)
 async def crear_transaccion(
     transaccion: TransaccionCreate,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
     """
     Crear nueva transacción (requiere autenticación)
@@ -338,7 +429,7 @@ async def crear_transaccion(
             detail="No tienes permiso para crear transacciones para otro usuario"
         )
     # Verificar que el usuario existe
-    usuario = db.query(Usuario).filter(Usuario.id == transaccion.usuario_id).first()
+    usuario = await db.get(Usuario, transaccion.usuario_id)
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
@@ -347,68 +438,142 @@ async def crear_transaccion(
     if not data.get('fecha'):
         data['fecha'] = datetime.utcnow()
     
+    # Gasto sin categoría: asignarla localmente a partir de la descripción
+    if transaccion.tipo == TipoTransaccion.GASTO and not data.get('categoria'):
+        categoria = await db.run_sync(categorizar_descripcion, transaccion.usuario_id, data.get('descripcion'))
+        if categoria:
+            data['categoria'] = categoria
+            data['categoria_automatica'] = True
+    
     nueva_transaccion = Transaccion(**data)
     db.add(nueva_transaccion)
     
-    # Si es gasto, actualizar presupuesto correspondiente
-    if transaccion.tipo == TipoTransaccion.GASTO and transaccion.categoria:
-        mes_actual = datetime.utcnow().month
-        anio_actual = datetime.utcnow().year
-        
-        presupuesto = db.query(Presupuesto).filter(
-            Presupuesto.usuario_id == transaccion.usuario_id,
-            Presupuesto.categoria == transaccion.categoria,
-            Presupuesto.mes == mes_actual,
-            Presupuesto.anio == anio_actual
-        ).first()
-        
-        if presupuesto:
-            presupuesto.monto_gastado += transaccion.monto
-            
-            # Verificar si se debe generar alerta
-            porcentaje = (presupuesto.monto_gastado / presupuesto.monto_limite) * 100
-            if porcentaje >= 80 and notificador:
-                # Usar protocolo A2A para notificar
-                notificador.create_alert({
-                    "usuario_id": transaccion.usuario_id,
-                    "tipo": "presupuesto_cerca_limite",
-                    "datos": {
-                        "categoria": transaccion.categoria.value,
-                        "porcentaje": porcentaje,
-                        "gastado": presupuesto.monto_gastado,
-                        "limite": presupuesto.monto_limite
-                    }
-                })
+    # Mantener el resumen mensual en la misma transacción de base de datos
+    await db.run_sync(registrar_transaccion, nueva_transaccion)
+    
+    # Si es gasto, consumir el presupuesto de su mes con un UPDATE atómico
+    consumo = None
+    if transaccion.tipo == TipoTransaccion.GASTO and nueva_transaccion.categoria:
+        consumo = await db.run_sync(
+            consumir_presupuesto,
+            transaccion.usuario_id,
+            nueva_transaccion.categoria,
+            nueva_transaccion.fecha,
+            transaccion.monto
+        )
     
-    db.commit()
-    db.refresh(nueva_transaccion)
+    # Comparar el gasto con las estadísticas de su categoría antes de sumarlo
+    anomalia = await db.run_sync(evaluar_transaccion, nueva_transaccion)
+    await db.run_sync(registrar_recurrente, nueva_transaccion)
+    
+    await db.commit()
+    await db.refresh(nueva_transaccion)
+    
+    # Las categorías elegidas por el usuario entrenan su modelo de categorización
+    if transaccion.tipo == TipoTransaccion.GASTO and transaccion.categoria:
+        aprender_transaccion(transaccion.usuario_id, transaccion.descripcion, transaccion.categoria)
+    
+    # Verificar si se debe generar alerta (tras el commit, sin retener el bloqueo de la fila)
+    if consumo:
+        gastado, limite = consumo
+        porcentaje = (gastado / limite) * 100 if limite > 0 else 0
+        if porcentaje >= 80:
+            # Usar protocolo A2A para notificar, sin esperar a que se genere ni se guarde
+            _encolar_alerta(transaccion.usuario_id, "presupuesto_cerca_limite", {
+                "categoria": nueva_transaccion.categoria.value,
+                "porcentaje": porcentaje,
+                "gastado": gastado,
+                "limite": limite
+            })
+    if anomalia:
+        _encolar_alerta(transaccion.usuario_id, "gasto_inusual", {
+            "transaccion_id": nueva_transaccion.id,
+            "categoria": anomalia["categoria"],
+            "monto": anomalia["monto"],
+            "mediana_categoria": round(anomalia["mediana"], 2) if anomalia["mediana"] is not None else None,
+            "puntaje": anomalia["puntaje"]
+        })
     
     logger.info(f"✅ Transacción creada: {nueva_transaccion.id}")
     return nueva_transaccion
 
-@app.get("/transacciones", response_model=List[TransaccionResponse])
+@app.post("/transacciones/importar")
+async def importar_transacciones_endpoint(
+    request: Request,
+    formato: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
+):
+    """
+    Importar transacciones en bloque desde un export bancario (requiere autenticación)
+    El cuerpo es CSV con cabecera o NDJSON y se procesa en streaming;
+    las alertas de presupuesto se evalúan una sola vez al final
+    """
+    if not formato:
+        content_type = request.headers.get("content-type", "")
+        formato = "csv" if "csv" in content_type else "ndjson"
+    
+    try:
+        resultado = await importar_transacciones(
+            db, current_user.id, request.stream(), formato.lower(), TransaccionCreate
+        )
+    except ErrorImportacion as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Alertas de presupuesto: una por presupuesto que supera el umbral tras la importación
+    alertas = 0
+    for presupuesto in resultado["presupuestos"]:
+        if presupuesto["porcentaje"] >= IMPORTACION_CONFIG["umbral_alerta_presupuesto"]:
+            if _encolar_alerta(current_user.id, "presupuesto_cerca_limite", presupuesto):
+                alertas += 1
+    # Gastos inusuales: una sola alerta con el resumen de la importación
+    anomalias = resultado["anomalias"]
+    if anomalias:
+        if _encolar_alerta(current_user.id, "gastos_inusuales_importacion", {
+            "cantidad": len(anomalias),
+            "gastos": [
+                {"categoria": a["categoria"], "monto": a["monto"], "fecha": a["fecha"].isoformat() if a["fecha"] else None,
+                 "puntaje": a["puntaje"]}
+                for a in sorted(anomalias, key=lambda a: a["puntaje"], reverse=True)[:10]
+            ]
+        }):
+            alertas += 1
+    
+    return {
+        "status": "success",
+        "importadas": resultado["importadas"],
+        "rechazadas": resultado["rechazadas"],
+        "errores": resultado["errores"],
+        "presupuestos_actualizados": len(resultado["presupuestos"]),
+        "gastos_inusuales": len(anomalias),
+        "alertas_generadas": alertas
+    }
+
+@app.get("/transacciones", response_model=Pagina[TransaccionResponse])
 async def listar_transacciones(
     usuario_id: Optional[int] = None,
     tipo: Optional[TipoTransaccion] = None,
     categoria: Optional[CategoriaGasto] = None,
     dias: int = 30,
-    db: Session = Depends(get_db)
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Listar transacciones con filtros opcionales"""
-    query = db.query(Transaccion)
+    """Listar transacciones con filtros opcionales (paginado por cursor)"""
+    query = select(Transaccion)
     
     if usuario_id:
-        query = query.filter(Transaccion.usuario_id == usuario_id)
+        query = query.where(Transaccion.usuario_id == usuario_id)
     if tipo:
-        query = query.filter(Transaccion.tipo == tipo)
+        query = query.where(Transaccion.tipo == tipo)
     if categoria:
-        query = query.filter(Transaccion.categoria == categoria)
+        query = query.where(Transaccion.categoria == categoria)
     
     fecha_desde = datetime.utcnow() - timedelta(days=dias)
-    query = query.filter(Transaccion.fecha >= fecha_desde)
+    query = query.where(Transaccion.fecha >= fecha_desde)
     
-    transacciones = query.order_by(Transaccion.fecha.desc()).all()
-    return transacciones
+    transacciones, next_cursor = await _pagina(db, query, [Transaccion.fecha, Transaccion.id], cursor, limit)
+    return {"items": transacciones, "next_cursor": next_cursor}
 
 # ===== ENDPOINTS DE PRESUPUESTOS =====
 @app.post("/presupuestos", response_model=PresupuestoResponse, status_code=status.HTTP_201_CREATED)
@@ -441,30 +606,32 @@ async def crear_presupuesto(presupuesto: PresupuestoCreate, db: Session = Depend
     logger.info(f"✅ Presupuesto creado: {nuevo_presupuesto.id}")
     return nuevo_presupuesto
 
-@app.get("/presupuestos", response_model=List[PresupuestoResponse])
+@app.get("/presupuestos", response_model=Pagina[PresupuestoResponse])
 async def listar_presupuestos(
     usuario_id: Optional[int] = None,
     mes: Optional[int] = None,
     anio: Optional[int] = None,
-    db: Session = Depends(get_db)
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Listar presupuestos con filtros opcionales"""
-    query = db.query(Presupuesto)
+    """Listar presupuestos con filtros opcionales (paginado por cursor)"""
+    query = select(Presupuesto)
     
     if usuario_id:
-        query = query.filter(Presupuesto.usuario_id == usuario_id)
+        query = query.where(Presupuesto.usuario_id == usuario_id)
     if mes:
-        query = query.filter(Presupuesto.mes == mes)
+        query = query.where(Presupuesto.mes == mes)
     if anio:
-        query = query.filter(Presupuesto.anio == anio)
+        query = query.where(Presupuesto.anio == anio)
     
-    presupuestos = query.all()
+    presupuestos, next_cursor = await _pagina(db, query, [Presupuesto.creado_en, Presupuesto.id], cursor, limit)
     
     # Calcular porcentaje usado
     for p in presupuestos:
         p.porcentaje_usado = (p.monto_gastado / p.monto_limite) * 100 if p.monto_limite > 0 else 0
     
-    return presupuestos
+    return {"items": presupuestos, "next_cursor": next_cursor}
 
 @app.get("/presupuestos/{presupuesto_id}", response_model=PresupuestoResponse)
 async def obtener_presupuesto(presupuesto_id: int, db: Session = Depends(get_db)):
@@ -477,25 +644,27 @@ async def obtener_presupuesto(presupuesto_id: int, db: Session = Depends(get_db)
     return presupuesto
 
 # ===== ENDPOINTS DE ALERTAS =====
-@app.get("/alertas", response_model=List[AlertaResponse])
+@app.get("/alertas", response_model=Pagina[AlertaResponse])
 async def listar_alertas(
     usuario_id: Optional[int] = None,
     estado: Optional[EstadoAlerta] = None,
     nivel: Optional[NivelAlerta] = None,
-    db: Session = Depends(get_db)
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Listar alertas con filtros opcionales"""
-    query = db.query(Alerta)
+    """Listar alertas con filtros opcionales (paginado por cursor)"""
+    query = select(Alerta)
     
     if usuario_id:
-        query = query.filter(Alerta.usuario_id == usuario_id)
+        query = query.where(Alerta.usuario_id == usuario_id)
     if estado:
-        query = query.filter(Alerta.estado == estado)
+        query = query.where(Alerta.estado == estado)
     if nivel:
-        query = query.filter(Alerta.nivel == nivel)
+        query = query.where(Alerta.nivel == nivel)
     
-    alertas = query.order_by(Alerta.creado_en.desc()).all()
-    return alertas
+    alertas, next_cursor = await _pagina(db, query, [Alerta.creado_en, Alerta.id], cursor, limit)
+    return {"items": alertas, "next_cursor": next_cursor}
 
 @app.patch("/alertas/{alerta_id}/marcar-leida")
 async def marcar_alerta_leida(alerta_id: int, db: Session = Depends(get_db)):
@@ -514,8 +683,8 @@ async def marcar_alerta_leida(alerta_id: int, db: Session = Depends(get_db)):
 @app.post("/analisis/balance")
 async def analizar_balance(
     request: AnalisisRequest,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
     """
     Analizar balance financiero usando Agente Ejecutor (requiere autenticación)
@@ -531,46 +700,45 @@ async def analizar_balance(
         raise HTTPException(status_code=503, detail="Agente Ejecutor no disponible")
     
     # Verificar usuario
-    usuario = db.query(Usuario).filter(Usuario.id == request.usuario_id).first()
+    usuario = await db.get(Usuario, request.usuario_id)
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
-    # Obtener transacciones del período
-    fecha_desde = datetime.utcnow() - timedelta(days=request.periodo_dias)
-    transacciones = db.query(Transaccion).filter(
-        Transaccion.usuario_id == request.usuario_id,
-        Transaccion.fecha >= fecha_desde
-    ).all()
-    
-    # Calcular totales
-    ingresos_totales = sum(t.monto for t in transacciones if t.tipo == TipoTransaccion.INGRESO)
-    gastos_totales = sum(t.monto for t in transacciones if t.tipo == TipoTransaccion.GASTO)
-    
-    # Preparar datos por categoría
-    gastos_por_categoria = {}
-    for t in transacciones:
-        if t.tipo == TipoTransaccion.GASTO and t.categoria:
-            cat = t.categoria.value
-            gastos_por_categoria[cat] = gastos_por_categoria.get(cat, 0) + t.monto
+    # Totales del período calculados en la base de datos (GROUP BY tipo, categoria)
+    fecha_hasta = datetime.utcnow()
+    fecha_desde = fecha_hasta - timedelta(days=request.periodo_dias)
+    datos_reales = await db.run_sync(calcular_datos_reales, request.usuario_id, fecha_desde)
+    datos_reales["ingreso_mensual"] = float(usuario.ingreso_mensual)
+    tiene_datos = datos_reales["total_transacciones"] > 0
+    
+    # Reutilizar un análisis guardado si los datos de entrada no han cambiado
+    huella = huella_analisis("calcular_balance", request.periodo_dias, datos_reales)
+    if tiene_datos and not request.force_refresh:
+        previo = await db.run_sync(buscar_analisis, request.usuario_id, huella)
+        if previo:
+            return {
+                **previo["resultado"],
+                "cached": True,
+                "analisis_id": previo["analisis_id"],
+                "generado_en": previo["creado_en"].isoformat()
+            }
     
     # Enviar la solicitud al Planificador para que distribuya la tarea (ANP)
     if planificador:
         plan_request = {
             "usuario_id": request.usuario_id,
             "objetivo": "calcular_balance",
-            "datos_reales": {
-                "ingresos_totales": float(ingresos_totales),
-                "gastos_totales": float(gastos_totales),
-                "balance": float(ingresos_totales - gastos_totales),
-                "total_transacciones": len(transacciones),
-                "gastos_por_categoria": gastos_por_categoria,
-                "ingreso_mensual": float(usuario.ingreso_mensual)
-            },
-            "tiene_datos": len(transacciones) > 0
+            "datos_reales": datos_reales,
+            "tiene_datos": tiene_datos
         }
 
-        plan = planificador.create_financial_plan(plan_request)
-        return {
+        plan = await planificador.create_financial_plan(plan_request)
+        # Un plan con subtareas fallidas o expiradas no se reutiliza
+        completo = all(
+            not (isinstance(r.get("response"), dict) and r["response"].get("status") in ("error", "skipped"))
+            for r in plan.get("task_results", [])
+        )
+        respuesta = {
             "status": "success",
             "plan": plan,
             "protocol_used": "ANP",
@@ -579,33 +747,40 @@ async def analizar_balance(
         }
     else:
         # Fallback directo al Ejecutor si el Planificador no está disponible
-        resultado = ejecutor.calculate_balance({
+        resultado = await ejecutor.calculate_balance({
             "usuario_id": request.usuario_id,
             "periodo_dias": request.periodo_dias,
-            "datos_reales": {
-                "ingresos_totales": float(ingresos_totales),
-                "gastos_totales": float(gastos_totales),
-                "balance": float(ingresos_totales - gastos_totales),
-                "total_transacciones": len(transacciones),
-                "gastos_por_categoria": gastos_por_categoria,
-                "ingreso_mensual": float(usuario.ingreso_mensual)
-            },
-            "tiene_datos": len(transacciones) > 0
+            "datos_reales": datos_reales,
+            "tiene_datos": tiene_datos
         })
 
-        return {
+        completo = isinstance(resultado, dict) and resultado.get("status") != "error"
+        respuesta = {
             "status": "success",
             "analisis": resultado,
             "protocol_used": "ACP",
             "agent": "Ejecutor",
             "message": "Planificador no disponible; análisis ejecutado directamente por Ejecutor."
         }
+    
+    # Guardar el análisis en la Knowledge Base (MCP) sin esperar a la escritura
+    if tiene_datos and completo:
+        _guardar_analisis_kb({
+            "usuario_id": request.usuario_id,
+            "tipo": "calcular_balance",
+            "huella": huella,
+            "periodo_inicio": fecha_desde,
+            "periodo_fin": fecha_hasta,
+            "datos_reales": datos_reales,
+            "resultado": respuesta
+        })
+    return {**respuesta, "cached": False}
 
 @app.post("/analisis/presupuestos")
 async def analizar_presupuestos(
     request: AnalisisRequest,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
     """
     Verificar estado de presupuestos usando Agente Ejecutor (requiere autenticación)
@@ -621,41 +796,19 @@ async def analizar_presupuestos(
         raise HTTPException(status_code=503, detail="Agente Ejecutor no disponible")
     
     # Verificar usuario
-    usuario = db.query(Usuario).filter(Usuario.id == request.usuario_id).first()
+    usuario = await db.get(Usuario, request.usuario_id)
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
-    # Obtener presupuestos del mes actual
-    mes_actual = datetime.utcnow().month
-    anio_actual = datetime.utcnow().year
-    
-    presupuestos = db.query(Presupuesto).filter(
-        Presupuesto.usuario_id == request.usuario_id,
-        Presupuesto.mes == mes_actual,
-        Presupuesto.anio == anio_actual
-    ).all()
-    
-    # Convertir a formato para el agente
-    presupuestos_data = []
-    for p in presupuestos:
-        porcentaje = (p.monto_gastado / p.monto_limite * 100) if p.monto_limite > 0 else 0
-        presupuestos_data.append({
-            "categoria": p.categoria.value,
-            "limite": float(p.monto_limite),
-            "gastado": float(p.monto_gastado),
-            "porcentaje": round(porcentaje, 2)
-        })
-    
     # Enviar la verificación de presupuestos al Planificador para orquestación (ANP)
+    # Los presupuestos del mes los consulta el Ejecutor a Knowledge Base
     if planificador:
         plan_request = {
             "usuario_id": request.usuario_id,
-            "objetivo": "verificar_presupuestos",
-            "presupuestos_reales": presupuestos_data,
-            "tiene_datos": len(presupuestos_data) > 0
+            "objetivo": "verificar_presupuestos"
         }
 
-        plan = planificador.create_financial_plan(plan_request)
+        plan = await planificador.create_financial_plan(plan_request)
         return {
             "status": "success",
             "plan": plan,
@@ -665,11 +818,7 @@ async def analizar_presupuestos(
         }
     else:
         # Fallback directo al Ejecutor si el Planificador no está disponible
-        resultado = ejecutor.verify_budgets({
-            "usuario_id": request.usuario_id,
-            "presupuestos_reales": presupuestos_data,
-            "tiene_datos": len(presupuestos_data) > 0
-        })
+        resultado = await ejecutor.verify_budgets({"usuario_id": request.usuario_id})
 
         return {
             "status": "success",
@@ -682,8 +831,7 @@ async def analizar_presupuestos(
 @app.post("/analisis/completo")
 async def analisis_completo(
     request: AnalisisRequest,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
     """
     Análisis financiero completo coordinado por Planificador (requiere autenticación)
@@ -699,9 +847,11 @@ async def analisis_completo(
         raise HTTPException(status_code=503, detail="Agente Planificador no disponible")
     
     # Planificador coordina el análisis completo
-    plan = planificador.create_financial_plan({
+    # Sin datos precargados: cada agente consulta a Knowledge Base lo que necesita
+    plan = await planificador.create_financial_plan({
         "usuario_id": request.usuario_id,
-        "objetivo": "analisis_financiero_completo"
+        "objetivo": "analisis_financiero_completo",
+        "periodo_dias": request.periodo_dias
     })
     
     return {
@@ -715,8 +865,8 @@ async def analisis_completo(
 @app.post("/recomendaciones")
 async def obtener_recomendaciones(
     request: RecomendacionRequest,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
     """
     Obtener recomendaciones financieras usando Knowledge Base (requiere autenticación)
@@ -732,62 +882,46 @@ async def obtener_recomendaciones(
         raise HTTPException(status_code=503, detail="Agente Knowledge Base no disponible")
     
     # Verificar usuario
-    usuario = db.query(Usuario).filter(Usuario.id == request.usuario_id).first()
+    usuario = await db.get(Usuario, request.usuario_id)
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
-    # Obtener transacciones de los últimos 90 días
+    # Estadísticas reales de los últimos 90 días calculadas en la base de datos
     fecha_desde = datetime.utcnow() - timedelta(days=90)
-    transacciones = db.query(Transaccion).filter(
-        Transaccion.usuario_id == request.usuario_id,
-        Transaccion.fecha >= fecha_desde
-    ).all()
-    
-    # Calcular estadísticas reales
-    gastos_totales = sum(t.monto for t in transacciones if t.tipo == TipoTransaccion.GASTO)
-    ingresos_totales = sum(t.monto for t in transacciones if t.tipo == TipoTransaccion.INGRESO)
-    
-    # Gastos por categoría
-    gastos_por_categoria = {}
-    for t in transacciones:
-        if t.tipo == TipoTransaccion.GASTO and t.categoria:
-            cat = t.categoria.value
-            gastos_por_categoria[cat] = gastos_por_categoria.get(cat, 0) + t.monto
+    resumen = await db.run_sync(calcular_datos_reales, request.usuario_id, fecha_desde)
+    gastos_totales = resumen["gastos_totales"]
+    tiene_datos = resumen["total_transacciones"] > 0
     
     # Obtener presupuestos actuales
     mes_actual = datetime.utcnow().month
     anio_actual = datetime.utcnow().year
-    presupuestos = db.query(Presupuesto).filter(
-        Presupuesto.usuario_id == request.usuario_id,
-        Presupuesto.mes == mes_actual,
-        Presupuesto.anio == anio_actual
-    ).all()
-    
-    presupuestos_data = [{
-        "categoria": p.categoria.value,
-        "limite": float(p.monto_limite),
-        "gastado": float(p.monto_gastado),
-        "porcentaje": (p.monto_gastado / p.monto_limite * 100) if p.monto_limite > 0 else 0
-    } for p in presupuestos]
+    presupuestos_data = await db.run_sync(obtener_presupuestos_mes, request.usuario_id, mes_actual, anio_actual)
+    
+    # Suscripciones y cargos periódicos desde el índice de pagos recurrentes
+    recurrentes = await db.run_sync(pagos_recurrentes, request.usuario_id)
+    
+    datos_reales = {
+        "total_transacciones": resumen["total_transacciones"],
+        "gastos_totales": resumen["gastos_totales"],
+        "ingresos_totales": resumen["ingresos_totales"],
+        "gastos_por_categoria": resumen["gastos_por_categoria"],
+        "presupuestos": presupuestos_data,
+        "pagos_recurrentes": recurrentes["pagos"],
+        "costo_mensual_recurrentes": recurrentes["total_mensual"],
+        "ingreso_mensual": float(usuario.ingreso_mensual),
+        "periodo_dias": 90
+    }
     
     # Orquestar la obtención de recomendaciones mediante el Planificador (ANP)
     if planificador:
         plan_request = {
             "usuario_id": request.usuario_id,
             "objetivo": request.objetivo or "obtener_recomendaciones",
-            "datos_reales": {
-                "total_transacciones": len(transacciones),
-                "gastos_totales": float(gastos_totales),
-                "ingresos_totales": float(ingresos_totales),
-                "gastos_por_categoria": gastos_por_categoria,
-                "presupuestos": presupuestos_data,
-                "ingreso_mensual": float(usuario.ingreso_mensual),
-                "periodo_dias": 90
-            },
-            "tiene_datos": len(transacciones) > 0
+            "datos_reales": datos_reales,
+            "tiene_datos": tiene_datos
         }
 
-        plan = planificador.create_financial_plan(plan_request)
+        plan = await planificador.create_financial_plan(plan_request)
         return {
             "status": "success",
             "plan": plan,
@@ -797,29 +931,21 @@ async def obtener_recomendaciones(
         }
     else:
         # Fallback directo al KnowledgeBase si el Planificador no está disponible
-        insights = knowledge_base.get_spending_insights(
+        insights = await knowledge_base.get_spending_insights(
             usuario_id=request.usuario_id,
-            datos_reales={
-                "total_transacciones": len(transacciones),
-                "gastos_totales": float(gastos_totales),
-                "ingresos_totales": float(ingresos_totales),
-                "gastos_por_categoria": gastos_por_categoria,
-                "presupuestos": presupuestos_data,
-                "ingreso_mensual": float(usuario.ingreso_mensual),
-                "periodo_dias": 90
-            },
-            tiene_datos=len(transacciones) > 0
+            datos_reales=datos_reales,
+            tiene_datos=tiene_datos
         )
 
-        prediccion = knowledge_base.predict_future_expenses(
+        prediccion = await knowledge_base.predict_future_expenses(
             usuario_id=request.usuario_id,
             meses_futuros=3,
             datos_reales={
-                "gastos_por_categoria": gastos_por_categoria,
+                "gastos_por_categoria": resumen["gastos_por_categoria"],
                 "promedio_mensual": float(gastos_totales / 3) if gastos_totales > 0 else 0,
-                "total_transacciones": len(transacciones)
+                "total_transacciones": resumen["total_transacciones"]
             },
-            tiene_datos=len(transacciones) > 0
+            tiene_datos=tiene_datos
         )
 
         return {
@@ -835,8 +961,8 @@ async def obtener_recomendaciones(
 @app.get("/dashboard/{usuario_id}")
 async def obtener_dashboard(
     usuario_id: int,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
     """
     Obtener dashboard completo del usuario (requiere autenticación)
@@ -852,28 +978,38 @@ async def obtener_dashboard(
         raise HTTPException(status_code=503, detail="Agente Interfaz no disponible")
     
     # Verificar usuario
-    usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    usuario = await db.get(Usuario, usuario_id)
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
-    # Recopilar datos
-    transacciones = db.query(Transaccion).filter(
-        Transaccion.usuario_id == usuario_id
-    ).order_by(Transaccion.fecha.desc()).limit(10).all()
+    # Recopilar datos (solo conteos, sin cargar las filas)
+    transacciones_recientes = await db.scalar(
+        select(func.count()).select_from(
+            select(Transaccion.id)
+            .where(Transaccion.usuario_id == usuario_id)
+            .order_by(Transaccion.fecha.desc())
+            .limit(10)
+            .subquery()
+        )
+    )
     
-    presupuestos = db.query(Presupuesto).filter(
-        Presupuesto.usuario_id == usuario_id,
-        Presupuesto.mes == datetime.utcnow().month,
-        Presupuesto.anio == datetime.utcnow().year
-    ).all()
+    presupuestos_activos = await db.scalar(
+        select(func.count(Presupuesto.id)).where(
+            Presupuesto.usuario_id == usuario_id,
+            Presupuesto.mes == datetime.utcnow().month,
+            Presupuesto.anio == datetime.utcnow().year
+        )
+    )
     
-    alertas = db.query(Alerta).filter(
-        Alerta.usuario_id == usuario_id,
-        Alerta.estado == EstadoAlerta.PENDIENTE
-    ).all()
+    alertas_pendientes = await db.scalar(
+        select(func.count(Alerta.id)).where(
+            Alerta.usuario_id == usuario_id,
+            Alerta.estado == EstadoAlerta.PENDIENTE
+        )
+    )
     
     # Formatear con Agente Interfaz usando AGUI
-    dashboard = interfaz.create_dashboard({
+    dashboard = await interfaz.create_dashboard({
         "usuario_id": usuario_id,
         "datos": {
             "usuario": {
@@ -881,9 +1017,9 @@ async def obtener_dashboard(
                 "email": usuario.email,
                 "ingreso_mensual": usuario.ingreso_mensual
             },
-            "transacciones_recientes": len(transacciones),
-            "presupuestos_activos": len(presupuestos),
-            "alertas_pendientes": len(alertas)
+            "transacciones_recientes": transacciones_recientes,
+            "presupuestos_activos": presupuestos_activos,
+            "alertas_pendientes": alertas_pendientes
         }
     })
     
@@ -901,7 +1037,7 @@ async def obtener_status_sistema():
     if not monitor:
         raise HTTPException(status_code=503, detail="Agente Monitor no disponible")
     
-    health = monitor.check_system_health()
+    health = await monitor.check_system_health()
     metrics = monitor.get_system_metrics()
     
     return {
@@ -917,31 +1053,59 @@ async def obtener_status_agentes():
         "agentes": {
             "planificador": {
                 "activo": planificador is not None,
-                "historial": len(planificador.get_history()) if planificador else 0
+                "historial": len(planificador.message_history) if planificador else 0
             },
             "ejecutor": {
                 "activo": ejecutor is not None,
-                "historial": len(ejecutor.get_history()) if ejecutor else 0
+                "historial": len(ejecutor.message_history) if ejecutor else 0
             },
             "notificador": {
                 "activo": notificador is not None,
-                "historial": len(notificador.get_history()) if notificador else 0
+                "historial": len(notificador.message_history) if notificador else 0
             },
             "interfaz": {
                 "activo": interfaz is not None,
-                "historial": len(interfaz.get_history()) if interfaz else 0
+                "historial": len(interfaz.message_history) if interfaz else 0
             },
             "knowledge_base": {
                 "activo": knowledge_base is not None,
-                "historial": len(knowledge_base.get_history()) if knowledge_base else 0
+                "historial": len(knowledge_base.message_history) if knowledge_base else 0
             },
             "monitor": {
                 "activo": monitor is not None,
-                "historial": len(monitor.get_history()) if monitor else 0
+                "historial": len(monitor.message_history) if monitor else 0
             }
         }
     }
 
+@app.get("/monitor/llm")
+async def obtener_metricas_llm():
+    """Obtener métricas de la capa de llamadas a Gemini (caché, coalescencia y colas)"""
+    cache = get_llm_cache()
+    return {
+        # get_stats cuenta las filas del nivel en disco: fuera del event loop
+        "cache": await asyncio.to_thread(cache.get_stats) if cache else {"enabled": False},
+        "single_flight": BaseAgent.single_flight.get_stats(),
+        "scheduler": get_llm_scheduler().get_stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+@app.get("/monitor/bus")
+async def obtener_metricas_bus():
+    """Obtener profundidad de buzón y tiempos de servicio por agente"""
+    return {
+        "agentes": message_bus.get_stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+@app.get("/monitor/escritores")
+async def obtener_metricas_escritores():
+    """Obtener filas encoladas, escritas y descartadas por los escritores en segundo plano"""
+    return {
+        "escritores": escritor_lotes.get_stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     import os
@@ -0,0 +1,13 @@
+"""
+Módulo de Migraciones versionadas del esquema de base de datos
+"""
+
+from migraciones.runner import aplicar_migraciones, estado_migraciones, bloquear_esquema
+from migraciones.verificar_indices import verificar_indices
+
+__all__ = [
+    'aplicar_migraciones',
+    'estado_migraciones',
+    'bloquear_esquema',
+    'verificar_indices'
+]
@@ -0,0 +1,35 @@
+"""
+Uso:
+    python -m migraciones              # aplicar migraciones pendientes
+    python -m migraciones --estado     # listar migraciones y su estado
+    python -m migraciones --verificar  # EXPLAIN de las consultas críticas
+"""
+
+import argparse
+import logging
+import sys
+
+from database import engine
+from migraciones import aplicar_migraciones, estado_migraciones, verificar_indices
+
+logging.basicConfig(level=logging.INFO)
+
+parser = argparse.ArgumentParser(description="Migraciones versionadas del esquema")
+parser.add_argument("--estado", action="store_true", help="Listar migraciones aplicadas y pendientes")
+parser.add_argument("--verificar", action="store_true", help="Comprobar con EXPLAIN el uso de índices")
+args = parser.parse_args()
+
+if args.estado:
+    for migracion in estado_migraciones(engine):
+        estado = migracion["aplicada_en"].isoformat() if migracion["aplicada_en"] else "pendiente"
+        print(f"{migracion['version']}  {estado:<28} {migracion['descripcion']}")
+elif args.verificar:
+    resultados = verificar_indices(engine)
+    for resultado in resultados:
+        marca = "✅" if resultado["usa_indice"] else "❌"
+        print(f"{marca} {resultado['consulta']} -> {resultado['indice']}")
+        if not resultado["usa_indice"]:
+            print(f"   {resultado['plan']}")
+    sys.exit(0 if all(r["usa_indice"] for r in resultados) else 1)
+else:
+    aplicar_migraciones(engine)
@@ -0,0 +1,154 @@
+"""
+Ejecutor de migraciones versionadas
+
+Cada migración es un módulo `migraciones/versiones/NNNN_nombre.py` con:
+    DESCRIPCION = "..."
+    def upgrade(conn): ...
+
+Las versiones aplicadas se registran en la tabla `schema_migrations`. Cada
+migración corre en su propia transacción y debe ser idempotente. Cada
+versión declara sus propias tablas e índices (no importa models.py), así
+que lo que hace no cambia al editar los modelos; todas comprueban antes de
+añadir columnas, tablas o índices porque las bases anteriores al sistema ya
+pueden tenerlos.
+"""
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from typing import Dict, Any, List
+from datetime import datetime
+import importlib
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+_VERSIONES_DIR = os.path.join(os.path.dirname(__file__), "versiones")
+_PATRON_MODULO = re.compile(r"^(\d{4})_\w+\.py$")
+
+# Clave del advisory lock de PostgreSQL (evita que dos workers migren a la vez)
+_LOCK_ID = 72_350_001
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", String(10), primary_key=True),
+    Column("descripcion", String(200), nullable=False),
+    Column("aplicada_en", DateTime, nullable=False)
+)
+
+
+def descubrir_migraciones() -> List[Dict[str, Any]]:
+    """
+    Listar las migraciones disponibles ordenadas por versión
+    """
+    migraciones = []
+    for archivo in sorted(os.listdir(_VERSIONES_DIR)):
+        coincidencia = _PATRON_MODULO.match(archivo)
+        if not coincidencia:
+            continue
+        modulo = importlib.import_module(f"migraciones.versiones.{archivo[:-3]}")
+        migraciones.append({
+            "version": coincidencia.group(1),
+            "descripcion": getattr(modulo, "DESCRIPCION", archivo[:-3]),
+            "upgrade": modulo.upgrade
+        })
+    return migraciones
+
+
+def _versiones_aplicadas(conn: Connection) -> Dict[str, datetime]:
+    return {version: fecha for version, fecha in conn.execute(
+        select(schema_migrations.c.version, schema_migrations.c.aplicada_en)
+    )}
+
+
+def bloquear_esquema(conn: Connection):
+    """
+    Tomar el advisory lock de las migraciones hasta el fin de la transacción actual
+
+    Sirve para tareas de arranque que no deben correr a la vez en varios
+    workers. En dialectos sin advisory locks no hace nada.
+    """
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _LOCK_ID})
+
+
+def aplicar_migraciones(engine: Engine) -> List[str]:
+    """
+    Aplicar en orden las migraciones pendientes; devuelve las versiones aplicadas
+    """
+    aplicadas: List[str] = []
+    with engine.connect() as conn:
+        es_postgres = conn.dialect.name == "postgresql"
+        if es_postgres:
+            conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": _LOCK_ID})
+            conn.commit()
+        try:
+            with conn.begin():
+                _metadata.create_all(conn, checkfirst=True)
+                ya_aplicadas = _versiones_aplicadas(conn)
+
+            for migracion in descubrir_migraciones():
+                if migracion["version"] in ya_aplicadas:
+                    continue
+                logger.info(f"🔧 Aplicando migración {migracion['version']}: {migracion['descripcion']}")
+                with conn.begin():
+                    migracion["upgrade"](conn)
+                    conn.execute(schema_migrations.insert().values(
+                        version=migracion["version"],
+                        descripcion=migracion["descripcion"][:200],
+                        aplicada_en=datetime.utcnow()
+                    ))
+                aplicadas.append(migracion["version"])
+        finally:
+            if es_postgres:
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": _LOCK_ID})
+                conn.commit()
+
+    if aplicadas:
+        logger.info(f"✅ Migraciones aplicadas: {', '.join(aplicadas)}")
+    else:
+        logger.info("✅ Esquema al día, no hay migraciones pendientes")
+    return aplicadas
+
+
+def estado_migraciones(engine: Engine) -> List[Dict[str, Any]]:
+    """
+    Listar cada migración con su fecha de aplicación (None si está pendiente)
+    """
+    with engine.connect() as conn:
+        aplicadas = _versiones_aplicadas(conn) if inspect(conn).has_table("schema_migrations") else {}
+    return [
+        {
+            "version": migracion["version"],
+            "descripcion": migracion["descripcion"],
+            "aplicada_en": aplicadas.get(migracion["version"])
+        }
+        for migracion in descubrir_migraciones()
+    ]
+
+
+# ===== Utilidades idempotentes para las migraciones =====
+
+def tiene_columna(conn: Connection, tabla: str, columna: str) -> bool:
+    return any(c["name"] == columna for c in inspect(conn).get_columns(tabla))
+
+
+def agregar_columna(conn: Connection, tabla: str, columna: str, definicion: str):
+    """
+    ALTER TABLE ... ADD COLUMN solo si la columna no existe
+    """
+    if not tiene_columna(conn, tabla, columna):
+        conn.execute(text(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}"))
+
+
+def crear_indice(conn: Connection, indice):
+    """
+    Crear un sqlalchemy.Index si aún no existe
+    """
+    existentes = {i["name"] for i in inspect(conn).get_indexes(indice.table.name)}
+    existentes |= {u["name"] for u in inspect(conn).get_unique_constraints(indice.table.name)}
+    if indice.name not in existentes:
+        indice.create(conn)
@@ -0,0 +1,78 @@
+"""
+Comprobación con EXPLAIN de que las consultas críticas de main.py usan sus índices
+
+En PostgreSQL se desactiva el seq scan dentro de la transacción de la
+comprobación: con tablas pequeñas el planificador lo preferiría aunque el
+índice sea utilizable, y lo que se verifica es que el índice aplica.
+"""
+
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Engine
+from typing import Dict, Any, List
+
+from models import Transaccion, Presupuesto, Alerta, CategoriaGasto, EstadoAlerta
+
+
+def _consultas_criticas() -> List[Dict[str, Any]]:
+    """
+    Réplicas de los filtros de los endpoints (valores de ejemplo)
+    """
+    return [
+        {
+            "consulta": "listar_transacciones",
+            "indice": "ix_transacciones_usuario_fecha",
+            "stmt": select(Transaccion)
+            .where(Transaccion.usuario_id == 1, Transaccion.fecha >= func.current_timestamp())
+            .order_by(Transaccion.fecha.desc().nulls_last())
+        },
+        {
+            "consulta": "presupuesto_de_categoria_del_mes",
+            "indice": "uq_presupuestos_usuario_periodo_categoria",
+            "stmt": select(Presupuesto).where(
+                Presupuesto.usuario_id == 1,
+                Presupuesto.categoria == CategoriaGasto.ALIMENTACION,
+                Presupuesto.mes == 1,
+                Presupuesto.anio == 2025
+            )
+        },
+        {
+            "consulta": "presupuestos_del_mes",
+            "indice": "uq_presupuestos_usuario_periodo_categoria",
+            "stmt": select(Presupuesto).where(
+                Presupuesto.usuario_id == 1,
+                Presupuesto.mes == 1,
+                Presupuesto.anio == 2025
+            )
+        },
+        {
+            "consulta": "alertas_pendientes",
+            "indice": "ix_alertas_usuario_estado_creado",
+            "stmt": select(Alerta)
+            .where(Alerta.usuario_id == 1, Alerta.estado == EstadoAlerta.PENDIENTE)
+            .order_by(Alerta.creado_en.desc().nulls_last())
+        }
+    ]
+
+
+def verificar_indices(engine: Engine) -> List[Dict[str, Any]]:
+    """
+    Ejecutar EXPLAIN de cada consulta crítica e indicar si usa el índice esperado
+    """
+    resultados = []
+    with engine.connect() as conn:
+        es_postgres = conn.dialect.name == "postgresql"
+        prefijo = "EXPLAIN" if es_postgres else "EXPLAIN QUERY PLAN"
+        for consulta in _consultas_criticas():
+            sql = str(consulta["stmt"].compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+            with conn.begin():
+                if es_postgres:
+                    conn.execute(text("SET LOCAL enable_seqscan = off"))
+                filas = conn.exec_driver_sql(f"{prefijo} {sql}").fetchall()
+            plan = "\n".join(" ".join(str(valor) for valor in fila) for fila in filas)
+            resultados.append({
+                "consulta": consulta["consulta"],
+                "indice": consulta["indice"],
+                "usa_indice": consulta["indice"] in plan,
+                "plan": plan
+            })
+    return resultados
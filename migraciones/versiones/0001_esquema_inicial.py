@@ -0,0 +1,110 @@
+"""
+Esquema base: las tablas tal como existían antes del sistema de migraciones
+
+Está congelado a propósito (no importa models.py): cada cambio posterior
+del esquema vive en su propia versión. En bases creadas antes del sistema de
+migraciones (con create_all) no hace nada.
+"""
+
+from sqlalchemy import (
+    Boolean, Column, DateTime, Enum, Float, ForeignKey, Integer, MetaData, String, Table, Text
+)
+
+DESCRIPCION = "Esquema inicial (usuarios, transacciones, presupuestos, alertas, análisis y logs)"
+
+# Los tipos Enum guardan el nombre del miembro, igual que SQLEnum(...) en models.py
+_TIPO_TRANSACCION = Enum("INGRESO", "GASTO", name="tipotransaccion")
+_CATEGORIA_GASTO = Enum(
+    "ALIMENTACION", "TRANSPORTE", "VIVIENDA", "ENTRETENIMIENTO",
+    "SALUD", "EDUCACION", "SERVICIOS", "OTROS",
+    name="categoriagasto"
+)
+_NIVEL_ALERTA = Enum("INFO", "WARNING", "CRITICAL", name="nivelalerta")
+_ESTADO_ALERTA = Enum("PENDIENTE", "LEIDA", "RESUELTA", name="estadoalerta")
+_TIPO_AGENTE = Enum(
+    "PLANIFICADOR", "EJECUTOR", "NOTIFICADOR", "INTERFAZ", "KNOWLEDGE_BASE", "MONITOR",
+    name="tipoagente"
+)
+
+metadata = MetaData()
+
+Table(
+    "usuarios", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("nombre", String(100), nullable=False),
+    Column("email", String(100), unique=True, index=True, nullable=False),
+    Column("ingreso_mensual", Float),
+    Column("objetivo_ahorro", Float),
+    Column("creado_en", DateTime),
+    Column("actualizado_en", DateTime)
+)
+
+Table(
+    "transacciones", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("usuario_id", Integer, ForeignKey("usuarios.id"), nullable=False),
+    Column("tipo", _TIPO_TRANSACCION, nullable=False),
+    Column("categoria", _CATEGORIA_GASTO, nullable=True),
+    Column("monto", Float, nullable=False),
+    Column("descripcion", String(200), nullable=True),
+    Column("fecha", DateTime),
+    Column("creado_en", DateTime)
+)
+
+Table(
+    "presupuestos", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("usuario_id", Integer, ForeignKey("usuarios.id"), nullable=False),
+    Column("categoria", _CATEGORIA_GASTO, nullable=False),
+    Column("monto_limite", Float, nullable=False),
+    Column("monto_gastado", Float),
+    Column("mes", Integer, nullable=False),
+    Column("anio", Integer, nullable=False),
+    Column("creado_en", DateTime),
+    Column("actualizado_en", DateTime)
+)
+
+Table(
+    "alertas", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("usuario_id", Integer, ForeignKey("usuarios.id"), nullable=False),
+    Column("nivel", _NIVEL_ALERTA, nullable=False),
+    Column("estado", _ESTADO_ALERTA),
+    Column("titulo", String(200), nullable=False),
+    Column("mensaje", Text, nullable=False),
+    Column("datos_extra", Text, nullable=True),
+    Column("creado_en", DateTime),
+    Column("leido_en", DateTime, nullable=True)
+)
+
+Table(
+    "analisis_financieros", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("usuario_id", Integer, ForeignKey("usuarios.id"), nullable=False),
+    Column("periodo_inicio", DateTime, nullable=False),
+    Column("periodo_fin", DateTime, nullable=False),
+    Column("total_ingresos", Float),
+    Column("total_gastos", Float),
+    Column("balance", Float),
+    Column("recomendaciones", Text, nullable=True),
+    Column("analisis_ia", Text, nullable=True),
+    Column("creado_en", DateTime)
+)
+
+Table(
+    "logs_agentes", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("tipo_agente", _TIPO_AGENTE, nullable=False),
+    Column("accion", String(100), nullable=False),
+    Column("protocolo_usado", String(50), nullable=True),
+    Column("mensaje_enviado", Text, nullable=True),
+    Column("mensaje_recibido", Text, nullable=True),
+    Column("datos_extra", Text, nullable=True),
+    Column("exito", Boolean),
+    Column("error", Text, nullable=True),
+    Column("timestamp", DateTime)
+)
+
+
+def upgrade(conn):
+    metadata.create_all(conn, checkfirst=True)
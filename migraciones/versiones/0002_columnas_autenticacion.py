@@ -0,0 +1,13 @@
+"""
+Columnas de autenticación en usuarios (antes migrate_auth.py)
+"""
+
+from migraciones.runner import agregar_columna
+
+DESCRIPCION = "Columnas de autenticación en usuarios"
+
+
+def upgrade(conn):
+    agregar_columna(conn, "usuarios", "password_hash", "VARCHAR(255)")
+    agregar_columna(conn, "usuarios", "activo", "BOOLEAN DEFAULT TRUE")
+    agregar_columna(conn, "usuarios", "ultimo_login", "TIMESTAMP")
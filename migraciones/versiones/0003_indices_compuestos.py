@@ -0,0 +1,65 @@
+"""
+Índices compuestos para los filtros más frecuentes de la API
+
+- transacciones (usuario_id, fecha)
+- presupuestos (usuario_id, anio, mes, categoria) único
+- alertas (usuario_id, estado, creado_en)
+"""
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, func, select
+
+from migraciones.runner import crear_indice
+
+DESCRIPCION = "Índices compuestos de transacciones, presupuestos y alertas"
+
+# Solo las columnas que usan los índices, tal como estaban en esta versión
+metadata = MetaData()
+
+transacciones = Table(
+    "transacciones", metadata,
+    Column("usuario_id", Integer),
+    Column("fecha", DateTime)
+)
+presupuestos = Table(
+    "presupuestos", metadata,
+    Column("usuario_id", Integer),
+    Column("categoria", String(20)),
+    Column("mes", Integer),
+    Column("anio", Integer)
+)
+alertas = Table(
+    "alertas", metadata,
+    Column("usuario_id", Integer),
+    Column("estado", String(20)),
+    Column("creado_en", DateTime)
+)
+
+INDICES = (
+    Index("ix_transacciones_usuario_fecha", transacciones.c.usuario_id, transacciones.c.fecha),
+    Index(
+        "uq_presupuestos_usuario_periodo_categoria",
+        presupuestos.c.usuario_id, presupuestos.c.anio, presupuestos.c.mes, presupuestos.c.categoria,
+        unique=True
+    ),
+    Index("ix_alertas_usuario_estado_creado", alertas.c.usuario_id, alertas.c.estado, alertas.c.creado_en),
+)
+
+
+def upgrade(conn):
+    # El índice único falla si ya hay presupuestos duplicados: avisar con detalle
+    duplicados = conn.execute(
+        select(func.count()).select_from(
+            select(presupuestos.c.usuario_id)
+            .group_by(presupuestos.c.usuario_id, presupuestos.c.anio, presupuestos.c.mes, presupuestos.c.categoria)
+            .having(func.count() > 1)
+            .subquery()
+        )
+    ).scalar()
+    if duplicados:
+        raise RuntimeError(
+            f"Hay {duplicados} grupos de presupuestos duplicados (usuario, año, mes, categoría); "
+            "consolídalos antes de aplicar la migración 0003"
+        )
+
+    for indice in INDICES:
+        crear_indice(conn, indice)
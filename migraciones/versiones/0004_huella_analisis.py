@@ -0,0 +1,29 @@
+"""
+Huella de los datos de entrada en analisis_financieros para reutilizar análisis
+"""
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table
+
+from migraciones.runner import agregar_columna, crear_indice
+
+DESCRIPCION = "Columnas tipo y huella en analisis_financieros"
+
+metadata = MetaData()
+
+analisis_financieros = Table(
+    "analisis_financieros", metadata,
+    Column("usuario_id", Integer),
+    Column("huella", String(64)),
+    Column("creado_en", DateTime)
+)
+
+INDICE_HUELLA = Index(
+    "ix_analisis_usuario_huella_creado",
+    analisis_financieros.c.usuario_id, analisis_financieros.c.huella, analisis_financieros.c.creado_en
+)
+
+
+def upgrade(conn):
+    agregar_columna(conn, "analisis_financieros", "tipo", "VARCHAR(50)")
+    agregar_columna(conn, "analisis_financieros", "huella", "VARCHAR(64)")
+    crear_indice(conn, INDICE_HUELLA)
@@ -0,0 +1,51 @@
+"""
+Estadísticas por (usuario, categoría) y registro de gastos inusuales
+"""
+
+from sqlalchemy import (
+    Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table, Text, UniqueConstraint
+)
+
+DESCRIPCION = "Tablas estadisticas_gasto y anomalias_gasto"
+
+metadata = MetaData()
+
+# Referencias de las claves foráneas; ya existen y no se crean aquí
+Table("usuarios", metadata, Column("id", Integer, primary_key=True))
+Table("transacciones", metadata, Column("id", Integer, primary_key=True))
+
+estadisticas_gasto = Table(
+    "estadisticas_gasto", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("usuario_id", Integer, ForeignKey("usuarios.id"), nullable=False),
+    Column("categoria", String(30), nullable=False),
+    Column("n", Integer, nullable=False),
+    Column("media", Float, nullable=False),
+    Column("m2", Float, nullable=False),
+    Column("mediana", Float, nullable=True),
+    Column("mad", Float, nullable=True),
+    Column("sketch", Text, nullable=True),
+    Column("actualizado_en", DateTime),
+    UniqueConstraint("usuario_id", "categoria", name="uq_estadisticas_gasto")
+)
+
+anomalias_gasto = Table(
+    "anomalias_gasto", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("usuario_id", Integer, ForeignKey("usuarios.id"), nullable=False),
+    Column("transaccion_id", Integer, ForeignKey("transacciones.id", ondelete="SET NULL"), nullable=True),
+    Column("categoria", String(30), nullable=False),
+    Column("monto", Float, nullable=False),
+    Column("fecha", DateTime, nullable=True),
+    Column("media", Float, nullable=True),
+    Column("mediana", Float, nullable=True),
+    Column("mad", Float, nullable=True),
+    Column("puntaje", Float, nullable=False),
+    Column("creado_en", DateTime),
+    Index("ix_anomalias_gasto_usuario_creado", "usuario_id", "creado_en")
+)
+
+
+def upgrade(conn):
+    estadisticas_gasto.create(conn, checkfirst=True)
+    anomalias_gasto.create(conn, checkfirst=True)
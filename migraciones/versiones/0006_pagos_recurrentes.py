@@ -0,0 +1,44 @@
+"""
+Índice de pagos recurrentes y suscripciones
+"""
+
+from sqlalchemy import (
+    Column, DateTime, Enum, Float, ForeignKey, Index, Integer, MetaData, String, Table, UniqueConstraint
+)
+
+DESCRIPCION = "Tabla pagos_recurrentes"
+
+metadata = MetaData()
+
+# Referencia de la clave foránea; ya existe y no se crea aquí
+Table("usuarios", metadata, Column("id", Integer, primary_key=True))
+
+pagos_recurrentes = Table(
+    "pagos_recurrentes", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("usuario_id", Integer, ForeignKey("usuarios.id"), nullable=False),
+    Column("clave", String(80), nullable=False),
+    Column("banda", Integer, nullable=False),
+    Column("descripcion", String(200), nullable=True),
+    Column("categoria", Enum(
+        "ALIMENTACION", "TRANSPORTE", "VIVIENDA", "ENTRETENIMIENTO",
+        "SALUD", "EDUCACION", "SERVICIOS", "OTROS",
+        name="categoriagasto"
+    ), nullable=True),
+    Column("ocurrencias", Integer, nullable=False),
+    Column("monto_medio", Float, nullable=False),
+    Column("primera_fecha", DateTime, nullable=True),
+    Column("ultima_fecha", DateTime, nullable=True),
+    Column("intervalos", Integer, nullable=False),
+    Column("intervalo_medio", Float, nullable=True),
+    Column("intervalo_m2", Float, nullable=False),
+    Column("periodicidad", String(20), nullable=True),
+    Column("proxima_fecha", DateTime, nullable=True),
+    Column("actualizado_en", DateTime),
+    UniqueConstraint("usuario_id", "clave", "banda", name="uq_pagos_recurrentes"),
+    Index("ix_pagos_recurrentes_usuario_periodicidad", "usuario_id", "periodicidad")
+)
+
+
+def upgrade(conn):
+    pagos_recurrentes.create(conn, checkfirst=True)
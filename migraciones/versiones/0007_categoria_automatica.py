@@ -0,0 +1,11 @@
+"""
+Marca de categoría asignada automáticamente en transacciones
+"""
+
+from migraciones.runner import agregar_columna
+
+DESCRIPCION = "Columna categoria_automatica en transacciones"
+
+
+def upgrade(conn):
+    agregar_columna(conn, "transacciones", "categoria_automatica", "BOOLEAN DEFAULT FALSE")
@@ -0,0 +1,32 @@
+"""
+Totales mensuales por (usuario, tipo, categoría)
+"""
+
+from sqlalchemy import (
+    Column, DateTime, Enum, Float, ForeignKey, Integer, MetaData, String, Table, UniqueConstraint
+)
+
+DESCRIPCION = "Tabla resumen_mensual_categoria"
+
+metadata = MetaData()
+
+# Referencia de la clave foránea; ya existe y no se crea aquí
+Table("usuarios", metadata, Column("id", Integer, primary_key=True))
+
+resumen_mensual_categoria = Table(
+    "resumen_mensual_categoria", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("usuario_id", Integer, ForeignKey("usuarios.id"), nullable=False),
+    Column("anio", Integer, nullable=False),
+    Column("mes", Integer, nullable=False),
+    Column("tipo", Enum("INGRESO", "GASTO", name="tipotransaccion"), nullable=False),
+    Column("categoria", String(30), nullable=False),
+    Column("total", Float, nullable=False),
+    Column("cantidad", Integer, nullable=False),
+    Column("actualizado_en", DateTime),
+    UniqueConstraint("usuario_id", "anio", "mes", "tipo", "categoria", name="uq_resumen_mensual_categoria")
+)
+
+
+def upgrade(conn):
+    resumen_mensual_categoria.create(conn, checkfirst=True)
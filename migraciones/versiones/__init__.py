@@ -0,0 +1,3 @@
+"""
+Migraciones versionadas (NNNN_nombre.py), aplicadas en orden por migraciones.runner
+"""
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, UniqueConstraint, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -60,6 +60,9 @@ class Usuario(Base):
 
 class Transaccion(Base):
     __tablename__ = "transacciones"
+    __table_args__ = (
+        Index("ix_transacciones_usuario_fecha", "usuario_id", "fecha"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
@@ -67,14 +70,105 @@ class Transaccion(Base):
     categoria = Column(SQLEnum(CategoriaGasto), nullable=True)
     monto = Column(Float, nullable=False)
     descripcion = Column(String(200), nullable=True)
+    categoria_automatica = Column(Boolean, default=False)  # Categoría asignada por el categorizador
     fecha = Column(DateTime, default=datetime.utcnow)
     creado_en = Column(DateTime, default=datetime.utcnow)
     
     # Relaciones
     usuario = relationship("Usuario", back_populates="transacciones")
 
+class ResumenMensualCategoria(Base):
+    """
+    Totales mensuales por (usuario, tipo, categoría) mantenidos al insertar transacciones
+    """
+    __tablename__ = "resumen_mensual_categoria"
+    __table_args__ = (
+        UniqueConstraint("usuario_id", "anio", "mes", "tipo", "categoria", name="uq_resumen_mensual_categoria"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    anio = Column(Integer, nullable=False)
+    mes = Column(Integer, nullable=False)  # 1-12
+    tipo = Column(SQLEnum(TipoTransaccion), nullable=False)
+    categoria = Column(String(30), nullable=False)  # valor de CategoriaGasto o "sin_categoria"
+    total = Column(Float, nullable=False, default=0.0)
+    cantidad = Column(Integer, nullable=False, default=0)
+    actualizado_en = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class EstadisticaGasto(Base):
+    """
+    Estadísticas acumuladas de los gastos por (usuario, categoría) para detectar anomalías
+    """
+    __tablename__ = "estadisticas_gasto"
+    __table_args__ = (
+        UniqueConstraint("usuario_id", "categoria", name="uq_estadisticas_gasto"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    categoria = Column(String(30), nullable=False)  # valor de CategoriaGasto o "sin_categoria"
+    n = Column(Integer, nullable=False, default=0)
+    media = Column(Float, nullable=False, default=0.0)
+    m2 = Column(Float, nullable=False, default=0.0)  # Suma de cuadrados de desviaciones (Welford)
+    mediana = Column(Float, nullable=True)
+    mad = Column(Float, nullable=True)  # Mediana de las desviaciones absolutas
+    sketch = Column(Text, nullable=True)  # JSON con los marcadores P² de mediana y MAD
+    actualizado_en = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AnomaliaGasto(Base):
+    """
+    Gastos marcados como inusuales al registrarse
+    """
+    __tablename__ = "anomalias_gasto"
+    __table_args__ = (
+        Index("ix_anomalias_gasto_usuario_creado", "usuario_id", "creado_en"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    transaccion_id = Column(Integer, ForeignKey("transacciones.id", ondelete="SET NULL"), nullable=True)
+    categoria = Column(String(30), nullable=False)
+    monto = Column(Float, nullable=False)
+    fecha = Column(DateTime, nullable=True)
+    media = Column(Float, nullable=True)
+    mediana = Column(Float, nullable=True)
+    mad = Column(Float, nullable=True)
+    puntaje = Column(Float, nullable=False)  # Puntaje z robusto (o z clásico si MAD = 0)
+    creado_en = Column(DateTime, default=datetime.utcnow)
+
+class PagoRecurrente(Base):
+    """
+    Índice de gastos repetidos por (usuario, descripción normalizada, banda de monto)
+    """
+    __tablename__ = "pagos_recurrentes"
+    __table_args__ = (
+        UniqueConstraint("usuario_id", "clave", "banda", name="uq_pagos_recurrentes"),
+        Index("ix_pagos_recurrentes_usuario_periodicidad", "usuario_id", "periodicidad"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    clave = Column(String(80), nullable=False)  # Descripción normalizada
+    banda = Column(Integer, nullable=False)  # Banda logarítmica del monto
+    descripcion = Column(String(200), nullable=True)  # Última descripción original
+    categoria = Column(SQLEnum(CategoriaGasto), nullable=True)
+    ocurrencias = Column(Integer, nullable=False, default=0)
+    monto_medio = Column(Float, nullable=False, default=0.0)
+    primera_fecha = Column(DateTime, nullable=True)
+    ultima_fecha = Column(DateTime, nullable=True)
+    intervalos = Column(Integer, nullable=False, default=0)
+    intervalo_medio = Column(Float, nullable=True)  # Días entre cargos (Welford)
+    intervalo_m2 = Column(Float, nullable=False, default=0.0)
+    periodicidad = Column(String(20), nullable=True)  # semanal, mensual, anual o NULL
+    proxima_fecha = Column(DateTime, nullable=True)
+    actualizado_en = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class Presupuesto(Base):
     __tablename__ = "presupuestos"
+    __table_args__ = (
+        Index("uq_presupuestos_usuario_periodo_categoria", "usuario_id", "anio", "mes", "categoria", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
@@ -91,6 +185,9 @@ class Presupuesto(Base):
 
 class Alerta(Base):
     __tablename__ = "alertas"
+    __table_args__ = (
+        Index("ix_alertas_usuario_estado_creado", "usuario_id", "estado", "creado_en"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
@@ -107,9 +204,14 @@ class Alerta(Base):
 
 class AnalisisFinanciero(Base):
     __tablename__ = "analisis_financieros"
+    __table_args__ = (
+        Index("ix_analisis_usuario_huella_creado", "usuario_id", "huella", "creado_en"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    tipo = Column(String(50), nullable=True)  # Objetivo del análisis (calcular_balance, ...)
+    huella = Column(String(64), nullable=True)  # sha256 de tipo + período + datos de entrada
     periodo_inicio = Column(DateTime, nullable=False)
     periodo_fin = Column(DateTime, nullable=False)
     total_ingresos = Column(Float, default=0.0)
@@ -0,0 +1,45 @@
+"""
+Módulo de Servicios de datos compartidos por la API y los agentes
+"""
+
+from servicios.agregaciones import calcular_datos_reales, obtener_presupuestos_mes
+from servicios.resumenes import (
+    acumular_en_resumen,
+    registrar_transaccion,
+    reconstruir_resumenes,
+    asegurar_resumenes
+)
+from servicios.presupuestos import consumir_presupuesto, recalcular_presupuestos
+from servicios.importacion import importar_transacciones
+from servicios.analisis import huella_analisis, buscar_analisis, guardar_analisis
+from servicios.consultas import bloques_transacciones, contar_transacciones, ingreso_mensual_usuario
+from servicios.anomalias import evaluar_transaccion, anomalias_recientes, reconstruir_estadisticas
+from servicios.recurrentes import registrar_recurrente, pagos_recurrentes, reconstruir_recurrentes
+from servicios.categorizacion import Categorizador, categorizar_descripcion, aprender_transaccion
+
+__all__ = [
+    'calcular_datos_reales',
+    'obtener_presupuestos_mes',
+    'acumular_en_resumen',
+    'registrar_transaccion',
+    'reconstruir_resumenes',
+    'asegurar_resumenes',
+    'consumir_presupuesto',
+    'recalcular_presupuestos',
+    'importar_transacciones',
+    'huella_analisis',
+    'buscar_analisis',
+    'guardar_analisis',
+    'bloques_transacciones',
+    'contar_transacciones',
+    'ingreso_mensual_usuario',
+    'evaluar_transaccion',
+    'anomalias_recientes',
+    'reconstruir_estadisticas',
+    'registrar_recurrente',
+    'pagos_recurrentes',
+    'reconstruir_recurrentes',
+    'Categorizador',
+    'categorizar_descripcion',
+    'aprender_transaccion'
+]
@@ -0,0 +1,81 @@
+"""
+Tareas de mantenimiento de los servicios locales
+
+Uso:
+    python -m servicios resumenes [--usuario ID]                   # reconstruir el resumen mensual
+    python -m servicios presupuestos [--anio 2025 --mes 1] [--usuario ID]
+    python -m servicios anomalias [--usuario ID]                   # reconstruir estadísticas de gasto
+    python -m servicios recurrentes [--usuario ID]                 # reconstruir pagos recurrentes
+    python -m servicios pronosticos [--usuario ID] [--meses 3]
+    python -m servicios categorizar --usuario ID "DESCRIPCION" ...
+"""
+
+from datetime import datetime
+import argparse
+import logging
+import time
+
+from database import SessionLocal
+from servicios.anomalias import reconstruir_estadisticas
+from servicios.categorizacion import Categorizador
+from servicios.presupuestos import recalcular_presupuestos
+from servicios.pronosticos import pronosticar_usuarios
+from servicios.recurrentes import reconstruir_recurrentes
+from servicios.resumenes import reconstruir_resumenes
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("servicios")
+
+
+def _pronosticar(db, args):
+    inicio = time.perf_counter()
+    pronosticos = pronosticar_usuarios(db, [args.usuario] if args.usuario else None, args.meses)
+    duracion = (time.perf_counter() - inicio) * 1000
+    for usuario_id, pronostico in sorted(pronosticos.items()):
+        estimados = ", ".join(f"{p['gasto_estimado']:.2f}" for p in pronostico["predicciones"])
+        logger.info(f"Usuario {usuario_id} ({pronostico.get('modelo', '-')}): {estimados}")
+    logger.info(f"✅ {len(pronosticos)} usuarios pronosticados en {duracion:.1f} ms")
+
+
+def _categorizar(db, args):
+    categorizador = Categorizador(db, args.usuario)
+    logger.info(f"Modelo del usuario {args.usuario}: {categorizador.modelo.ejemplos} ejemplos")
+    for descripcion, categoria in zip(args.descripciones, categorizador.categorias(args.descripciones)):
+        logger.info(f"{descripcion!r} -> {categoria.value if categoria else '-'}")
+
+
+ahora = datetime.utcnow()
+parser = argparse.ArgumentParser(description="Tareas de mantenimiento de los servicios")
+subcomandos = parser.add_subparsers(dest="tarea", required=True)
+
+for nombre, ayuda, tarea in (
+    ("resumenes", "Reconstruir el resumen mensual por categoría", reconstruir_resumenes),
+    ("anomalias", "Reconstruir las estadísticas de gasto de la detección de anomalías", reconstruir_estadisticas),
+    ("recurrentes", "Reconstruir el índice de pagos recurrentes", reconstruir_recurrentes),
+):
+    sub = subcomandos.add_parser(nombre, help=ayuda)
+    sub.add_argument("--usuario", type=int, default=None, help="Solo este usuario")
+    sub.set_defaults(ejecutar=lambda db, args, tarea=tarea: tarea(db, args.usuario))
+
+sub = subcomandos.add_parser("presupuestos", help="Recalcular monto_gastado de los presupuestos de un mes")
+sub.add_argument("--anio", type=int, default=ahora.year)
+sub.add_argument("--mes", type=int, default=ahora.month)
+sub.add_argument("--usuario", type=int, default=None, help="Solo este usuario")
+sub.set_defaults(ejecutar=lambda db, args: recalcular_presupuestos(db, args.anio, args.mes, args.usuario))
+
+sub = subcomandos.add_parser("pronosticos", help="Pronosticar el gasto mensual de los usuarios")
+sub.add_argument("--usuario", type=int, default=None, help="Solo este usuario")
+sub.add_argument("--meses", type=int, default=3)
+sub.set_defaults(ejecutar=_pronosticar)
+
+sub = subcomandos.add_parser("categorizar", help="Probar la categorización automática de descripciones")
+sub.add_argument("descripciones", nargs="+")
+sub.add_argument("--usuario", type=int, required=True)
+sub.set_defaults(ejecutar=_categorizar)
+
+args = parser.parse_args()
+db = SessionLocal()
+try:
+    args.ejecutar(db, args)
+finally:
+    db.close()
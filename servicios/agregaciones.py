@@ -0,0 +1,170 @@
+"""
+Agregaciones financieras calculadas en la base de datos
+
+Sustituye los bucles en Python sobre objetos ORM por consultas GROUP BY
+(tipo, categoria) y devuelve directamente la estructura `datos_reales`
+que consumen los agentes.
+"""
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+
+from config import RESUMEN_CONFIG
+from models import Transaccion, Presupuesto, ResumenMensualCategoria, TipoTransaccion
+from servicios.resumenes import SIN_CATEGORIA, clave_categoria
+
+
+def _inicio_mes(fecha: datetime) -> datetime:
+    return fecha.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _mes_siguiente(fecha: datetime) -> datetime:
+    if fecha.month == 12:
+        return fecha.replace(year=fecha.year + 1, month=1)
+    return fecha.replace(month=fecha.month + 1)
+
+
+def _indice_mes(fecha: datetime) -> int:
+    return fecha.year * 12 + fecha.month
+
+
+def _acumular(acumulado: Dict[str, Any], tipo, categoria: Optional[str], total, cantidad):
+    total = float(total or 0.0)
+    acumulado["total_transacciones"] += cantidad
+    if tipo == TipoTransaccion.INGRESO:
+        acumulado["ingresos_totales"] += total
+    elif tipo == TipoTransaccion.GASTO:
+        acumulado["gastos_totales"] += total
+        if categoria and categoria != SIN_CATEGORIA:
+            gastos = acumulado["gastos_por_categoria"]
+            gastos[categoria] = gastos.get(categoria, 0.0) + total
+
+
+def _agregar_transacciones(
+    db: Session,
+    acumulado: Dict[str, Any],
+    usuario_id: int,
+    fecha_desde: datetime,
+    fecha_hasta: Optional[datetime]
+):
+    """
+    GROUP BY (tipo, categoria) sobre `transacciones` para un rango de fechas
+    """
+    stmt = (
+        select(
+            Transaccion.tipo,
+            Transaccion.categoria,
+            func.sum(Transaccion.monto),
+            func.count(Transaccion.id)
+        )
+        .where(
+            Transaccion.usuario_id == usuario_id,
+            Transaccion.fecha >= fecha_desde
+        )
+        .group_by(Transaccion.tipo, Transaccion.categoria)
+    )
+    if fecha_hasta is not None:
+        stmt = stmt.where(Transaccion.fecha < fecha_hasta)
+
+    for tipo, categoria, total, cantidad in db.execute(stmt):
+        _acumular(acumulado, tipo, clave_categoria(categoria), total, cantidad)
+
+
+def _agregar_resumenes(
+    db: Session,
+    acumulado: Dict[str, Any],
+    usuario_id: int,
+    mes_desde: datetime,
+    mes_hasta: datetime
+):
+    """
+    Sumar las filas del resumen mensual de los meses completos [mes_desde, mes_hasta)
+    """
+    indice = ResumenMensualCategoria.anio * 12 + ResumenMensualCategoria.mes
+    stmt = (
+        select(
+            ResumenMensualCategoria.tipo,
+            ResumenMensualCategoria.categoria,
+            func.sum(ResumenMensualCategoria.total),
+            func.sum(ResumenMensualCategoria.cantidad)
+        )
+        .where(
+            ResumenMensualCategoria.usuario_id == usuario_id,
+            indice >= _indice_mes(mes_desde),
+            indice < _indice_mes(mes_hasta)
+        )
+        .group_by(ResumenMensualCategoria.tipo, ResumenMensualCategoria.categoria)
+    )
+    for tipo, categoria, total, cantidad in db.execute(stmt):
+        _acumular(acumulado, tipo, categoria, total, int(cantidad or 0))
+
+
+def calcular_datos_reales(
+    db: Session,
+    usuario_id: int,
+    fecha_desde: datetime,
+    fecha_hasta: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Totales de ingresos/gastos y gastos por categoría del período
+
+    Los meses completos del rango se leen del resumen mensual; solo los
+    extremos parciales (inicio del primer mes y mes en curso) se agregan
+    sobre `transacciones`.
+    """
+    acumulado: Dict[str, Any] = {
+        "ingresos_totales": 0.0,
+        "gastos_totales": 0.0,
+        "total_transacciones": 0,
+        "gastos_por_categoria": {}
+    }
+
+    primer_mes_completo = _inicio_mes(fecha_desde)
+    if primer_mes_completo < fecha_desde:
+        primer_mes_completo = _mes_siguiente(primer_mes_completo)
+    fin_meses_completos = _inicio_mes(fecha_hasta or datetime.utcnow())
+
+    if not RESUMEN_CONFIG["usar_resumenes"] or primer_mes_completo >= fin_meses_completos:
+        _agregar_transacciones(db, acumulado, usuario_id, fecha_desde, fecha_hasta)
+    else:
+        if fecha_desde < primer_mes_completo:
+            _agregar_transacciones(db, acumulado, usuario_id, fecha_desde, primer_mes_completo)
+        _agregar_resumenes(db, acumulado, usuario_id, primer_mes_completo, fin_meses_completos)
+        _agregar_transacciones(db, acumulado, usuario_id, fin_meses_completos, fecha_hasta)
+
+    return {
+        "ingresos_totales": acumulado["ingresos_totales"],
+        "gastos_totales": acumulado["gastos_totales"],
+        "balance": acumulado["ingresos_totales"] - acumulado["gastos_totales"],
+        "total_transacciones": acumulado["total_transacciones"],
+        "gastos_por_categoria": acumulado["gastos_por_categoria"]
+    }
+
+
+def obtener_presupuestos_mes(db: Session, usuario_id: int, mes: int, anio: int) -> List[Dict[str, Any]]:
+    """
+    Presupuestos del mes con su porcentaje de uso (solo las columnas necesarias)
+    """
+    stmt = select(
+        Presupuesto.categoria,
+        Presupuesto.monto_limite,
+        Presupuesto.monto_gastado
+    ).where(
+        Presupuesto.usuario_id == usuario_id,
+        Presupuesto.mes == mes,
+        Presupuesto.anio == anio
+    )
+
+    presupuestos = []
+    for categoria, monto_limite, monto_gastado in db.execute(stmt):
+        monto_gastado = monto_gastado or 0.0
+        porcentaje = (monto_gastado / monto_limite * 100) if monto_limite > 0 else 0
+        presupuestos.append({
+            "categoria": categoria.value,
+            "limite": float(monto_limite),
+            "gastado": float(monto_gastado),
+            "porcentaje": round(porcentaje, 2)
+        })
+    return presupuestos
@@ -0,0 +1,125 @@
+"""
+Análisis financieros guardados y reutilizados por huella de sus datos de entrada
+
+Cada análisis completado se guarda en `analisis_financieros` junto con una
+huella (sha256) del tipo de análisis, el período pedido y los `datos_reales`
+usados. Una petición posterior con la misma huella, dentro de la vigencia
+configurada, se responde desde la tabla sin volver a llamar al modelo.
+"""
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+import hashlib
+import json
+import logging
+
+from config import ANALISIS_CACHE_CONFIG
+from models import AnalisisFinanciero
+
+logger = logging.getLogger(__name__)
+
+
+def _canonico(valor: Any) -> Any:
+    """
+    Forma estable de los datos para la huella (importes redondeados, claves como texto)
+    """
+    if isinstance(valor, float):
+        return round(valor, ANALISIS_CACHE_CONFIG["decimales_huella"])
+    if isinstance(valor, dict):
+        return {str(k): _canonico(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_canonico(v) for v in valor]
+    return valor
+
+
+def huella_analisis(tipo: str, periodo_dias: int, datos_reales: Dict[str, Any]) -> str:
+    """
+    Calcular la huella de un análisis a partir de su tipo, período y datos de entrada
+    """
+    contenido = json.dumps(
+        {"tipo": tipo, "periodo_dias": periodo_dias, "datos": _canonico(datos_reales)},
+        sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def buscar_analisis(db: Session, usuario_id: int, huella: str) -> Optional[Dict[str, Any]]:
+    """
+    Devolver el resultado guardado más reciente con esa huella, o None
+
+    Solo se consideran análisis dentro de `vigencia_horas`.
+    """
+    if not ANALISIS_CACHE_CONFIG["habilitado"]:
+        return None
+    desde = datetime.utcnow() - timedelta(hours=ANALISIS_CACHE_CONFIG["vigencia_horas"])
+    fila = db.execute(
+        select(AnalisisFinanciero.id, AnalisisFinanciero.analisis_ia, AnalisisFinanciero.creado_en)
+        .where(
+            AnalisisFinanciero.usuario_id == usuario_id,
+            AnalisisFinanciero.huella == huella,
+            AnalisisFinanciero.creado_en >= desde
+        )
+        .order_by(AnalisisFinanciero.creado_en.desc())
+        .limit(1)
+    ).first()
+    if fila is None or not fila.analisis_ia:
+        return None
+    try:
+        resultado = json.loads(fila.analisis_ia)
+    except ValueError:
+        logger.warning(f"Análisis {fila.id} con contenido no JSON; se ignora")
+        return None
+    return {"analisis_id": fila.id, "creado_en": fila.creado_en, "resultado": resultado}
+
+
+def _extraer_recomendaciones(resultado: Any) -> Optional[List[Any]]:
+    """
+    Primera lista `recomendaciones` que aparezca en el resultado (plan o análisis directo)
+    """
+    if isinstance(resultado, dict):
+        if isinstance(resultado.get("recomendaciones"), list):
+            return resultado["recomendaciones"]
+        valores = resultado.values()
+    elif isinstance(resultado, list):
+        valores = resultado
+    else:
+        return None
+    for valor in valores:
+        encontradas = _extraer_recomendaciones(valor)
+        if encontradas is not None:
+            return encontradas
+    return None
+
+
+def guardar_analisis(
+    db: Session,
+    usuario_id: int,
+    tipo: str,
+    huella: str,
+    periodo_inicio: datetime,
+    periodo_fin: datetime,
+    datos_reales: Dict[str, Any],
+    resultado: Dict[str, Any]
+) -> int:
+    """
+    Guardar un análisis completado y confirmar; devuelve su id
+    """
+    recomendaciones = _extraer_recomendaciones(resultado)
+    analisis = AnalisisFinanciero(
+        usuario_id=usuario_id,
+        tipo=tipo,
+        huella=huella,
+        periodo_inicio=periodo_inicio,
+        periodo_fin=periodo_fin,
+        total_ingresos=float(datos_reales.get("ingresos_totales", 0.0)),
+        total_gastos=float(datos_reales.get("gastos_totales", 0.0)),
+        balance=float(datos_reales.get("balance", 0.0)),
+        recomendaciones=json.dumps(recomendaciones, separators=(",", ":"), ensure_ascii=False, default=str)
+        if recomendaciones is not None else None,
+        analisis_ia=json.dumps(resultado, separators=(",", ":"), ensure_ascii=False, default=str)
+    )
+    db.add(analisis)
+    db.commit()
+    return analisis.id
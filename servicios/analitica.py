@@ -0,0 +1,247 @@
+"""
+Motor de analítica numérica local (NumPy) para el Ejecutor
+
+Las transacciones de un usuario se cargan una vez como columnas (monto,
+código de categoría, tipo y día desde epoch) y todas las métricas se calculan
+con operaciones vectorizadas: balance, totales por categoría, serie mensual,
+tasa de ahorro y uso de presupuestos. Estos números son la fuente de verdad;
+el modelo solo los narra.
+"""
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+import numpy as np
+
+from config import ANALITICA_CONFIG
+from models import Transaccion, TipoTransaccion, CategoriaGasto
+from servicios.resumenes import SIN_CATEGORIA
+
+# Código numérico de cada categoría (posición en el enum); -1 = sin categoría
+CATEGORIAS: List[CategoriaGasto] = list(CategoriaGasto)
+_CODIGO_CATEGORIA = {categoria: codigo for codigo, categoria in enumerate(CATEGORIAS)}
+
+
+class ColumnasTransacciones:
+    """
+    Transacciones de un usuario en arrays paralelos
+    """
+
+    def __init__(self, monto: np.ndarray, categoria: np.ndarray, es_gasto: np.ndarray, dia: np.ndarray):
+        self.monto = monto          # float64
+        self.categoria = categoria  # int16, -1 sin categoría
+        self.es_gasto = es_gasto    # bool
+        self.dia = dia              # int32, días desde 1970-01-01
+
+    def __len__(self) -> int:
+        return int(self.monto.shape[0])
+
+    @classmethod
+    def vacias(cls) -> "ColumnasTransacciones":
+        return cls(
+            np.empty(0, dtype=np.float64),
+            np.empty(0, dtype=np.int16),
+            np.empty(0, dtype=bool),
+            np.empty(0, dtype=np.int32)
+        )
+
+
+def cargar_columnas(
+    db: Session,
+    usuario_id: int,
+    fecha_desde: datetime,
+    fecha_hasta: Optional[datetime] = None
+) -> ColumnasTransacciones:
+    """
+    Leer las transacciones del período en columnas (solo las 4 columnas necesarias, por bloques)
+    """
+    stmt = (
+        select(Transaccion.monto, Transaccion.categoria, Transaccion.tipo, Transaccion.fecha)
+        .where(
+            Transaccion.usuario_id == usuario_id,
+            Transaccion.fecha >= fecha_desde,
+            Transaccion.fecha.is_not(None)
+        )
+        .execution_options(yield_per=ANALITICA_CONFIG["tamano_bloque"])
+    )
+    if fecha_hasta is not None:
+        stmt = stmt.where(Transaccion.fecha < fecha_hasta)
+
+    montos: List[float] = []
+    categorias: List[int] = []
+    gastos: List[bool] = []
+    fechas: List[datetime] = []
+    for particion in db.execute(stmt).partitions():
+        for monto, categoria, tipo, fecha in particion:
+            montos.append(monto)
+            categorias.append(_CODIGO_CATEGORIA.get(categoria, -1))
+            gastos.append(tipo == TipoTransaccion.GASTO)
+            fechas.append(fecha)
+
+    if not montos:
+        return ColumnasTransacciones.vacias()
+    return ColumnasTransacciones(
+        np.asarray(montos, dtype=np.float64),
+        np.asarray(categorias, dtype=np.int16),
+        np.asarray(gastos, dtype=bool),
+        np.asarray(fechas, dtype="datetime64[D]").astype(np.int32)
+    )
+
+
+def _redondear(valor: float) -> float:
+    return round(float(valor), 2)
+
+
+def totales(columnas: ColumnasTransacciones) -> Dict[str, Any]:
+    """
+    Ingresos, gastos, balance y número de transacciones
+    """
+    gastos = float(columnas.monto[columnas.es_gasto].sum())
+    ingresos = float(columnas.monto[~columnas.es_gasto].sum())
+    return {
+        "ingresos_totales": _redondear(ingresos),
+        "gastos_totales": _redondear(gastos),
+        "balance": _redondear(ingresos - gastos),
+        "total_transacciones": len(columnas)
+    }
+
+
+def gastos_por_categoria(columnas: ColumnasTransacciones) -> Dict[str, float]:
+    """
+    Total de gastos por categoría (bincount sobre los códigos)
+    """
+    gasto = columnas.es_gasto
+    con_categoria = gasto & (columnas.categoria >= 0)
+    sumas = np.bincount(
+        columnas.categoria[con_categoria].astype(np.intp),
+        weights=columnas.monto[con_categoria],
+        minlength=len(CATEGORIAS)
+    )
+    resultado = {CATEGORIAS[codigo].value: _redondear(total) for codigo, total in enumerate(sumas) if total}
+    sin_categoria = float(columnas.monto[gasto & (columnas.categoria < 0)].sum())
+    if sin_categoria:
+        resultado[SIN_CATEGORIA] = _redondear(sin_categoria)
+    return resultado
+
+
+def serie_mensual(columnas: ColumnasTransacciones) -> List[Dict[str, Any]]:
+    """
+    Ingresos, gastos y balance por mes calendario (incluye meses sin movimientos)
+    """
+    if not len(columnas):
+        return []
+    meses = columnas.dia.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    base = int(meses.min())
+    indice = (meses - base).astype(np.intp)
+    n = int(indice.max()) + 1
+    gastos = np.bincount(indice, weights=np.where(columnas.es_gasto, columnas.monto, 0.0), minlength=n)
+    ingresos = np.bincount(indice, weights=np.where(columnas.es_gasto, 0.0, columnas.monto), minlength=n)
+    return [
+        {
+            "anio": 1970 + (base + i) // 12,
+            "mes": (base + i) % 12 + 1,
+            "ingresos": _redondear(ingresos[i]),
+            "gastos": _redondear(gastos[i]),
+            "balance": _redondear(ingresos[i] - gastos[i])
+        }
+        for i in range(n)
+    ]
+
+
+def tasa_ahorro(ingresos: float, gastos: float) -> Optional[float]:
+    """
+    Porcentaje de los ingresos que no se gastó (None si no hay ingresos)
+    """
+    if ingresos <= 0:
+        return None
+    return _redondear((ingresos - gastos) / ingresos * 100)
+
+
+def utilizacion_presupuestos(presupuestos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Porcentaje de uso y estado (dentro / cerca / excedido) de cada presupuesto
+    """
+    if not presupuestos:
+        return []
+    limite = np.array([float(p.get("limite") or 0.0) for p in presupuestos], dtype=np.float64)
+    gastado = np.array([float(p.get("gastado") or 0.0) for p in presupuestos], dtype=np.float64)
+    porcentaje = np.divide(gastado * 100, limite, out=np.zeros_like(gastado), where=limite > 0)
+    estado = np.select(
+        [porcentaje <= ANALITICA_CONFIG["umbral_presupuesto_cerca"], porcentaje <= 100],
+        ["dentro", "cerca"],
+        default="excedido"
+    )
+    return [
+        {
+            "categoria": p.get("categoria"),
+            "limite": _redondear(limite[i]),
+            "gastado": _redondear(gastado[i]),
+            "restante": _redondear(limite[i] - gastado[i]),
+            "porcentaje": _redondear(porcentaje[i]),
+            "estado": str(estado[i])
+        }
+        for i, p in enumerate(presupuestos)
+    ]
+
+
+def analizar(columnas: ColumnasTransacciones, ingreso_mensual: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Todas las métricas del período a partir de las columnas
+    """
+    resultado = totales(columnas)
+    resultado["gastos_por_categoria"] = gastos_por_categoria(columnas)
+    resultado["serie_mensual"] = serie_mensual(columnas)
+    resultado["tasa_ahorro"] = tasa_ahorro(resultado["ingresos_totales"], resultado["gastos_totales"])
+    if ingreso_mensual is not None:
+        resultado["ingreso_mensual"] = float(ingreso_mensual)
+    return resultado
+
+
+def analizar_usuario(db: Session, usuario_id: int, periodo_dias: int,
+                     ingreso_mensual: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Cargar las transacciones de los últimos `periodo_dias` y calcular sus métricas
+    """
+    fecha_desde = datetime.utcnow() - timedelta(days=periodo_dias)
+    return analizar(cargar_columnas(db, usuario_id, fecha_desde), ingreso_mensual)
+
+
+# Operaciones aritméticas sobre una lista `valores` que no necesitan al modelo
+_OPERACIONES = {
+    "suma": lambda v: v.sum(),
+    "promedio": lambda v: v.mean(),
+    "mediana": lambda v: np.median(v),
+    "minimo": lambda v: v.min(),
+    "maximo": lambda v: v.max(),
+    "desviacion": lambda v: v.std(ddof=1) if v.size > 1 else 0.0
+}
+
+
+def calcular(tipo: Optional[str], datos: Any) -> Optional[Dict[str, Any]]:
+    """
+    Resolver localmente un cálculo del Ejecutor; None si el tipo no está soportado
+    """
+    if not isinstance(datos, dict):
+        return None
+    if tipo in _OPERACIONES:
+        try:
+            valores = np.asarray(datos.get("valores") or [], dtype=np.float64)
+        except (TypeError, ValueError):
+            return None
+        if valores.size == 0:
+            return None
+        return {"tipo": tipo, "valor": _redondear(_OPERACIONES[tipo](valores)), "n": int(valores.size)}
+    if tipo == "porcentaje":
+        parte, total = datos.get("parte"), datos.get("total")
+        if not isinstance(parte, (int, float)) or not isinstance(total, (int, float)) or total == 0:
+            return None
+        return {"tipo": tipo, "valor": _redondear(parte / total * 100)}
+    if tipo == "tasa_ahorro":
+        ingresos, gastos = datos.get("ingresos"), datos.get("gastos")
+        if not isinstance(ingresos, (int, float)) or not isinstance(gastos, (int, float)):
+            return None
+        return {"tipo": tipo, "valor": tasa_ahorro(ingresos, gastos)}
+    if tipo == "utilizacion_presupuestos" and isinstance(datos.get("presupuestos"), list):
+        return {"tipo": tipo, "presupuestos": utilizacion_presupuestos(datos["presupuestos"])}
+    return None
@@ -0,0 +1,319 @@
+"""
+Detección de gastos inusuales con estadísticas incrementales por (usuario, categoría)
+
+Cada gasto se compara con el estado acumulado de su categoría antes de
+sumarse a él, en O(1) y sin releer el historial:
+
+- media y varianza con el algoritmo de Welford (n, media, m2)
+- mediana y MAD (mediana de las desviaciones absolutas) con el estimador P²
+  de cuantiles, que guarda 5 marcadores por estadístico
+
+Un gasto es inusual si su puntaje z robusto, 0.6745·(x − mediana)/MAD, supera
+el umbral configurado. Si la MAD es 0 se usa el z clásico. Los gastos
+marcados se guardan en `anomalias_gasto`.
+
+Uso para reconstruir las estadísticas desde el historial:
+    python -m servicios anomalias [--usuario ID]
+"""
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.orm import Session
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timedelta
+import json
+import logging
+import math
+
+from config import ANOMALIAS_CONFIG
+from models import Transaccion, EstadisticaGasto, AnomaliaGasto, TipoTransaccion, CategoriaGasto
+from servicios.resumenes import clave_categoria, insert_ignorar
+
+logger = logging.getLogger(__name__)
+
+# Posiciones deseadas relativas de los 5 marcadores P² para la mediana
+_INCREMENTOS_P2 = (0.0, 0.25, 0.5, 0.75, 1.0)
+
+
+class MedianaP2:
+    """
+    Estimador P² (Jain y Chlamtac) de la mediana con estado constante
+    """
+
+    def __init__(self, estado: Optional[Dict[str, Any]] = None):
+        estado = estado or {}
+        self.muestras: List[float] = list(estado.get("muestras", []))
+        self.q: List[float] = list(estado.get("q", []))
+        self.pos: List[int] = list(estado.get("pos", []))
+        self.n: int = int(estado.get("n", len(self.muestras)))
+
+    @property
+    def valor(self) -> Optional[float]:
+        if self.q:
+            return self.q[2]
+        if not self.muestras:
+            return None
+        ordenadas = sorted(self.muestras)
+        medio = len(ordenadas) // 2
+        return ordenadas[medio] if len(ordenadas) % 2 else (ordenadas[medio - 1] + ordenadas[medio]) / 2
+
+    def agregar(self, x: float):
+        self.n += 1
+        if not self.q:
+            self.muestras.append(x)
+            if len(self.muestras) == 5:
+                self.q = sorted(self.muestras)
+                self.pos = [1, 2, 3, 4, 5]
+                self.muestras = []
+            return
+
+        q, pos = self.q, self.pos
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if q[i] <= x < q[i + 1])
+        for i in range(k + 1, 5):
+            pos[i] += 1
+
+        for i in (1, 2, 3):
+            deseada = 1 + (self.n - 1) * _INCREMENTOS_P2[i]
+            d = deseada - pos[i]
+            if (d >= 1 and pos[i + 1] - pos[i] > 1) or (d <= -1 and pos[i - 1] - pos[i] < -1):
+                d = 1 if d > 0 else -1
+                parabolica = q[i] + d / (pos[i + 1] - pos[i - 1]) * (
+                    (pos[i] - pos[i - 1] + d) * (q[i + 1] - q[i]) / (pos[i + 1] - pos[i])
+                    + (pos[i + 1] - pos[i] - d) * (q[i] - q[i - 1]) / (pos[i] - pos[i - 1])
+                )
+                if q[i - 1] < parabolica < q[i + 1]:
+                    q[i] = parabolica
+                else:
+                    q[i] = q[i] + d * (q[i + d] - q[i]) / (pos[i + d] - pos[i])
+                pos[i] += d
+
+    def estado(self) -> Dict[str, Any]:
+        if self.q:
+            return {"n": self.n, "q": self.q, "pos": self.pos}
+        return {"n": self.n, "muestras": self.muestras}
+
+
+class EstadoGasto:
+    """
+    Estado acumulado de una categoría de gasto de un usuario
+    """
+
+    def __init__(self, n: int = 0, media: float = 0.0, m2: float = 0.0, sketch: Optional[str] = None):
+        self.n = n
+        self.media = media
+        self.m2 = m2
+        datos = json.loads(sketch) if sketch else {}
+        self.mediana = MedianaP2(datos.get("mediana"))
+        self.mad = MedianaP2(datos.get("mad"))
+
+    @property
+    def desviacion(self) -> float:
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+    def evaluar(self, monto: float) -> Optional[Dict[str, Any]]:
+        """
+        Puntaje del gasto frente al estado actual si es inusual, o None
+        """
+        if self.n < ANOMALIAS_CONFIG["min_observaciones"]:
+            return None
+        mediana, mad = self.mediana.valor, self.mad.valor
+        if mediana is not None and mad:
+            puntaje = 0.6745 * (monto - mediana) / mad
+            umbral = ANOMALIAS_CONFIG["umbral_robusto"]
+        elif self.desviacion > 0:
+            puntaje = (monto - self.media) / self.desviacion
+            umbral = ANOMALIAS_CONFIG["umbral_z"]
+        else:
+            return None
+        # Solo gastos por encima de lo habitual
+        if puntaje < umbral:
+            return None
+        return {"media": self.media, "mediana": mediana, "mad": mad, "puntaje": round(puntaje, 2)}
+
+    def agregar(self, monto: float):
+        mediana_previa = self.mediana.valor
+        self.n += 1
+        delta = monto - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (monto - self.media)
+        self.mediana.agregar(monto)
+        self.mad.agregar(abs(monto - (mediana_previa if mediana_previa is not None else monto)))
+
+    def valores(self) -> Dict[str, Any]:
+        return {
+            "n": self.n,
+            "media": self.media,
+            "m2": self.m2,
+            "mediana": self.mediana.valor,
+            "mad": self.mad.valor,
+            "sketch": json.dumps({"mediana": self.mediana.estado(), "mad": self.mad.estado()}, separators=(",", ":")),
+            "actualizado_en": datetime.utcnow()
+        }
+
+
+class DetectorAnomalias:
+    """
+    Evaluar y acumular gastos dentro de una transacción de base de datos
+
+    Cada (usuario, categoría) se lee una vez (bloqueando su fila) y se escribe
+    una vez en `guardar`, así que una importación masiva no hace una escritura
+    por fila. No hace commit.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.estados: Dict[Tuple[int, str], Tuple[int, EstadoGasto]] = {}
+        self.anomalias: List[Dict[str, Any]] = []
+
+    def _estado(self, usuario_id: int, categoria: str) -> EstadoGasto:
+        clave = (usuario_id, categoria)
+        if clave not in self.estados:
+            # Crear la fila si falta y bloquearla: gastos concurrentes de la categoría se serializan
+            insertar = insert_ignorar(self.db, EstadisticaGasto.__table__, ["usuario_id", "categoria"])
+            if insertar is not None:
+                self.db.execute(insertar, {"usuario_id": usuario_id, "categoria": categoria, "n": 0, "media": 0.0, "m2": 0.0})
+            fila = self.db.execute(
+                select(EstadisticaGasto.id, EstadisticaGasto.n, EstadisticaGasto.media, EstadisticaGasto.m2, EstadisticaGasto.sketch)
+                .where(EstadisticaGasto.usuario_id == usuario_id, EstadisticaGasto.categoria == categoria)
+                .with_for_update()
+            ).first()
+            if fila is None:
+                estadistica = EstadisticaGasto(usuario_id=usuario_id, categoria=categoria, n=0, media=0.0, m2=0.0)
+                self.db.add(estadistica)
+                self.db.flush()
+                self.estados[clave] = (estadistica.id, EstadoGasto())
+            else:
+                self.estados[clave] = (fila.id, EstadoGasto(fila.n, fila.media, fila.m2, fila.sketch))
+        return self.estados[clave][1]
+
+    def procesar(
+        self,
+        usuario_id: int,
+        categoria: Optional[CategoriaGasto],
+        monto: float,
+        fecha: Optional[datetime] = None,
+        transaccion_id: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Evaluar un gasto y sumarlo a su estado; devuelve la anomalía si es inusual
+        """
+        clave = clave_categoria(categoria)
+        estado = self._estado(usuario_id, clave)
+        anomalia = estado.evaluar(float(monto))
+        estado.agregar(float(monto))
+        if anomalia is None:
+            return None
+        anomalia.update({
+            "usuario_id": usuario_id,
+            "transaccion_id": transaccion_id,
+            "categoria": clave,
+            "monto": float(monto),
+            "fecha": fecha
+        })
+        self.anomalias.append(anomalia)
+        return anomalia
+
+    def guardar(self):
+        """
+        Escribir los estados acumulados y las anomalías detectadas
+        """
+        for id_, estado in self.estados.values():
+            self.db.execute(
+                update(EstadisticaGasto)
+                .where(EstadisticaGasto.id == id_)
+                .values(**estado.valores())
+                .execution_options(synchronize_session=False)
+            )
+        if self.anomalias:
+            ahora = datetime.utcnow()
+            self.db.execute(AnomaliaGasto.__table__.insert(), [{**a, "creado_en": ahora} for a in self.anomalias])
+
+
+def evaluar_transaccion(db: Session, transaccion: Transaccion) -> Optional[Dict[str, Any]]:
+    """
+    Evaluar una transacción recién creada (solo gastos) y actualizar sus estadísticas
+
+    No hace commit: se confirma junto con la transacción.
+    """
+    if transaccion.tipo != TipoTransaccion.GASTO:
+        return None
+    if transaccion.id is None:
+        db.flush()
+    detector = DetectorAnomalias(db)
+    anomalia = detector.procesar(
+        transaccion.usuario_id, transaccion.categoria, transaccion.monto, transaccion.fecha, transaccion.id
+    )
+    detector.guardar()
+    return anomalia
+
+
+def anomalias_recientes(db: Session, usuario_id: int, dias: Optional[int] = None,
+                        limite: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Gastos inusuales del usuario en los últimos `dias`, más recientes primero
+    """
+    desde = datetime.utcnow() - timedelta(days=dias or ANOMALIAS_CONFIG["dias_consulta"])
+    stmt = (
+        select(
+            AnomaliaGasto.transaccion_id,
+            AnomaliaGasto.categoria,
+            AnomaliaGasto.monto,
+            AnomaliaGasto.fecha,
+            AnomaliaGasto.mediana,
+            AnomaliaGasto.puntaje,
+            AnomaliaGasto.creado_en
+        )
+        .where(AnomaliaGasto.usuario_id == usuario_id, AnomaliaGasto.creado_en >= desde)
+        .order_by(AnomaliaGasto.creado_en.desc(), AnomaliaGasto.id.desc())
+        .limit(limite or ANOMALIAS_CONFIG["max_resultados"])
+    )
+    return [
+        {
+            "transaccion_id": transaccion_id,
+            "categoria": categoria,
+            "monto": monto,
+            "fecha": (fecha or creado_en).isoformat(),
+            "mediana_categoria": round(mediana, 2) if mediana is not None else None,
+            "puntaje": puntaje
+        }
+        for transaccion_id, categoria, monto, fecha, mediana, puntaje, creado_en in db.execute(stmt)
+    ]
+
+
+def reconstruir_estadisticas(db: Session, usuario_id: Optional[int] = None) -> int:
+    """
+    Recalcular las estadísticas recorriendo los gastos en orden de fecha y confirmar
+
+    No registra anomalías históricas. Devuelve el número de categorías.
+    """
+    borrar = delete(EstadisticaGasto)
+    stmt = (
+        select(Transaccion.usuario_id, Transaccion.categoria, Transaccion.monto)
+        .where(Transaccion.tipo == TipoTransaccion.GASTO)
+        .order_by(Transaccion.fecha, Transaccion.id)
+        .execution_options(yield_per=ANOMALIAS_CONFIG["tamano_bloque"])
+    )
+    if usuario_id is not None:
+        borrar = borrar.where(EstadisticaGasto.usuario_id == usuario_id)
+        stmt = stmt.where(Transaccion.usuario_id == usuario_id)
+
+    estados: Dict[Tuple[int, str], EstadoGasto] = {}
+    for particion in db.execute(stmt).partitions():
+        for uid, categoria, monto in particion:
+            estados.setdefault((uid, clave_categoria(categoria)), EstadoGasto()).agregar(float(monto))
+
+    db.execute(borrar)
+    if estados:
+        db.execute(EstadisticaGasto.__table__.insert(), [
+            {"usuario_id": uid, "categoria": categoria, **estado.valores()}
+            for (uid, categoria), estado in estados.items()
+        ])
+    db.commit()
+    logger.info(f"✅ Estadísticas de gasto reconstruidas: {len(estados)} categorías")
+    return len(estados)
@@ -0,0 +1,249 @@
+"""
+Categorización automática de gastos a partir de su descripción, sin llamar al modelo
+
+Dos niveles, ambos sobre la descripción normalizada del índice de recurrentes:
+
+- Modelo del usuario: Bayes ingenuo multinomial sobre palabras y pares de
+  palabras con hashing (2^bits_hash columnas), entrenado con los gastos que
+  el usuario categorizó a mano. Los modelos se guardan en memoria (LRU con
+  TTL) y aprenden de cada gasto nuevo categorizado por el usuario.
+- Trie de palabras clave de CATEGORIZACION_CONFIG, compilado una vez al
+  importar el módulo. Se usa si el usuario no tiene historia suficiente o si
+  su modelo no está seguro. Las palabras clave coinciden con palabras
+  completas ("gas" no marca "gastos"); solo las terminadas en "*" valen como
+  prefijo ("gasolin*" marca "gasolinera"). Gana la coincidencia más larga.
+
+Cada descripción se clasifica una sola vez por Categorizador y los lotes se
+puntúan con una sola operación NumPy.
+"""
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+import logging
+import threading
+import time
+import zlib
+import numpy as np
+
+from config import CATEGORIZACION_CONFIG
+from models import Transaccion, TipoTransaccion, CategoriaGasto
+from servicios.recurrentes import normalizar_descripcion
+
+logger = logging.getLogger(__name__)
+
+CATEGORIAS: List[CategoriaGasto] = list(CategoriaGasto)
+_CODIGO_CATEGORIA = {categoria: codigo for codigo, categoria in enumerate(CATEGORIAS)}
+_COLUMNAS = 1 << CATEGORIZACION_CONFIG["bits_hash"]
+
+# Marcas de fin de palabra clave dentro de un nodo del trie: palabra completa o
+# prefijo. Las descripciones normalizadas solo tienen letras y espacios
+_FIN = ""
+_PREFIJO = "*"
+
+
+def _compilar_trie(palabras_clave: Dict[str, List[str]]) -> Dict[str, Any]:
+    """
+    Trie de caracteres; cada palabra clave termina en un nodo con la categoría en `_FIN` o `_PREFIJO`
+    """
+    raiz: Dict[str, Any] = {}
+    for categoria, palabras in palabras_clave.items():
+        for palabra in palabras:
+            marca = _PREFIJO if palabra.endswith(_PREFIJO) else _FIN
+            nodo = raiz
+            for caracter in palabra.rstrip(_PREFIJO):
+                nodo = nodo.setdefault(caracter, {})
+            nodo[marca] = CategoriaGasto(categoria)
+    return raiz
+
+
+_TRIE = _compilar_trie(CATEGORIZACION_CONFIG["palabras_clave"])
+
+
+def categoria_por_palabras_clave(clave: str) -> Optional[CategoriaGasto]:
+    """
+    Categoría de la palabra clave más larga que coincida desde el inicio de alguna palabra de `clave`
+
+    Una palabra clave completa debe acabar donde acaba una palabra; una
+    terminada en "*" puede acabar en cualquier punto.
+    """
+    mejor, largo_mejor = None, 0
+    inicio = 0
+    while inicio < len(clave):
+        nodo, posicion = _TRIE, inicio
+        while posicion < len(clave) and clave[posicion] in nodo:
+            nodo = nodo[clave[posicion]]
+            posicion += 1
+            if posicion - inicio <= largo_mejor:
+                continue
+            fin_de_palabra = posicion == len(clave) or clave[posicion] == " "
+            if _FIN in nodo and fin_de_palabra:
+                mejor, largo_mejor = nodo[_FIN], posicion - inicio
+            elif _PREFIJO in nodo:
+                mejor, largo_mejor = nodo[_PREFIJO], posicion - inicio
+        siguiente = clave.find(" ", inicio)
+        if siguiente < 0:
+            break
+        inicio = siguiente + 1
+    return mejor
+
+
+def _columnas(clave: str) -> List[int]:
+    """
+    Columnas (hash) de las palabras y pares de palabras de una descripción normalizada
+
+    CRC32 en lugar de hash(): las columnas son las mismas en cada proceso y reinicio.
+    """
+    palabras = clave.split(" ")
+    rasgos = palabras + [f"{a} {b}" for a, b in zip(palabras, palabras[1:])]
+    return [zlib.crc32(rasgo.encode("utf-8")) & (_COLUMNAS - 1) for rasgo in rasgos]
+
+
+class ModeloCategorias:
+    """
+    Bayes ingenuo multinomial con rasgos hasheados de un usuario
+    """
+
+    def __init__(self):
+        self.conteos = np.zeros((len(CATEGORIAS), _COLUMNAS), dtype=np.float32)
+        self.documentos = np.zeros(len(CATEGORIAS), dtype=np.float64)
+        self.ejemplos = 0
+        self._log_prob: Optional[np.ndarray] = None
+        self._log_prior: Optional[np.ndarray] = None
+
+    def aprender(self, clave: str, categoria: CategoriaGasto):
+        codigo = _CODIGO_CATEGORIA[categoria]
+        np.add.at(self.conteos[codigo], _columnas(clave), 1.0)
+        self.documentos[codigo] += 1
+        self.ejemplos += 1
+        self._log_prob = None
+
+    def _preparar(self):
+        alfa = CATEGORIZACION_CONFIG["alfa"]
+        totales = self.conteos.sum(axis=1, keepdims=True)
+        self._log_prob = np.log((self.conteos + alfa) / (totales + alfa * _COLUMNAS))
+        self._log_prior = np.log((self.documentos + 1) / (self.ejemplos + len(CATEGORIAS)))
+
+    def predecir(self, claves: Sequence[str]) -> List[Tuple[CategoriaGasto, float]]:
+        """
+        Categoría más probable y su probabilidad para cada descripción normalizada
+        """
+        if not claves:
+            return []
+        if self._log_prob is None:
+            self._preparar()
+        columnas = [_columnas(clave) for clave in claves]
+        inicios = np.cumsum([0] + [len(c) for c in columnas[:-1]])
+        # (categorías, rasgos de todo el lote) -> suma por descripción
+        puntajes = np.add.reduceat(self._log_prob[:, np.concatenate(columnas)], inicios, axis=1)
+        puntajes += self._log_prior[:, None]
+        puntajes -= puntajes.max(axis=0)
+        probabilidades = np.exp(puntajes)
+        probabilidades /= probabilidades.sum(axis=0)
+        mejores = probabilidades.argmax(axis=0)
+        return [(CATEGORIAS[codigo], float(probabilidades[codigo, i])) for i, codigo in enumerate(mejores)]
+
+
+# Modelos por usuario: usuario_id -> (modelo, instante de entrenamiento)
+_modelos: "OrderedDict[int, Tuple[ModeloCategorias, float]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _entrenar(db: Session, usuario_id: int) -> ModeloCategorias:
+    """
+    Entrenar con los gastos más recientes categorizados por el propio usuario
+    """
+    filas = db.execute(
+        select(Transaccion.descripcion, Transaccion.categoria)
+        .where(
+            Transaccion.usuario_id == usuario_id,
+            Transaccion.tipo == TipoTransaccion.GASTO,
+            Transaccion.categoria.is_not(None),
+            Transaccion.descripcion.is_not(None),
+            Transaccion.categoria_automatica.is_not(True)
+        )
+        .order_by(Transaccion.fecha.desc())
+        .limit(CATEGORIZACION_CONFIG["max_ejemplos"])
+    ).all()
+    modelo = ModeloCategorias()
+    for descripcion, categoria in filas:
+        clave = normalizar_descripcion(descripcion)
+        if clave is not None:
+            modelo.aprender(clave, categoria)
+    return modelo
+
+
+def modelo_usuario(db: Session, usuario_id: int) -> ModeloCategorias:
+    """
+    Modelo del usuario desde la caché, o entrenado y guardado en ella
+    """
+    ahora = time.monotonic()
+    with _lock:
+        entrada = _modelos.get(usuario_id)
+        if entrada is not None and ahora - entrada[1] < CATEGORIZACION_CONFIG["ttl_modelo_segundos"]:
+            _modelos.move_to_end(usuario_id)
+            return entrada[0]
+
+    modelo = _entrenar(db, usuario_id)
+    with _lock:
+        _modelos[usuario_id] = (modelo, ahora)
+        _modelos.move_to_end(usuario_id)
+        while len(_modelos) > CATEGORIZACION_CONFIG["max_modelos"]:
+            _modelos.popitem(last=False)
+    return modelo
+
+
+def aprender_transaccion(usuario_id: int, descripcion: Optional[str], categoria: Optional[CategoriaGasto]):
+    """
+    Sumar un gasto categorizado por el usuario a su modelo en caché (si está cargado)
+    """
+    clave = normalizar_descripcion(descripcion)
+    if clave is None or categoria is None:
+        return
+    with _lock:
+        entrada = _modelos.get(usuario_id)
+        if entrada is not None:
+            entrada[0].aprender(clave, categoria)
+
+
+class Categorizador:
+    """
+    Asignar categorías a las descripciones de un usuario, recordando cada descripción ya vista
+    """
+
+    def __init__(self, db: Session, usuario_id: int):
+        self.modelo = modelo_usuario(db, usuario_id)
+        self._memo: Dict[str, Optional[CategoriaGasto]] = {}
+        self._claves: Dict[Optional[str], Optional[str]] = {}
+
+    def _clave(self, descripcion: Optional[str]) -> Optional[str]:
+        if descripcion not in self._claves:
+            self._claves[descripcion] = normalizar_descripcion(descripcion)
+        return self._claves[descripcion]
+
+    def categorias(self, descripciones: Sequence[Optional[str]]) -> List[Optional[CategoriaGasto]]:
+        claves = [self._clave(d) for d in descripciones]
+        nuevas = list({clave for clave in claves if clave is not None and clave not in self._memo})
+        if nuevas:
+            predicciones: List[Optional[Tuple[CategoriaGasto, float]]] = [None] * len(nuevas)
+            if self.modelo.ejemplos >= CATEGORIZACION_CONFIG["min_ejemplos"]:
+                predicciones = self.modelo.predecir(nuevas)
+            for clave, prediccion in zip(nuevas, predicciones):
+                if prediccion is not None and prediccion[1] >= CATEGORIZACION_CONFIG["probabilidad_minima"]:
+                    self._memo[clave] = prediccion[0]
+                else:
+                    self._memo[clave] = categoria_por_palabras_clave(clave)
+        return [self._memo[clave] if clave is not None else None for clave in claves]
+
+    def categoria(self, descripcion: Optional[str]) -> Optional[CategoriaGasto]:
+        return self.categorias([descripcion])[0]
+
+
+def categorizar_descripcion(db: Session, usuario_id: int, descripcion: Optional[str]) -> Optional[CategoriaGasto]:
+    """
+    Categoría para la descripción de un gasto nuevo, o None si no se puede asignar
+    """
+    if not CATEGORIZACION_CONFIG["habilitado"] or not descripcion:
+        return None
+    return Categorizador(db, usuario_id).categoria(descripcion)
@@ -0,0 +1,92 @@
+"""
+Consultas de lectura de la Knowledge Base con proyección de columnas
+
+Se seleccionan solo las columnas que viajan en la respuesta (tuplas de Core,
+sin cargar objetos ORM) y los rangos grandes se recorren por bloques con
+`yield_per`, que en PostgreSQL usa un cursor del servidor en lugar de traer
+todas las filas a memoria de una vez.
+"""
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from typing import Dict, Any, Iterator, List, Optional
+from datetime import datetime
+
+from config import KNOWLEDGE_BASE_CONFIG
+from models import Transaccion, Usuario, TipoTransaccion, CategoriaGasto
+
+
+def _filtros(usuario_id: int, fecha_desde: datetime, fecha_hasta: Optional[datetime],
+             tipo: Optional[TipoTransaccion], categoria: Optional[CategoriaGasto]) -> list:
+    filtros = [Transaccion.usuario_id == usuario_id, Transaccion.fecha >= fecha_desde]
+    if fecha_hasta is not None:
+        filtros.append(Transaccion.fecha < fecha_hasta)
+    if tipo is not None:
+        filtros.append(Transaccion.tipo == tipo)
+    if categoria is not None:
+        filtros.append(Transaccion.categoria == categoria)
+    return filtros
+
+
+def bloques_transacciones(
+    db: Session,
+    usuario_id: int,
+    fecha_desde: datetime,
+    fecha_hasta: Optional[datetime] = None,
+    tipo: Optional[TipoTransaccion] = None,
+    categoria: Optional[CategoriaGasto] = None,
+    tamano_bloque: Optional[int] = None
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Recorrer las transacciones del período (más recientes primero) en bloques de dicts
+    """
+    tamano_bloque = tamano_bloque or KNOWLEDGE_BASE_CONFIG["tamano_bloque"]
+    stmt = (
+        select(
+            Transaccion.id,
+            Transaccion.tipo,
+            Transaccion.categoria,
+            Transaccion.monto,
+            Transaccion.fecha,
+            Transaccion.descripcion
+        )
+        .where(*_filtros(usuario_id, fecha_desde, fecha_hasta, tipo, categoria))
+        .order_by(Transaccion.fecha.desc(), Transaccion.id.desc())
+        .execution_options(yield_per=tamano_bloque)
+    )
+
+    for particion in db.execute(stmt).partitions():
+        yield [
+            {
+                "id": id_,
+                "tipo": tipo_.value,
+                "categoria": categoria_.value if categoria_ else None,
+                "monto": float(monto),
+                "fecha": fecha.isoformat() if fecha else None,
+                "descripcion": descripcion
+            }
+            for id_, tipo_, categoria_, monto, fecha, descripcion in particion
+        ]
+
+
+def ingreso_mensual_usuario(db: Session, usuario_id: int) -> Optional[float]:
+    """
+    Ingreso mensual declarado del usuario, sin cargar el objeto Usuario
+    """
+    ingreso = db.execute(select(Usuario.ingreso_mensual).where(Usuario.id == usuario_id)).scalar_one_or_none()
+    return float(ingreso) if ingreso is not None else None
+
+
+def contar_transacciones(
+    db: Session,
+    usuario_id: int,
+    fecha_desde: datetime,
+    fecha_hasta: Optional[datetime] = None,
+    tipo: Optional[TipoTransaccion] = None,
+    categoria: Optional[CategoriaGasto] = None
+) -> int:
+    """
+    Número de transacciones que devolvería `bloques_transacciones` con los mismos filtros
+    """
+    stmt = select(func.count(Transaccion.id)).where(*_filtros(usuario_id, fecha_desde, fecha_hasta, tipo, categoria))
+    return db.execute(stmt).scalar() or 0
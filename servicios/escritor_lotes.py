@@ -0,0 +1,187 @@
+"""
+Escritura diferida en lotes (write-behind) para datos que no deben frenar las peticiones
+
+Los productores encolan filas sin esperar (`encolar`); un worker por escritor
+las agrupa por tamaño o por intervalo y las inserta con un único INSERT
+multi-fila a través del engine asíncrono. Bajo sobrecarga la cola no crece
+sin límite: por encima del umbral de muestreo solo se acepta una fracción
+de las filas no prioritarias y con la cola llena se descartan.
+"""
+
+from sqlalchemy import Table, insert
+from typing import Dict, Any, List, Optional
+import asyncio
+import logging
+import random
+
+from config import ESCRITOR_LOTES_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Escritores registrados por nombre
+_ESCRITORES: Dict[str, "EscritorLotes"] = {}
+
+# Marca de fin de cola: el worker vuelca su lote y termina
+_FIN = object()
+
+
+class EscritorLotes:
+    """
+    Cola acotada + worker que vuelca filas de una tabla en lotes
+    """
+
+    def __init__(self, nombre: str, tabla: Table, tamano_lote: int, intervalo_segundos: float,
+                 cola_max: int, umbral_muestreo: float = 1.0, tasa_muestreo: float = 1.0):
+        self.nombre = nombre
+        self.tabla = tabla
+        self.tamano_lote = tamano_lote
+        self.intervalo_segundos = intervalo_segundos
+        self.cola_max = cola_max
+        self.umbral_muestreo = umbral_muestreo
+        self.tasa_muestreo = tasa_muestreo
+        self._cola: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.stats = {
+            "encoladas": 0,
+            "escritas": 0,
+            "descartadas": 0,
+            "muestreadas_fuera": 0,
+            "lotes": 0,
+            "errores": 0
+        }
+
+    @classmethod
+    def from_config(cls, nombre: str, tabla: Table) -> "EscritorLotes":
+        config = ESCRITOR_LOTES_CONFIG[nombre]
+        return cls(
+            nombre,
+            tabla,
+            tamano_lote=config["tamano_lote"],
+            intervalo_segundos=config["intervalo_segundos"],
+            cola_max=config["cola_max"],
+            umbral_muestreo=config.get("umbral_muestreo", 1.0),
+            tasa_muestreo=config.get("tasa_muestreo", 1.0)
+        )
+
+    @property
+    def activo(self) -> bool:
+        return self._worker is not None
+
+    def encolar(self, fila: Dict[str, Any], prioritaria: bool = False) -> bool:
+        """
+        Encolar una fila sin bloquear; devuelve False si se descartó
+        """
+        if self._cola is None:
+            # Sin worker (p. ej. scripts o antes del arranque): no se persiste
+            self.stats["descartadas"] += 1
+            return False
+        if not prioritaria and self._cola.qsize() >= self.cola_max * self.umbral_muestreo:
+            if random.random() >= self.tasa_muestreo:
+                self.stats["muestreadas_fuera"] += 1
+                return False
+        try:
+            self._cola.put_nowait(fila)
+        except asyncio.QueueFull:
+            self.stats["descartadas"] += 1
+            return False
+        self.stats["encoladas"] += 1
+        return True
+
+    async def start(self):
+        """
+        Arrancar el worker en el event loop actual
+        """
+        if self._worker is not None:
+            return
+        self._cola = asyncio.Queue(maxsize=self.cola_max)
+        self._worker = asyncio.create_task(self._loop())
+        logger.info(f"escritor_lotes: {self.nombre} iniciado")
+
+    async def stop(self):
+        """
+        Detener el worker y volcar lo que quede en la cola
+        """
+        if self._worker is None:
+            return
+        # La marca va detrás de todas las filas encoladas: se escriben antes de salir
+        await self._cola.put(_FIN)
+        await self._worker
+        self._worker = None
+        self._cola = None
+
+    async def _loop(self):
+        """
+        Agrupar filas hasta completar el lote o agotar el intervalo y escribirlas
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            fila = await self._cola.get()
+            if fila is _FIN:
+                return
+            lote = [fila]
+            limite = loop.time() + self.intervalo_segundos
+            fin = False
+            while len(lote) < self.tamano_lote:
+                restante = limite - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    fila = await asyncio.wait_for(self._cola.get(), timeout=restante)
+                except asyncio.TimeoutError:
+                    break
+                if fila is _FIN:
+                    fin = True
+                    break
+                lote.append(fila)
+            await self._escribir(lote)
+            if fin:
+                return
+
+    async def _escribir(self, lote: List[Dict[str, Any]]):
+        if not lote:
+            return
+        from database import async_engine
+        try:
+            async with async_engine.begin() as conn:
+                await conn.execute(insert(self.tabla).values(lote))
+            self.stats["escritas"] += len(lote)
+            self.stats["lotes"] += 1
+        except Exception as e:
+            self.stats["errores"] += 1
+            logger.error(f"escritor_lotes: error escribiendo {len(lote)} filas en {self.tabla.name}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "activo": self.activo,
+            "en_cola": self._cola.qsize() if self._cola is not None else 0,
+            "cola_max": self.cola_max
+        }
+
+
+def get_escritor(nombre: str, tabla: Table) -> EscritorLotes:
+    """
+    Obtener (creando si hace falta) el escritor registrado con ese nombre
+    """
+    escritor = _ESCRITORES.get(nombre)
+    if escritor is None:
+        escritor = EscritorLotes.from_config(nombre, tabla)
+        _ESCRITORES[nombre] = escritor
+    return escritor
+
+
+async def start():
+    """Arrancar todos los escritores registrados."""
+    for escritor in _ESCRITORES.values():
+        await escritor.start()
+
+
+async def stop():
+    """Detener los escritores volcando lo pendiente."""
+    for escritor in _ESCRITORES.values():
+        await escritor.stop()
+
+
+def get_stats() -> Dict[str, Any]:
+    """Filas encoladas, escritas y descartadas por escritor."""
+    return {nombre: escritor.get_stats() for nombre, escritor in _ESCRITORES.items()}
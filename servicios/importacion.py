@@ -0,0 +1,233 @@
+"""
+Importación masiva de transacciones desde CSV o NDJSON en streaming
+
+El cuerpo de la petición se lee por trozos y se procesa línea a línea: cada
+fila se valida con el mismo esquema que `POST /transacciones` y las válidas
+se insertan en lotes (executemany). El resumen mensual y los presupuestos se
+actualizan una sola vez por grupo al final, dentro de la misma transacción
+de base de datos que los inserts. La sesión es asíncrona: el trabajo con la
+base corre por `run_sync` para no bloquear el event loop.
+
+CSV: primera línea con cabecera (tipo,categoria,monto,descripcion,fecha).
+NDJSON: un objeto JSON por línea con las mismas claves.
+"""
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, ValidationError
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple, Type
+from datetime import datetime
+import codecs
+import csv
+import json
+import logging
+
+from config import IMPORTACION_CONFIG, CATEGORIZACION_CONFIG
+from models import Transaccion, TipoTransaccion
+from servicios.resumenes import agrupar_movimiento, acumular_grupos_en_resumen
+from servicios.presupuestos import consumir_presupuesto
+from servicios.anomalias import DetectorAnomalias
+from servicios.recurrentes import IndiceRecurrentes
+from servicios.categorizacion import Categorizador
+
+logger = logging.getLogger(__name__)
+
+FORMATOS = ("csv", "ndjson")
+
+
+class ErrorImportacion(ValueError):
+    """El cuerpo no se puede leer en el formato indicado"""
+
+
+async def _lineas(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Partir el cuerpo en líneas de texto sin cargarlo entero en memoria
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pendiente = ""
+    try:
+        async for chunk in stream:
+            pendiente += decoder.decode(chunk)
+            *lineas, pendiente = pendiente.split("\n")
+            for linea in lineas:
+                yield linea.rstrip("\r")
+        pendiente += decoder.decode(b"", final=True)
+    except UnicodeDecodeError as e:
+        raise ErrorImportacion(f"El cuerpo no es UTF-8 válido: {e}")
+    if pendiente.strip():
+        yield pendiente.rstrip("\r")
+
+
+async def leer_filas(stream: AsyncIterator[bytes], formato: str) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Producir (número de línea, fila) con la fila como dict, o la excepción de parseo
+    """
+    cabecera: Optional[List[str]] = None
+    numero = 0
+    async for linea in _lineas(stream):
+        numero += 1
+        if not linea.strip():
+            continue
+        if formato == "ndjson":
+            try:
+                fila = json.loads(linea)
+            except ValueError as e:
+                yield numero, e
+                continue
+            yield numero, fila if isinstance(fila, dict) else ValueError("Se esperaba un objeto JSON")
+            continue
+
+        valores = next(csv.reader([linea]))
+        if cabecera is None:
+            cabecera = [c.strip().lower() for c in valores]
+            continue
+        if len(valores) != len(cabecera):
+            yield numero, ValueError(f"Se esperaban {len(cabecera)} columnas y hay {len(valores)}")
+            continue
+        yield numero, dict(zip(cabecera, valores))
+
+
+def _normalizar(fila: Dict[str, Any], usuario_id: int) -> Dict[str, Any]:
+    """
+    Adaptar una fila de un export bancario al esquema de TransaccionCreate
+    """
+    datos = {k: (v.strip() if isinstance(v, str) else v) for k, v in fila.items()}
+    datos = {k: v for k, v in datos.items() if v not in ("", None)}
+    for campo in ("tipo", "categoria"):
+        if isinstance(datos.get(campo), str):
+            datos[campo] = datos[campo].lower()
+    if "usuario_id" in datos and str(datos["usuario_id"]) != str(usuario_id):
+        raise ValueError("La fila pertenece a otro usuario")
+    datos["usuario_id"] = usuario_id
+    return datos
+
+
+class _EstadoImportacion:
+    """
+    Acumuladores de una importación; sus métodos corren dentro de `AsyncSession.run_sync`
+    """
+
+    def __init__(self, db: Session, usuario_id: int):
+        self.usuario_id = usuario_id
+        self.importadas = 0
+        self.grupos_resumen: Dict[Any, list] = {}
+        self.gastos_por_presupuesto: Dict[Tuple[Any, int, int], float] = {}
+        self.detector = DetectorAnomalias(db)
+        self.recurrentes = IndiceRecurrentes(db)
+        self.categorizador = Categorizador(db, usuario_id) if CATEGORIZACION_CONFIG["habilitado"] else None
+
+    def insertar(self, db: Session, lote: List[Dict[str, Any]]):
+        """
+        Categorizar, acumular e insertar (executemany) un lote de filas válidas
+        """
+        usuario_id = self.usuario_id
+        for datos in lote:
+            if self.categorizador and datos["tipo"] == TipoTransaccion.GASTO and not datos["categoria"]:
+                datos["categoria"] = self.categorizador.categoria(datos.get("descripcion"))
+                datos["categoria_automatica"] = datos["categoria"] is not None
+            agrupar_movimiento(self.grupos_resumen, usuario_id, datos["tipo"], datos["categoria"], datos["fecha"], datos["monto"])
+            if datos["tipo"] == TipoTransaccion.GASTO and datos["categoria"]:
+                clave = (datos["categoria"], datos["fecha"].year, datos["fecha"].month)
+                self.gastos_por_presupuesto[clave] = self.gastos_por_presupuesto.get(clave, 0.0) + datos["monto"]
+            if datos["tipo"] == TipoTransaccion.GASTO:
+                self.detector.procesar(usuario_id, datos["categoria"], datos["monto"], datos["fecha"])
+                self.recurrentes.procesar(usuario_id, datos.get("descripcion"), datos["monto"], datos["fecha"], datos["categoria"])
+        db.execute(insert(Transaccion), lote)
+        self.importadas += len(lote)
+
+    def cerrar(self, db: Session) -> List[Dict[str, Any]]:
+        """
+        Escribir resumen, presupuestos, estadísticas y recurrentes; devuelve los presupuestos tocados
+        """
+        # Una escritura por (mes, tipo, categoría) y un UPDATE por presupuesto
+        acumular_grupos_en_resumen(db, self.grupos_resumen)
+        presupuestos = []
+        for (categoria, anio, mes), monto in self.gastos_por_presupuesto.items():
+            consumo = consumir_presupuesto(db, self.usuario_id, categoria, datetime(anio, mes, 1), monto)
+            if consumo:
+                gastado, limite = consumo
+                presupuestos.append({
+                    "categoria": categoria.value,
+                    "mes": mes,
+                    "anio": anio,
+                    "gastado": gastado,
+                    "limite": limite,
+                    "porcentaje": (gastado / limite) * 100 if limite > 0 else 0
+                })
+        # Un UPDATE por categoría con las estadísticas de gasto y uno por grupo recurrente
+        self.detector.guardar()
+        self.recurrentes.guardar()
+        return presupuestos
+
+
+async def importar_transacciones(
+    db: AsyncSession,
+    usuario_id: int,
+    stream: AsyncIterator[bytes],
+    formato: str,
+    esquema: Type[BaseModel]
+) -> Dict[str, Any]:
+    """
+    Importar las transacciones del stream para `usuario_id` y confirmar
+
+    La lectura y validación corren en el event loop; el trabajo con la base
+    (categorización, inserts, resumen y presupuestos) va por `run_sync`, un
+    lote a la vez. Las filas inválidas se omiten y se reportan (hasta
+    max_errores_reportados). Devuelve el resumen de la importación y el
+    estado final de los presupuestos tocados y los gastos inusuales
+    detectados, para evaluar las alertas una sola vez.
+    """
+    if formato not in FORMATOS:
+        raise ErrorImportacion(f"Formato no soportado: {formato}")
+
+    tamano_lote = IMPORTACION_CONFIG["tamano_lote"]
+    max_errores = IMPORTACION_CONFIG["max_errores_reportados"]
+    lote: List[Dict[str, Any]] = []
+    errores: List[Dict[str, Any]] = []
+    rechazadas = 0
+    ahora = datetime.utcnow()
+
+    try:
+        estado = await db.run_sync(_EstadoImportacion, usuario_id)
+        async for numero, fila in leer_filas(stream, formato):
+            try:
+                if isinstance(fila, Exception):
+                    raise fila
+                transaccion = esquema(**_normalizar(fila, usuario_id))
+            except ValidationError as e:
+                rechazadas += 1
+                if len(errores) < max_errores:
+                    detalle = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+                    errores.append({"linea": numero, "error": detalle[:300]})
+                continue
+            except (ValueError, TypeError) as e:
+                rechazadas += 1
+                if len(errores) < max_errores:
+                    errores.append({"linea": numero, "error": str(e)[:300]})
+                continue
+
+            datos = transaccion.dict()
+            datos["fecha"] = datos.get("fecha") or ahora
+            datos["categoria_automatica"] = False
+            lote.append(datos)
+            if len(lote) >= tamano_lote:
+                await db.run_sync(estado.insertar, lote)
+                lote = []
+
+        if lote:
+            await db.run_sync(estado.insertar, lote)
+        presupuestos = await db.run_sync(estado.cerrar)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    logger.info(f"✅ Importación usuario {usuario_id}: {estado.importadas} transacciones, {rechazadas} rechazadas")
+    return {
+        "importadas": estado.importadas,
+        "rechazadas": rechazadas,
+        "errores": errores,
+        "presupuestos": presupuestos,
+        "anomalias": estado.detector.anomalias
+    }
@@ -0,0 +1,101 @@
+"""
+Paginación por cursor (keyset) para los listados de la API
+
+En lugar de OFFSET, cada página continúa desde la clave de orden de la última
+fila devuelta: `WHERE (fecha, id) < (:fecha, :id) ORDER BY fecha DESC, id DESC
+LIMIT n`. Con el índice adecuado el coste de una página no depende de cuántas
+filas haya antes. El cursor que recibe el cliente es opaco (base64 de JSON).
+"""
+
+from sqlalchemy import Select, and_, false, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, List, Optional, Sequence, Tuple
+from datetime import datetime
+import base64
+import json
+
+from config import PAGINACION_CONFIG
+
+
+class CursorInvalido(ValueError):
+    """El cursor recibido no se puede decodificar o no corresponde al listado"""
+
+
+def limite_efectivo(limit: Optional[int]) -> int:
+    """
+    Aplicar el límite por defecto y el tope del servidor
+    """
+    if not limit or limit < 1:
+        return PAGINACION_CONFIG["limite_por_defecto"]
+    return min(limit, PAGINACION_CONFIG["limite_maximo"])
+
+
+def codificar_cursor(valores: Sequence[Any]) -> str:
+    datos = [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in valores]
+    return base64.urlsafe_b64encode(json.dumps(datos, separators=(",", ":")).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str, columnas: int) -> Tuple[Any, ...]:
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        valores = tuple(datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v for v in datos)
+    except (ValueError, TypeError, KeyError) as e:
+        raise CursorInvalido(f"Cursor inválido: {e}")
+    if len(valores) != columnas:
+        raise CursorInvalido("Cursor inválido: no corresponde a este listado")
+    return valores
+
+
+def _igual(columna: Any, valor: Any):
+    return columna.is_(None) if valor is None else columna == valor
+
+
+def _menor(columna: Any, valor: Any):
+    """
+    "Después de `valor`" en una columna ordenada DESC NULLS LAST
+    """
+    if valor is None:
+        return false()
+    if getattr(columna, "nullable", True):
+        return or_(columna < valor, columna.is_(None))
+    return columna < valor
+
+
+def _despues_de(columnas: Sequence[Any], valores: Sequence[Any]):
+    """
+    Condición "estrictamente después de `valores`" para un orden descendente con los NULL al final
+
+    (a, b) < (x, y)  ==  a < x OR (a = x AND b < y), sin depender de que el
+    dialecto soporte comparación de tuplas. Un NULL va después de cualquier
+    valor y es igual a otro NULL, así que las filas sin fecha también se paginan.
+    """
+    condiciones = []
+    for i, (columna, valor) in enumerate(zip(columnas, valores)):
+        prefijo = [_igual(c, v) for c, v in zip(columnas[:i], valores[:i])]
+        condiciones.append(and_(*prefijo, _menor(columna, valor)))
+    return or_(*condiciones)
+
+
+def _pagina(filas: List[Any], columnas: Sequence[Any], limite: int) -> Tuple[List[Any], Optional[str]]:
+    if len(filas) <= limite:
+        return filas, None
+    filas = filas[:limite]
+    ultima = filas[-1]
+    return filas, codificar_cursor([getattr(ultima, c.key) for c in columnas])
+
+
+async def apaginar(db: AsyncSession, stmt: Select, columnas: Sequence[Any], cursor: Optional[str],
+                   limit: Optional[int]) -> Tuple[List[Any], Optional[str]]:
+    """
+    Devolver (items, next_cursor) de una página de un select() ordenada por `columnas` descendente
+
+    `columnas` debe terminar en una columna única (el id) para que el orden
+    sea total. Las filas con NULL en una columna de orden van al final.
+    next_cursor es None en la última página.
+    """
+    limite = limite_efectivo(limit)
+    if cursor:
+        stmt = stmt.where(_despues_de(columnas, decodificar_cursor(cursor, len(columnas))))
+    result = await db.execute(stmt.order_by(*(c.desc().nulls_last() for c in columnas)).limit(limite + 1))
+    return _pagina(list(result.scalars().all()), columnas, limite)
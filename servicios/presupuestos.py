@@ -0,0 +1,99 @@
+"""
+Contabilidad de presupuestos en la base de datos
+
+El consumo de un gasto se aplica con un único UPDATE atómico
+(`monto_gastado = monto_gastado + :monto ... RETURNING`), sin leer antes el
+presupuesto ni sumar en Python, así que gastos concurrentes de la misma
+categoría no pierden actualizaciones.
+
+Uso para recalcular un mes (p. ej. tras transacciones con fecha atrasada):
+    python -m servicios presupuestos [--anio 2025 --mes 1] [--usuario ID]
+"""
+
+from sqlalchemy import select, update, func
+from sqlalchemy.orm import Session
+from typing import Optional, Tuple
+from datetime import datetime
+import logging
+
+from models import Transaccion, Presupuesto, TipoTransaccion, CategoriaGasto
+
+logger = logging.getLogger(__name__)
+
+
+def consumir_presupuesto(
+    db: Session,
+    usuario_id: int,
+    categoria: CategoriaGasto,
+    fecha: datetime,
+    monto: float
+) -> Optional[Tuple[float, float]]:
+    """
+    Sumar un gasto al presupuesto del mes de `fecha`
+
+    Devuelve (monto_gastado, monto_limite) tras la actualización, o None si el
+    usuario no tiene presupuesto para esa categoría y mes. No hace commit.
+    """
+    filtro = (
+        Presupuesto.usuario_id == usuario_id,
+        Presupuesto.categoria == categoria,
+        Presupuesto.mes == fecha.month,
+        Presupuesto.anio == fecha.year
+    )
+    stmt = (
+        update(Presupuesto)
+        .where(*filtro)
+        .values(
+            monto_gastado=func.coalesce(Presupuesto.monto_gastado, 0.0) + monto,
+            actualizado_en=datetime.utcnow()
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    if db.get_bind().dialect.update_returning:
+        fila = db.execute(stmt.returning(Presupuesto.monto_gastado, Presupuesto.monto_limite)).first()
+    else:
+        # Sin RETURNING: el UPDATE ya bloqueó la fila, la lectura posterior es consistente
+        db.execute(stmt)
+        fila = db.execute(select(Presupuesto.monto_gastado, Presupuesto.monto_limite).where(*filtro)).first()
+
+    if fila is None:
+        return None
+    return float(fila[0]), float(fila[1])
+
+
+def recalcular_presupuestos(db: Session, anio: int, mes: int, usuario_id: Optional[int] = None) -> int:
+    """
+    Reconstruir `monto_gastado` de los presupuestos de un mes desde `transacciones`
+
+    Un único UPDATE con subconsulta correlacionada por presupuesto; incluye
+    los gastos registrados con fecha atrasada. Confirma y devuelve el número
+    de presupuestos actualizados.
+    """
+    inicio = datetime(anio, mes, 1)
+    fin = datetime(anio + 1, 1, 1) if mes == 12 else datetime(anio, mes + 1, 1)
+
+    gastado = (
+        select(func.coalesce(func.sum(Transaccion.monto), 0.0))
+        .where(
+            Transaccion.usuario_id == Presupuesto.usuario_id,
+            Transaccion.tipo == TipoTransaccion.GASTO,
+            Transaccion.categoria == Presupuesto.categoria,
+            Transaccion.fecha >= inicio,
+            Transaccion.fecha < fin
+        )
+        .scalar_subquery()
+    )
+    stmt = (
+        update(Presupuesto)
+        .where(Presupuesto.anio == anio, Presupuesto.mes == mes)
+        .values(monto_gastado=gastado, actualizado_en=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if usuario_id is not None:
+        stmt = stmt.where(Presupuesto.usuario_id == usuario_id)
+
+    actualizados = db.execute(stmt).rowcount
+    db.commit()
+    logger.info(f"✅ Presupuestos recalculados {mes:02d}/{anio}: {actualizados}")
+    return actualizados
@@ -0,0 +1,262 @@
+"""
+Pronóstico local de gastos mensuales sobre el resumen mensual por categoría
+
+Cada serie (usuario, categoría) y el total de cada usuario se suavizan con
+Holt (nivel + tendencia aditiva). Si la serie tiene al menos dos años de
+historia se añade estacionalidad anual (Holt-Winters aditivo). Todas las series
+avanzan a la vez como filas de una matriz NumPy, así que un solo paso sirve
+para un usuario o para todos. Los parámetros se eligen por serie entre una
+rejilla pequeña según el error de un paso, y los intervalos de confianza salen
+de la desviación de esos residuos.
+
+El mes en curso está incompleto: la historia termina en el último mes
+cerrado y el horizonte 1 es el mes actual.
+
+Uso para pronosticar todos los usuarios:
+    python -m servicios pronosticos [--usuario ID] [--meses 3]
+"""
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from datetime import datetime
+import logging
+import numpy as np
+
+from config import PRONOSTICO_CONFIG
+from models import ResumenMensualCategoria, TipoTransaccion
+
+logger = logging.getLogger(__name__)
+
+# Categoría sintética con el gasto total del usuario
+TOTAL = "total"
+
+_PERIODO_ESTACIONAL = 12
+
+
+def _indice_mes(anio: int, mes: int) -> int:
+    return anio * 12 + (mes - 1)
+
+
+def _anio_mes(indice: int) -> Tuple[int, int]:
+    return indice // 12, indice % 12 + 1
+
+
+def cargar_series(
+    db: Session,
+    usuario_ids: Optional[Sequence[int]] = None,
+    meses_historia: Optional[int] = None,
+    hoy: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Construir la matriz de gastos mensuales (una fila por usuario y categoría, más el total)
+
+    Devuelve {"claves": [(usuario_id, categoria)], "matriz": (series, meses),
+    "inicio": primer mes con datos de cada serie, "ultimo_mes": índice del último mes cerrado}.
+    """
+    hoy = hoy or datetime.utcnow()
+    meses_historia = meses_historia or PRONOSTICO_CONFIG["meses_historia"]
+    ultimo_mes = _indice_mes(hoy.year, hoy.month) - 1
+    primer_mes = ultimo_mes - meses_historia + 1
+
+    indice = ResumenMensualCategoria.anio * 12 + (ResumenMensualCategoria.mes - 1)
+    stmt = select(
+        ResumenMensualCategoria.usuario_id,
+        ResumenMensualCategoria.categoria,
+        indice,
+        ResumenMensualCategoria.total
+    ).where(
+        ResumenMensualCategoria.tipo == TipoTransaccion.GASTO,
+        indice >= primer_mes,
+        indice <= ultimo_mes
+    )
+    if usuario_ids is not None:
+        stmt = stmt.where(ResumenMensualCategoria.usuario_id.in_(list(usuario_ids)))
+
+    filas = db.execute(stmt).all()
+    claves: List[Tuple[int, str]] = []
+    posicion: Dict[Tuple[int, str], int] = {}
+    filas_idx: List[int] = []
+    columnas_idx: List[int] = []
+    valores: List[float] = []
+    for usuario_id, categoria, mes, total in filas:
+        for clave in ((usuario_id, categoria), (usuario_id, TOTAL)):
+            if clave not in posicion:
+                posicion[clave] = len(claves)
+                claves.append(clave)
+            filas_idx.append(posicion[clave])
+            columnas_idx.append(int(mes) - primer_mes)
+            valores.append(float(total or 0.0))
+
+    matriz = np.zeros((len(claves), meses_historia), dtype=np.float64)
+    if claves:
+        np.add.at(matriz, (np.asarray(filas_idx), np.asarray(columnas_idx)), np.asarray(valores))
+    # Primer mes con gasto de cada serie: los ceros anteriores no son historia
+    con_datos = matriz != 0
+    inicio = np.where(con_datos.any(axis=1), con_datos.argmax(axis=1), meses_historia)
+    return {"claves": claves, "matriz": matriz, "inicio": inicio, "ultimo_mes": ultimo_mes}
+
+
+def suavizar(matriz: np.ndarray, inicio: np.ndarray, horizonte: int) -> Dict[str, np.ndarray]:
+    """
+    Holt / Holt-Winters aditivo vectorizado sobre todas las filas y toda la rejilla de parámetros
+
+    Holt arranca con el nivel en el primer mes y tendencia cero. Holt-Winters
+    se siembra con el primer año completo: tendencia por la diferencia de las
+    medias de los dos primeros años, nivel por la media del primero (llevada
+    a su último mes) e índices estacionales por las desviaciones de ese año
+    respecto a la recta. Desde ahí ambos suavizan mes a mes.
+
+    Devuelve "pronostico", "inferior" y "superior" de forma (series, horizonte),
+    además de "sigma", "n" (meses de historia) y "estacional" por serie.
+    """
+    series, meses = matriz.shape
+    m = _PERIODO_ESTACIONAL
+    alphas = np.asarray(PRONOSTICO_CONFIG["alphas"], dtype=np.float64)
+    betas = np.asarray(PRONOSTICO_CONFIG["betas"], dtype=np.float64)
+    gammas = np.asarray(PRONOSTICO_CONFIG["gammas"], dtype=np.float64)
+    # Rejilla (parámetros, 1) contra series: todas las combinaciones avanzan juntas
+    alpha, beta, gamma = (p.reshape(-1, 1) for p in np.meshgrid(alphas, betas, gammas, indexing="ij"))
+    combinaciones = alpha.shape[0]
+
+    n = meses - inicio
+    es_estacional = n >= 2 * m
+    estacional = es_estacional.astype(np.float64)[None, :]
+    filas = np.arange(series)[:, None]
+
+    # Semillas por serie; las no estacionales arrancan en su primer mes con tendencia cero
+    nivel_0 = matriz[np.arange(series), np.minimum(inicio, meses - 1)]
+    tendencia_0 = np.zeros(series)
+    estaciones_0 = np.zeros((series, m))
+    siembra = inicio.copy()
+    if es_estacional.any():
+        meses_anio = inicio[:, None] + np.arange(m)[None, :]
+        primero = matriz[filas, np.minimum(meses_anio, meses - 1)]
+        segundo = matriz[filas, np.minimum(meses_anio + m, meses - 1)]
+        media_1, media_2 = primero.mean(axis=1), segundo.mean(axis=1)
+        pendiente = (media_2 - media_1) / m
+        centrado = np.arange(m)[None, :] - (m - 1) / 2
+        desviaciones = primero - (media_1[:, None] + pendiente[:, None] * centrado)
+        np.put_along_axis(estaciones_0, meses_anio % m, desviaciones, axis=1)
+        nivel_0 = np.where(es_estacional, media_1 + pendiente * (m - 1) / 2, nivel_0)
+        tendencia_0 = np.where(es_estacional, pendiente, 0.0)
+        estaciones_0 *= es_estacional[:, None]
+        siembra = np.where(es_estacional, inicio + m - 1, inicio)
+
+    nivel = np.zeros((combinaciones, series))
+    tendencia = np.zeros((combinaciones, series))
+    estaciones = np.broadcast_to(estaciones_0, (combinaciones, series, m)).copy()
+    sse = np.zeros((combinaciones, series))
+
+    for t in range(meses):
+        y = matriz[:, t][None, :]
+        arranca = (siembra == t)[None, :]
+        activa = (siembra < t)[None, :]
+        if not activa.any() and not arranca.any():
+            continue
+        s_prev = estaciones[:, :, t % m] * estacional
+        prediccion = nivel + tendencia + s_prev
+        error = np.where(activa, y - prediccion, 0.0)
+        sse += error * error
+        nivel_nuevo = alpha * (y - s_prev) + (1 - alpha) * (nivel + tendencia)
+        tendencia_nueva = beta * (nivel_nuevo - nivel) + (1 - beta) * tendencia
+        estacion_nueva = gamma * (y - nivel_nuevo) + (1 - gamma) * s_prev
+        nivel = np.where(activa, nivel_nuevo, np.where(arranca, nivel_0[None, :], nivel))
+        tendencia = np.where(activa, tendencia_nueva, np.where(arranca, tendencia_0[None, :], tendencia))
+        estaciones[:, :, t % m] = np.where(activa & (estacional > 0), estacion_nueva, estaciones[:, :, t % m])
+
+    # Mejor combinación por serie (menor error de un paso)
+    mejor = sse.argmin(axis=0)
+    columnas = np.arange(series)
+    nivel, tendencia = nivel[mejor, columnas], tendencia[mejor, columnas]
+    estaciones = estaciones[mejor, columnas]
+    alpha_s, beta_s, gamma_s = alpha[mejor, 0], beta[mejor, 0], gamma[mejor, 0]
+    errores = meses - 1 - siembra
+    grados = np.maximum(errores - 1, 1)
+    sigma = np.sqrt(sse[mejor, columnas] / grados)
+
+    pasos = np.arange(1, horizonte + 1)[None, :]
+    indice_estacion = (meses - 1 + pasos) % m
+    componente = np.take_along_axis(estaciones, np.broadcast_to(indice_estacion, (series, horizonte)), axis=1)
+    pronostico = nivel[:, None] + pasos * tendencia[:, None] + componente * estacional[0][:, None]
+
+    # Varianza a h pasos (ETS aditivo): sigma² (1 + Σ_{0<j<h} c_j²), con
+    # c_j = α (1 + jβ) + γ (1 − α) cuando j es múltiplo del periodo estacional
+    j = np.arange(horizonte)[None, :]
+    c = alpha_s[:, None] * (1 + j * beta_s[:, None])
+    c = c + np.where((j % m == 0) & (j > 0), (gamma_s * (1 - alpha_s) * estacional[0])[:, None], 0.0)
+    termino = np.where(j > 0, c ** 2, 0.0)
+    varianza = sigma[:, None] ** 2 * (1 + np.cumsum(termino, axis=1))
+    margen = PRONOSTICO_CONFIG["z_intervalo"] * np.sqrt(varianza)
+
+    pronostico = np.maximum(pronostico, 0.0)
+    return {
+        "pronostico": pronostico,
+        "inferior": np.maximum(pronostico - margen, 0.0),
+        "superior": pronostico + margen,
+        "sigma": sigma,
+        "n": n,
+        "estacional": es_estacional
+    }
+
+
+def _confianza(pronostico: float, inferior: float, superior: float, n: int) -> str:
+    if n < PRONOSTICO_CONFIG["min_meses"] or pronostico <= 0:
+        return "baja"
+    amplitud = (superior - inferior) / pronostico
+    if amplitud <= PRONOSTICO_CONFIG["amplitud_confianza_alta"]:
+        return "alta"
+    if amplitud <= PRONOSTICO_CONFIG["amplitud_confianza_media"]:
+        return "media"
+    return "baja"
+
+
+def pronosticar_usuarios(
+    db: Session,
+    usuario_ids: Optional[Sequence[int]] = None,
+    horizonte: int = 3,
+    hoy: Optional[datetime] = None
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Pronosticar el gasto de los próximos `horizonte` meses (total y por categoría)
+
+    Con `usuario_ids=None` pronostica todos los usuarios con historia en un solo paso.
+    """
+    datos = cargar_series(db, usuario_ids, hoy=hoy)
+    if not datos["claves"]:
+        return {}
+    r = suavizar(datos["matriz"], datos["inicio"], horizonte)
+    meses = [_anio_mes(datos["ultimo_mes"] + h) for h in range(1, horizonte + 1)]
+
+    resultado: Dict[int, Dict[str, Any]] = {}
+    for fila, (usuario_id, categoria) in enumerate(datos["claves"]):
+        n = int(r["n"][fila])
+        serie = [
+            {
+                "mes": h + 1,
+                "anio": meses[h][0],
+                "mes_calendario": meses[h][1],
+                "gasto_estimado": round(float(r["pronostico"][fila, h]), 2),
+                "intervalo": {
+                    "inferior": round(float(r["inferior"][fila, h]), 2),
+                    "superior": round(float(r["superior"][fila, h]), 2)
+                },
+                "confianza": _confianza(r["pronostico"][fila, h], r["inferior"][fila, h], r["superior"][fila, h], n)
+            }
+            for h in range(horizonte)
+        ]
+        usuario = resultado.setdefault(usuario_id, {"predicciones": [], "por_categoria": {}, "meses_historia": 0})
+        if categoria == TOTAL:
+            usuario["predicciones"] = serie
+            usuario["meses_historia"] = n
+            usuario["modelo"] = "holt_winters" if r["estacional"][fila] else "holt"
+        else:
+            usuario["por_categoria"][categoria] = serie
+    return resultado
+
+
+def pronosticar_usuario(db: Session, usuario_id: int, horizonte: int = 3) -> Optional[Dict[str, Any]]:
+    """
+    Pronóstico de un usuario, o None si no tiene meses cerrados con gastos
+    """
+    return pronosticar_usuarios(db, [usuario_id], horizonte).get(usuario_id)
@@ -0,0 +1,320 @@
+"""
+Índice de pagos recurrentes y suscripciones
+
+Los gastos se agrupan por descripción normalizada (minúsculas, sin acentos,
+números ni signos) y banda logarítmica del monto, así que "NETFLIX.COM 0423"
+y "Netflix.com 0524" por el mismo importe caen en el mismo grupo. Cada grupo
+guarda la media y la varianza de los días entre cargos (Welford). Con eso se
+clasifica como semanal, mensual o anual cuando el intervalo medio está cerca
+del período y es estable.
+
+El índice se actualiza al registrar cada gasto, así que consultar los pagos
+recurrentes de un usuario es una lectura indexada de sus filas.
+
+Uso para reconstruir el índice desde el historial:
+    python -m servicios recurrentes [--usuario ID]
+"""
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.orm import Session
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timedelta
+import logging
+import math
+import re
+import unicodedata
+
+from config import RECURRENTES_CONFIG
+from models import Transaccion, PagoRecurrente, TipoTransaccion, CategoriaGasto
+from servicios.resumenes import insert_ignorar
+
+logger = logging.getLogger(__name__)
+
+_NO_LETRAS = re.compile(r"[^a-z]+")
+
+ClaveRecurrente = Tuple[int, str, int]
+
+
+def normalizar_descripcion(descripcion: Optional[str]) -> Optional[str]:
+    """
+    Clave estable de una descripción bancaria, o None si no queda texto útil
+    """
+    if not descripcion:
+        return None
+    texto = descripcion.lower()
+    if not texto.isascii():
+        texto = "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+    palabras = [p for p in _NO_LETRAS.split(texto) if len(p) >= 2]
+    if not palabras:
+        return None
+    return " ".join(palabras[:RECURRENTES_CONFIG["max_palabras"]])[:80]
+
+
+def banda_monto(monto: float) -> int:
+    """
+    Banda logarítmica del monto: importes dentro de ~`ancho_banda` comparten banda
+    """
+    return math.floor(math.log(max(float(monto), 0.01)) / math.log1p(RECURRENTES_CONFIG["ancho_banda"]))
+
+
+def clasificar_periodicidad(ocurrencias: int, intervalos: int, intervalo_medio: Optional[float],
+                            intervalo_m2: float) -> Optional[str]:
+    """
+    Período ("semanal", "mensual", "anual") que encaja con los intervalos, o None
+    """
+    if not intervalos or intervalo_medio is None:
+        return None
+    desviacion = math.sqrt(intervalo_m2 / (intervalos - 1)) if intervalos > 1 else 0.0
+    for nombre, periodo in RECURRENTES_CONFIG["periodos"].items():
+        if (ocurrencias >= periodo["min_ocurrencias"]
+                and abs(intervalo_medio - periodo["dias"]) <= periodo["tolerancia_dias"]
+                and desviacion <= periodo["tolerancia_dias"]):
+            return nombre
+    return None
+
+
+class EstadoRecurrente:
+    """
+    Estado acumulado de un grupo de gastos (una fila de pagos_recurrentes)
+    """
+
+    def __init__(self, fila: Optional[Any] = None):
+        self.descripcion = fila.descripcion if fila is not None else None
+        self.categoria = fila.categoria if fila is not None else None
+        self.ocurrencias = fila.ocurrencias if fila is not None else 0
+        self.monto_medio = fila.monto_medio if fila is not None else 0.0
+        self.primera_fecha = fila.primera_fecha if fila is not None else None
+        self.ultima_fecha = fila.ultima_fecha if fila is not None else None
+        self.intervalos = fila.intervalos if fila is not None else 0
+        self.intervalo_medio = fila.intervalo_medio if fila is not None else None
+        self.intervalo_m2 = fila.intervalo_m2 if fila is not None else 0.0
+
+    def _agregar_intervalo(self, dias: float):
+        self.intervalos += 1
+        media = self.intervalo_medio or 0.0
+        delta = dias - media
+        media += delta / self.intervalos
+        self.intervalo_m2 += delta * (dias - media)
+        self.intervalo_medio = media
+
+    def agregar(self, monto: float, fecha: datetime, descripcion: Optional[str], categoria: Optional[CategoriaGasto]):
+        # Un cargo a menos de `min_intervalo_dias` del primero o del último es un
+        # duplicado (p. ej. una fila importada dos veces): no cuenta ni añade intervalo
+        minimo = timedelta(days=RECURRENTES_CONFIG["min_intervalo_dias"])
+        if self.ultima_fecha is not None and (abs(fecha - self.ultima_fecha) < minimo
+                                              or abs(fecha - self.primera_fecha) < minimo):
+            return
+        self.ocurrencias += 1
+        self.monto_medio += (float(monto) - self.monto_medio) / self.ocurrencias
+        self.descripcion = (descripcion or self.descripcion or "")[:200]
+        self.categoria = categoria or self.categoria
+        if self.ultima_fecha is None:
+            self.primera_fecha = self.ultima_fecha = fecha
+        elif fecha >= self.ultima_fecha:
+            self._agregar_intervalo((fecha - self.ultima_fecha).total_seconds() / 86400)
+            self.ultima_fecha = fecha
+        elif fecha <= self.primera_fecha:
+            self._agregar_intervalo((self.primera_fecha - fecha).total_seconds() / 86400)
+            self.primera_fecha = fecha
+        # Un cargo atrasado entre la primera y la última fecha no añade intervalo;
+        # la reconstrucción desde el historial lo recalcula en orden
+
+    def valores(self) -> Dict[str, Any]:
+        periodicidad = clasificar_periodicidad(self.ocurrencias, self.intervalos, self.intervalo_medio, self.intervalo_m2)
+        proxima = None
+        if periodicidad and self.ultima_fecha is not None:
+            proxima = self.ultima_fecha + timedelta(days=self.intervalo_medio)
+        return {
+            "descripcion": self.descripcion,
+            "categoria": self.categoria,
+            "ocurrencias": self.ocurrencias,
+            "monto_medio": self.monto_medio,
+            "primera_fecha": self.primera_fecha,
+            "ultima_fecha": self.ultima_fecha,
+            "intervalos": self.intervalos,
+            "intervalo_medio": self.intervalo_medio,
+            "intervalo_m2": self.intervalo_m2,
+            "periodicidad": periodicidad,
+            "proxima_fecha": proxima,
+            "actualizado_en": datetime.utcnow()
+        }
+
+
+def _banda_cercana(estados: Dict[ClaveRecurrente, Any], usuario_id: int, clave: str, banda: int) -> Optional[ClaveRecurrente]:
+    """
+    Grupo ya cargado en la misma banda o en una vecina (importes en el borde de una banda)
+    """
+    for vecina in (banda, banda - 1, banda + 1):
+        if (usuario_id, clave, vecina) in estados:
+            return (usuario_id, clave, vecina)
+    return None
+
+
+class IndiceRecurrentes:
+    """
+    Actualizar el índice con los gastos de una transacción de base de datos
+
+    Cada grupo se lee una vez (bloqueando su fila) y se escribe una vez en
+    `guardar`. Los gastos de cada grupo se aplican ordenados por fecha, así que
+    una importación en cualquier orden da los mismos intervalos. No hace commit.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.estados: Dict[ClaveRecurrente, Tuple[int, EstadoRecurrente]] = {}
+        self.pendientes: Dict[ClaveRecurrente, List[Tuple[datetime, float, Optional[str], Optional[CategoriaGasto]]]] = {}
+
+    def _filas(self, usuario_id: int, clave: str, bandas: List[int]) -> List[Any]:
+        return self.db.execute(
+            select(PagoRecurrente)
+            .where(PagoRecurrente.usuario_id == usuario_id, PagoRecurrente.clave == clave, PagoRecurrente.banda.in_(bandas))
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        ).scalars().all()
+
+    def _grupo(self, usuario_id: int, clave: str, banda: int) -> ClaveRecurrente:
+        cargada = _banda_cercana(self.estados, usuario_id, clave, banda)
+        if cargada is not None:
+            return cargada
+
+        filas = self._filas(usuario_id, clave, [banda - 1, banda, banda + 1])
+        if not filas:
+            insertar = insert_ignorar(self.db, PagoRecurrente.__table__, ["usuario_id", "clave", "banda"])
+            if insertar is not None:
+                self.db.execute(insertar, {"usuario_id": usuario_id, "clave": clave, "banda": banda,
+                                           "ocurrencias": 0, "monto_medio": 0.0, "intervalos": 0, "intervalo_m2": 0.0})
+                filas = self._filas(usuario_id, clave, [banda])
+            else:
+                fila = PagoRecurrente(usuario_id=usuario_id, clave=clave, banda=banda,
+                                      ocurrencias=0, monto_medio=0.0, intervalos=0, intervalo_m2=0.0)
+                self.db.add(fila)
+                self.db.flush()
+                filas = [fila]
+        fila = min(filas, key=lambda f: abs(f.banda - banda))
+        self.estados[(usuario_id, clave, fila.banda)] = (fila.id, EstadoRecurrente(fila))
+        return (usuario_id, clave, fila.banda)
+
+    def procesar(self, usuario_id: int, descripcion: Optional[str], monto: float, fecha: datetime,
+                 categoria: Optional[CategoriaGasto] = None):
+        """
+        Sumar un gasto a su grupo (se ignora si la descripción no tiene texto útil)
+        """
+        clave = normalizar_descripcion(descripcion)
+        if clave is None:
+            return
+        grupo = self._grupo(usuario_id, clave, banda_monto(monto))
+        self.pendientes.setdefault(grupo, []).append((fecha, float(monto), descripcion, categoria))
+
+    def guardar(self):
+        """
+        Aplicar los gastos pendientes en orden de fecha y escribir los grupos
+        """
+        for grupo, gastos in self.pendientes.items():
+            estado = self.estados[grupo][1]
+            for fecha, monto, descripcion, categoria in sorted(gastos, key=lambda g: g[0]):
+                estado.agregar(monto, fecha, descripcion, categoria)
+        self.pendientes = {}
+        for id_, estado in self.estados.values():
+            self.db.execute(
+                update(PagoRecurrente)
+                .where(PagoRecurrente.id == id_)
+                .values(**estado.valores())
+                .execution_options(synchronize_session=False)
+            )
+
+
+def registrar_recurrente(db: Session, transaccion: Transaccion):
+    """
+    Actualizar el índice con una transacción recién creada (solo gastos); no hace commit
+    """
+    if transaccion.tipo != TipoTransaccion.GASTO:
+        return
+    indice = IndiceRecurrentes(db)
+    indice.procesar(transaccion.usuario_id, transaccion.descripcion, transaccion.monto,
+                    transaccion.fecha or datetime.utcnow(), transaccion.categoria)
+    indice.guardar()
+
+
+def pagos_recurrentes(db: Session, usuario_id: int, incluir_inactivos: bool = False,
+                      ahora: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Pagos recurrentes del usuario y su costo mensual equivalente
+
+    Un pago queda inactivo si pasa más de `ciclos_inactivo` períodos sin cargo.
+    """
+    ahora = ahora or datetime.utcnow()
+    filas = db.execute(
+        select(
+            PagoRecurrente.descripcion,
+            PagoRecurrente.categoria,
+            PagoRecurrente.periodicidad,
+            PagoRecurrente.monto_medio,
+            PagoRecurrente.ocurrencias,
+            PagoRecurrente.intervalo_medio,
+            PagoRecurrente.ultima_fecha,
+            PagoRecurrente.proxima_fecha
+        )
+        .where(PagoRecurrente.usuario_id == usuario_id, PagoRecurrente.periodicidad.is_not(None))
+        .order_by(PagoRecurrente.monto_medio.desc())
+    ).all()
+
+    pagos: List[Dict[str, Any]] = []
+    total_mensual = 0.0
+    for descripcion, categoria, periodicidad, monto, ocurrencias, intervalo, ultima, proxima in filas:
+        activo = ahora <= ultima + timedelta(days=intervalo * RECURRENTES_CONFIG["ciclos_inactivo"])
+        if not activo and not incluir_inactivos:
+            continue
+        mensual = monto * RECURRENTES_CONFIG["periodos"]["mensual"]["dias"] / intervalo if intervalo else monto
+        if activo:
+            total_mensual += mensual
+        pagos.append({
+            "descripcion": descripcion,
+            "categoria": categoria.value if categoria else None,
+            "periodicidad": periodicidad,
+            "monto": round(monto, 2),
+            "costo_mensual": round(mensual, 2),
+            "ocurrencias": ocurrencias,
+            "ultimo_cargo": ultima.isoformat(),
+            "proximo_cargo": proxima.isoformat() if proxima else None,
+            "activo": activo
+        })
+    return {"pagos": pagos, "total_mensual": round(total_mensual, 2)}
+
+
+def reconstruir_recurrentes(db: Session, usuario_id: Optional[int] = None) -> int:
+    """
+    Recalcular el índice recorriendo los gastos en orden de fecha y confirmar
+
+    Devuelve el número de grupos.
+    """
+    borrar = delete(PagoRecurrente)
+    stmt = (
+        select(Transaccion.usuario_id, Transaccion.descripcion, Transaccion.monto, Transaccion.fecha, Transaccion.categoria)
+        .where(Transaccion.tipo == TipoTransaccion.GASTO, Transaccion.fecha.is_not(None))
+        .order_by(Transaccion.fecha, Transaccion.id)
+        .execution_options(yield_per=RECURRENTES_CONFIG["tamano_bloque"])
+    )
+    if usuario_id is not None:
+        borrar = borrar.where(PagoRecurrente.usuario_id == usuario_id)
+        stmt = stmt.where(Transaccion.usuario_id == usuario_id)
+
+    estados: Dict[ClaveRecurrente, EstadoRecurrente] = {}
+    for particion in db.execute(stmt).partitions():
+        for uid, descripcion, monto, fecha, categoria in particion:
+            clave = normalizar_descripcion(descripcion)
+            if clave is None:
+                continue
+            banda = banda_monto(monto)
+            grupo = _banda_cercana(estados, uid, clave, banda) or (uid, clave, banda)
+            estados.setdefault(grupo, EstadoRecurrente()).agregar(monto, fecha, descripcion, categoria)
+
+    db.execute(borrar)
+    if estados:
+        db.execute(PagoRecurrente.__table__.insert(), [
+            {"usuario_id": uid, "clave": clave, "banda": banda, **estado.valores()}
+            for (uid, clave, banda), estado in estados.items()
+        ])
+    db.commit()
+    recurrentes = sum(1 for estado in estados.values() if estado.valores()["periodicidad"])
+    logger.info(f"✅ Índice de pagos recurrentes reconstruido: {len(estados)} grupos, {recurrentes} recurrentes")
+    return len(estados)
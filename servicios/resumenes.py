@@ -0,0 +1,220 @@
+"""
+Resumen mensual por categoría mantenido de forma incremental
+
+Cada transacción suma su monto en la fila (usuario, año, mes, tipo, categoría)
+dentro de la misma transacción de base de datos que la inserta. Las
+agregaciones de meses completos leen estas filas en lugar de recorrer
+`transacciones`.
+
+Uso para backfill:
+    python -m servicios resumenes [--usuario ID]
+"""
+
+from sqlalchemy import Table, select, delete, func
+from sqlalchemy.orm import Session
+from typing import Dict, Any, Iterable, Optional, Sequence, Tuple
+from datetime import datetime
+import logging
+
+from migraciones import bloquear_esquema
+from models import Transaccion, ResumenMensualCategoria, TipoTransaccion, CategoriaGasto
+
+logger = logging.getLogger(__name__)
+
+# Valor de `categoria` para transacciones sin categoría (los NULL no cuentan en el UNIQUE)
+SIN_CATEGORIA = "sin_categoria"
+
+# (usuario_id, anio, mes, tipo, categoria)
+ClaveResumen = Tuple[int, int, int, TipoTransaccion, str]
+
+
+def clave_categoria(categoria: Optional[CategoriaGasto]) -> str:
+    """
+    Valor almacenado en el resumen para una categoría (o su ausencia)
+    """
+    if categoria is None:
+        return SIN_CATEGORIA
+    return categoria.value if isinstance(categoria, CategoriaGasto) else str(categoria)
+
+
+def _insert_con_conflicto(db: Session):
+    """
+    insert() del dialecto con soporte de ON CONFLICT, o None si no lo tiene
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+
+def insert_ignorar(db: Session, tabla: Table, columnas_unicas: Sequence[str]):
+    """
+    INSERT ... ON CONFLICT DO NOTHING del dialecto sobre `tabla`, o None si no lo soporta
+    """
+    insert = _insert_con_conflicto(db)
+    if insert is None:
+        return None
+    return insert(tabla).on_conflict_do_nothing(index_elements=list(columnas_unicas))
+
+
+def _insert_upsert(db: Session):
+    """
+    Construir el INSERT ... ON CONFLICT del dialecto, o None si no lo soporta
+    """
+    insert = _insert_con_conflicto(db)
+    if insert is None:
+        return None
+    tabla = ResumenMensualCategoria.__table__
+    stmt = insert(tabla)
+    return stmt.on_conflict_do_update(
+        index_elements=["usuario_id", "anio", "mes", "tipo", "categoria"],
+        set_={
+            "total": tabla.c.total + stmt.excluded.total,
+            "cantidad": tabla.c.cantidad + stmt.excluded.cantidad,
+            "actualizado_en": stmt.excluded.actualizado_en
+        }
+    )
+
+
+def acumular_en_resumen(db: Session, movimientos: Iterable[Tuple[int, TipoTransaccion, Optional[CategoriaGasto], datetime, float]]):
+    """
+    Sumar movimientos (usuario_id, tipo, categoria, fecha, monto) al resumen
+
+    Los movimientos se agrupan por fila de resumen antes de escribir, de modo que
+    una importación masiva hace una sola escritura por (mes, tipo, categoría).
+    No hace commit: se confirma junto con las transacciones que lo originan.
+    """
+    grupos: Dict[ClaveResumen, list] = {}
+    for usuario_id, tipo, categoria, fecha, monto in movimientos:
+        agrupar_movimiento(grupos, usuario_id, tipo, categoria, fecha, monto)
+    acumular_grupos_en_resumen(db, grupos)
+
+
+def agrupar_movimiento(grupos: Dict[ClaveResumen, list], usuario_id: int, tipo: TipoTransaccion,
+                       categoria: Optional[CategoriaGasto], fecha: Optional[datetime], monto: float):
+    """
+    Sumar un movimiento a su grupo [total, cantidad] (para acumular_grupos_en_resumen)
+    """
+    fecha = fecha or datetime.utcnow()
+    clave = (usuario_id, fecha.year, fecha.month, tipo, clave_categoria(categoria))
+    acumulado = grupos.setdefault(clave, [0.0, 0])
+    acumulado[0] += float(monto)
+    acumulado[1] += 1
+
+
+def acumular_grupos_en_resumen(db: Session, grupos: Dict[ClaveResumen, list]):
+    """
+    Escribir en el resumen totales ya agrupados: una fila por (mes, tipo, categoría)
+    """
+    if not grupos:
+        return
+
+    ahora = datetime.utcnow()
+    filas = [
+        {
+            "usuario_id": usuario_id, "anio": anio, "mes": mes, "tipo": tipo, "categoria": categoria,
+            "total": total, "cantidad": cantidad, "actualizado_en": ahora
+        }
+        for (usuario_id, anio, mes, tipo, categoria), (total, cantidad) in grupos.items()
+    ]
+
+    upsert = _insert_upsert(db)
+    if upsert is not None:
+        db.execute(upsert, filas)
+        return
+
+    # Dialectos sin ON CONFLICT: leer con bloqueo y actualizar/insertar
+    for fila in filas:
+        existente = db.execute(
+            select(ResumenMensualCategoria).where(
+                ResumenMensualCategoria.usuario_id == fila["usuario_id"],
+                ResumenMensualCategoria.anio == fila["anio"],
+                ResumenMensualCategoria.mes == fila["mes"],
+                ResumenMensualCategoria.tipo == fila["tipo"],
+                ResumenMensualCategoria.categoria == fila["categoria"]
+            ).with_for_update()
+        ).scalar_one_or_none()
+        if existente:
+            existente.total += fila["total"]
+            existente.cantidad += fila["cantidad"]
+        else:
+            db.add(ResumenMensualCategoria(**fila))
+
+
+def registrar_transaccion(db: Session, transaccion: Transaccion):
+    """
+    Sumar una transacción recién creada a su fila de resumen
+    """
+    acumular_en_resumen(db, [(
+        transaccion.usuario_id,
+        transaccion.tipo,
+        transaccion.categoria,
+        transaccion.fecha,
+        transaccion.monto
+    )])
+
+
+def reconstruir_resumenes(db: Session, usuario_id: Optional[int] = None) -> int:
+    """
+    Recalcular el resumen desde `transacciones` (todo o un usuario) y confirmar
+
+    Devuelve el número de filas de resumen generadas.
+    """
+    anio = func.extract("year", Transaccion.fecha)
+    mes = func.extract("month", Transaccion.fecha)
+    stmt = (
+        select(
+            Transaccion.usuario_id,
+            anio,
+            mes,
+            Transaccion.tipo,
+            Transaccion.categoria,
+            func.sum(Transaccion.monto),
+            func.count(Transaccion.id)
+        )
+        .where(Transaccion.fecha.is_not(None))
+        .group_by(Transaccion.usuario_id, anio, mes, Transaccion.tipo, Transaccion.categoria)
+    )
+    borrar = delete(ResumenMensualCategoria)
+    if usuario_id is not None:
+        stmt = stmt.where(Transaccion.usuario_id == usuario_id)
+        borrar = borrar.where(ResumenMensualCategoria.usuario_id == usuario_id)
+
+    ahora = datetime.utcnow()
+    filas = [
+        {
+            "usuario_id": uid, "anio": int(a), "mes": int(m), "tipo": tipo,
+            "categoria": clave_categoria(categoria), "total": float(total or 0.0),
+            "cantidad": cantidad, "actualizado_en": ahora
+        }
+        for uid, a, m, tipo, categoria, total, cantidad in db.execute(stmt)
+    ]
+
+    db.execute(borrar)
+    if filas:
+        db.execute(ResumenMensualCategoria.__table__.insert(), filas)
+    db.commit()
+    logger.info(f"✅ Resumen mensual reconstruido: {len(filas)} filas")
+    return len(filas)
+
+
+def asegurar_resumenes(db: Session) -> bool:
+    """
+    Hacer el backfill si el resumen está vacío pero ya hay transacciones
+
+    Corre al arrancar cada worker: el advisory lock de las migraciones hace
+    que solo uno reconstruya y que los demás, al obtenerlo, ya lo vean lleno.
+    """
+    bloquear_esquema(db.connection())
+    if db.execute(select(ResumenMensualCategoria.id).limit(1)).first() is not None:
+        db.rollback()
+        return False
+    if db.execute(select(Transaccion.id).limit(1)).first() is None:
+        db.rollback()
+        return False
+    reconstruir_resumenes(db)
+    return True
@@ -0,0 +1,15 @@
+"""
+Configuración común de las pruebas: raíz del repositorio en el path y una
+base SQLite temporal en lugar de la base de producción por defecto
+"""
+
+import os
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "pruebas.db"))
+os.environ.setdefault("GOOGLE_API_KEY", "")
@@ -0,0 +1,83 @@
+import random
+import statistics
+
+from servicios.anomalias import EstadoGasto, MedianaP2
+
+
+def test_mediana_exacta_con_pocas_muestras():
+    mediana = MedianaP2()
+    assert mediana.valor is None
+    for x in (5.0, 1.0, 3.0, 2.0):
+        mediana.agregar(x)
+    assert mediana.valor == 2.5
+    assert "muestras" in mediana.estado()
+
+
+def test_mediana_p2_se_aproxima_a_la_real():
+    rng = random.Random(3)
+    datos = [rng.lognormvariate(4, 0.5) for _ in range(5000)]
+    mediana = MedianaP2()
+    for x in datos:
+        mediana.agregar(x)
+    real = statistics.median(datos)
+    assert abs(mediana.valor - real) / real < 0.03
+    assert mediana.n == 5000
+
+
+def test_mediana_p2_restaura_su_estado():
+    original = MedianaP2()
+    for x in range(1, 40):
+        original.agregar(float(x))
+    copia = MedianaP2(original.estado())
+    for x in (100.0, 0.5, 20.0):
+        original.agregar(x)
+        copia.agregar(x)
+    assert copia.valor == original.valor and copia.n == original.n
+
+
+def _estado_con(montos):
+    estado = EstadoGasto()
+    for monto in montos:
+        estado.agregar(monto)
+    return estado
+
+
+def test_welford_coincide_con_media_y_desviacion():
+    montos = [120.0, 80.0, 95.5, 130.0, 101.0, 99.0, 87.0, 110.0, 93.0]
+    estado = _estado_con(montos)
+    assert abs(estado.media - statistics.mean(montos)) < 1e-9
+    assert abs(estado.desviacion - statistics.stdev(montos)) < 1e-9
+
+
+def test_evaluar_requiere_historia_minima():
+    estado = _estado_con([100.0, 102.0, 98.0])
+    assert estado.evaluar(10_000.0) is None
+
+
+def test_evaluar_marca_solo_gastos_por_encima():
+    estado = _estado_con([100.0, 104.0, 97.0, 101.0, 99.0, 103.0, 96.0, 102.0, 98.0, 100.5])
+    inusual = estado.evaluar(400.0)
+    assert inusual is not None and inusual["puntaje"] >= 3.5
+    assert estado.evaluar(101.0) is None
+    assert estado.evaluar(1.0) is None
+
+
+def test_evaluar_usa_z_clasico_si_la_mad_es_cero():
+    estado = _estado_con([100.0] * 9 + [130.0])
+    assert estado.mad.valor == 0
+    inusual = estado.evaluar(200.0)
+    assert inusual is not None and inusual["mad"] == 0
+    assert abs(inusual["puntaje"] - round((200.0 - estado.media) / estado.desviacion, 2)) < 1e-9
+
+
+def test_evaluar_sin_variacion_no_marca():
+    estado = _estado_con([50.0] * 12)
+    assert estado.evaluar(5_000.0) is None
+
+
+def test_estado_sobrevive_al_sketch_guardado():
+    estado = _estado_con([float(x) for x in range(10, 30)])
+    valores = estado.valores()
+    restaurado = EstadoGasto(valores["n"], valores["media"], valores["m2"], valores["sketch"])
+    assert restaurado.mediana.valor == estado.mediana.valor
+    assert restaurado.evaluar(500.0) == estado.evaluar(500.0)
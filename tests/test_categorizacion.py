@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+from models import CategoriaGasto
+from servicios import categorizacion
+from servicios.categorizacion import ModeloCategorias, _columnas, _compilar_trie, categoria_por_palabras_clave
+from servicios.recurrentes import normalizar_descripcion
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _categoria(descripcion):
+    return categoria_por_palabras_clave(normalizar_descripcion(descripcion))
+
+
+@pytest.mark.parametrize("descripcion, esperada", [
+    ("UBER EATS 123", CategoriaGasto.ALIMENTACION),
+    ("UBER *TRIP", CategoriaGasto.TRANSPORTE),
+    ("Gasolinera Pemex", CategoriaGasto.TRANSPORTE),
+    ("Farmacia", CategoriaGasto.SALUD),
+    ("Farmacias Guadalajara", CategoriaGasto.SALUD),
+    ("Pago CFE", CategoriaGasto.SERVICIOS),
+    ("Recibo de gas natural", CategoriaGasto.SERVICIOS),
+    ("Restaurante El Cardenal", CategoriaGasto.ALIMENTACION),
+    ("Tacos El Güero", CategoriaGasto.ALIMENTACION),
+    ("Mercado Libre compra", CategoriaGasto.OTROS),
+])
+def test_palabras_clave_reconocidas(descripcion, esperada):
+    assert _categoria(descripcion) == esperada
+
+
+@pytest.mark.parametrize("descripcion, categoria_erronea", [
+    ("Gastos de oficina", CategoriaGasto.SERVICIOS),
+    ("Aguacates", CategoriaGasto.SERVICIOS),
+    ("Tacones zapateria", CategoriaGasto.ALIMENTACION),
+    ("Superior auto", CategoriaGasto.ALIMENTACION),
+    ("Attendance fee", CategoriaGasto.SERVICIOS),
+    ("Mercado Libre compra", CategoriaGasto.ALIMENTACION),
+    ("Luzma estetica", CategoriaGasto.SERVICIOS),
+])
+def test_palabras_cortas_no_marcan_otras_palabras(descripcion, categoria_erronea):
+    assert _categoria(descripcion) != categoria_erronea
+
+
+def test_trie_distingue_palabra_completa_y_prefijo(monkeypatch):
+    trie = _compilar_trie({"servicios": ["gas"], "transporte": ["gasolin*"]})
+    monkeypatch.setattr(categorizacion, "_TRIE", trie)
+    assert categoria_por_palabras_clave("gas") == CategoriaGasto.SERVICIOS
+    assert categoria_por_palabras_clave("pago gas") == CategoriaGasto.SERVICIOS
+    assert categoria_por_palabras_clave("gastos") is None
+    assert categoria_por_palabras_clave("gasolinera") == CategoriaGasto.TRANSPORTE
+    assert categoria_por_palabras_clave("gasolin") == CategoriaGasto.TRANSPORTE
+    assert categoria_por_palabras_clave("vegas") is None
+
+
+def test_modelo_aprende_las_categorias_del_usuario():
+    modelo = ModeloCategorias()
+    for _ in range(10):
+        modelo.aprender("la comer", CategoriaGasto.ALIMENTACION)
+        modelo.aprender("pago colegio", CategoriaGasto.EDUCACION)
+        modelo.aprender("tienda la comer", CategoriaGasto.ALIMENTACION)
+    assert modelo.ejemplos == 30
+    predicciones = modelo.predecir(["la comer", "colegio", "pago colegio marzo"])
+    assert [p[0] for p in predicciones] == [
+        CategoriaGasto.ALIMENTACION, CategoriaGasto.EDUCACION, CategoriaGasto.EDUCACION
+    ]
+    assert all(0.5 < p[1] <= 1.0 for p in predicciones)
+    assert modelo.predecir([]) == []
+
+
+def test_modelo_se_actualiza_tras_aprender():
+    modelo = ModeloCategorias()
+    modelo.aprender("gym fit", CategoriaGasto.SALUD)
+    antes = modelo.predecir(["gym fit"])[0][1]
+    for _ in range(5):
+        modelo.aprender("gym fit", CategoriaGasto.SALUD)
+    assert modelo.predecir(["gym fit"])[0][1] > antes
+
+
+def test_columnas_estables_entre_procesos():
+    import subprocess
+    import sys
+
+    codigo = "from servicios.categorizacion import _columnas; print(_columnas('pago netflix mensual'))"
+    salidas = {
+        subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True,
+                       env={**os.environ, "PYTHONHASHSEED": semilla}, cwd=RAIZ).stdout.strip().splitlines()[-1]
+        for semilla in ("1", "2")
+    }
+    assert salidas == {str(_columnas("pago netflix mensual"))}
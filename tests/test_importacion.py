@@ -0,0 +1,59 @@
+import asyncio
+
+from pydantic import BaseModel, Field
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from typing import Optional
+from datetime import datetime
+
+from migraciones import aplicar_migraciones
+from models import Transaccion, TipoTransaccion, CategoriaGasto, Usuario, ResumenMensualCategoria
+from servicios.importacion import importar_transacciones
+
+
+class FilaPrueba(BaseModel):
+    usuario_id: int
+    tipo: TipoTransaccion
+    categoria: Optional[CategoriaGasto] = None
+    monto: float = Field(..., gt=0)
+    descripcion: Optional[str] = None
+    fecha: Optional[datetime] = None
+
+
+async def _stream(texto, trozo=7):
+    datos = texto.encode("utf-8")
+    for i in range(0, len(datos), trozo):
+        yield datos[i:i + trozo]
+
+
+def test_importacion_con_sesion_asincrona(tmp_path):
+    ruta = tmp_path / "importacion.db"
+    aplicar_migraciones(create_engine(f"sqlite:///{ruta}"))
+    motor = create_async_engine(f"sqlite+aiosqlite:///{ruta}")
+    Sesion = async_sessionmaker(bind=motor, expire_on_commit=False)
+    csv = (
+        "tipo,categoria,monto,descripcion,fecha\n"
+        "gasto,alimentacion,120.5,Super,2025-01-03T10:00:00\n"
+        "gasto,transporte,-3,Negativo,2025-01-04T10:00:00\n"
+        "ingreso,,1000,Nomina,2025-01-05T10:00:00\n"
+        "gasto,alimentacion,79.5,Super,2025-01-10T10:00:00\n"
+    )
+
+    async def escenario():
+        async with Sesion() as db:
+            usuario = Usuario(nombre="Ana", email="ana@example.com", password_hash="x")
+            db.add(usuario)
+            await db.commit()
+            resultado = await importar_transacciones(db, usuario.id, _stream(csv), "csv", FilaPrueba)
+            total = await db.scalar(select(func.count()).select_from(Transaccion))
+            resumen = await db.scalar(
+                select(ResumenMensualCategoria.total).where(ResumenMensualCategoria.categoria == "alimentacion")
+            )
+        await motor.dispose()
+        return resultado, total, resumen
+
+    resultado, total, resumen = asyncio.run(escenario())
+    assert resultado["importadas"] == 3
+    assert resultado["rechazadas"] == 1 and resultado["errores"][0]["linea"] == 3
+    assert total == 3
+    assert resumen == 200.0
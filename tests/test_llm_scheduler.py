@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from agentes import llm_scheduler
+from agentes.llm_scheduler import LLMScheduler, TokenBucket
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(llm_scheduler.time, "monotonic", reloj)
+    return reloj
+
+
+def test_token_bucket_se_repone_con_el_tiempo(reloj):
+    bucket = TokenBucket(capacity=10, refill_per_second=2)
+    bucket.consume(10)
+    assert bucket.time_until(4) == pytest.approx(2.0)
+
+    reloj.ahora += 1.0
+    assert bucket.time_until(4) == pytest.approx(1.0)
+
+    reloj.ahora += 1.0
+    assert bucket.time_until(4) == 0.0
+
+
+def test_token_bucket_no_supera_la_capacidad(reloj):
+    bucket = TokenBucket(capacity=5, refill_per_second=1)
+    reloj.ahora += 100
+    bucket.consume(5)
+    assert bucket.time_until(1) == pytest.approx(1.0)
+
+
+def test_token_bucket_drain_tras_429(reloj):
+    bucket = TokenBucket(capacity=5, refill_per_second=1)
+    bucket.drain()
+    assert bucket.time_until(1) == pytest.approx(1.0)
+
+
+def _scheduler(max_wait: float = 5.0) -> LLMScheduler:
+    return LLMScheduler(
+        quotas={"modelo": {"rpm": 1, "tpm": 1_000_000}},
+        default_quota={"rpm": 1, "tpm": 1_000_000},
+        max_wait_seconds=max_wait
+    )
+
+
+def test_despacho_por_prioridad_y_orden_de_llegada():
+    async def escenario():
+        scheduler = _scheduler()
+        # Consumir la única petición disponible: todo lo demás queda en cola
+        await scheduler.acquire("modelo", 1, 10)
+        orden = []
+
+        async def pedir(nombre, prioridad):
+            await scheduler.acquire("modelo", prioridad, 10)
+            orden.append(nombre)
+
+        tareas = [
+            asyncio.create_task(pedir("baja", 3)),
+            asyncio.create_task(pedir("alta-1", 1)),
+            asyncio.create_task(pedir("media", 2)),
+            asyncio.create_task(pedir("alta-2", 1)),
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.get_stats()["modelo"]["queue_depth"] == 4
+
+        estado = scheduler._models["modelo"]
+        for _ in tareas:
+            estado.requests.tokens = 1
+            scheduler._pump("modelo")
+            await asyncio.sleep(0)
+        await asyncio.gather(*tareas)
+        if estado.timer is not None:
+            estado.timer.cancel()
+        return orden
+
+    assert asyncio.run(escenario()) == ["alta-1", "alta-2", "media", "baja"]
+
+
+def test_espera_agotada_sin_cuota():
+    async def escenario():
+        scheduler = _scheduler(max_wait=0.05)
+        await scheduler.acquire("modelo", 1, 10)
+        with pytest.raises(asyncio.TimeoutError):
+            await scheduler.acquire("modelo", 1, 10)
+        estado = scheduler._models["modelo"]
+        if estado.timer is not None:
+            estado.timer.cancel()
+        return scheduler.get_stats()["modelo"]
+
+    stats = asyncio.run(escenario())
+    assert stats["timeouts"] == 1
+    assert stats["queue_depth"] == 0
+    assert stats["dispatched"] == 1
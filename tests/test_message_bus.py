@@ -0,0 +1,157 @@
+import asyncio
+
+import pytest
+
+from agentes import message_bus
+
+
+class AgenteFalso:
+    def __init__(self, demora: float = 0.0):
+        self.demora = demora
+        self.recibidos = []
+        self.liberar = None
+
+    async def receive_message(self, message):
+        self.recibidos.append(message["type"])
+        if self.liberar is not None:
+            await self.liberar.wait()
+        await asyncio.sleep(self.demora)
+        return {"status": "ok", "type": message["type"]}
+
+
+@pytest.fixture(autouse=True)
+def bus_limpio():
+    message_bus._AGENTS.clear()
+    message_bus._MAILBOXES.clear()
+    yield
+    message_bus._AGENTS.clear()
+    message_bus._MAILBOXES.clear()
+
+
+def _mensaje(tipo: str, to: str = "B", sender: str = "A"):
+    return {"from": sender, "to": to, "protocol": "ACP", "type": tipo, "content": {}}
+
+
+def test_deliver_devuelve_la_respuesta_del_agente():
+    async def escenario():
+        message_bus.register_agent("B", AgenteFalso(), workers=1, mailbox_size=4)
+        await message_bus.start()
+        try:
+            return await message_bus.deliver(_mensaje("PING"))
+        finally:
+            await message_bus.stop()
+
+    assert asyncio.run(escenario()) == {"status": "ok", "type": "PING"}
+
+
+def test_post_descarta_con_el_buzon_lleno():
+    async def escenario():
+        agente = AgenteFalso()
+        agente.liberar = asyncio.Event()
+        message_bus.register_agent("B", agente, workers=1, mailbox_size=2)
+        await message_bus.start()
+        try:
+            aceptados = [message_bus.post(_mensaje(f"M{i}")) for i in range(2)]
+            while not agente.recibidos:  # el worker toma M0 y queda bloqueado
+                await asyncio.sleep(0)
+            aceptados += [message_bus.post(_mensaje(f"M{i}")) for i in range(2, 5)]
+            stats = message_bus.get_stats()["B"]
+            agente.liberar.set()
+            await message_bus._MAILBOXES["B"].queue.join()
+            return aceptados, stats, agente.recibidos
+        finally:
+            await message_bus.stop()
+
+    aceptados, stats, recibidos = asyncio.run(escenario())
+    # M0 en servicio, M1 y M2 ocupan el buzón de 2; M3 y M4 se descartan
+    assert aceptados == [True, True, True, False, False]
+    assert stats["dropped"] == 2
+    assert stats["posted"] == 3
+    assert recibidos == ["M0", "M1", "M2"]
+
+
+def test_deliver_expira_y_el_mensaje_no_se_procesa(monkeypatch):
+    monkeypatch.setitem(message_bus.BUS_CONFIG, "timeout_entrega_segundos", 0.05)
+
+    async def escenario():
+        agente = AgenteFalso()
+        agente.liberar = asyncio.Event()
+        message_bus.register_agent("B", agente, workers=1, mailbox_size=4)
+        await message_bus.start()
+        try:
+            primero = asyncio.create_task(message_bus.deliver(_mensaje("LENTO")))
+            while not agente.recibidos:
+                await asyncio.sleep(0)
+            respuesta = await message_bus.deliver(_mensaje("EN_COLA"))
+            agente.liberar.set()
+            await primero
+            await message_bus._MAILBOXES["B"].queue.join()
+            return respuesta, message_bus.get_stats()["B"], agente.recibidos
+        finally:
+            await message_bus.stop()
+
+    respuesta, stats, recibidos = asyncio.run(escenario())
+    assert respuesta == {"status": "error", "error": "timeout", "agent": "B"}
+    assert stats["timeouts"] >= 1
+    # El llamador abandonó EN_COLA antes de que un worker lo tomara
+    assert "EN_COLA" not in recibidos
+
+
+def test_deliver_con_buzon_lleno_no_bloquea(monkeypatch):
+    monkeypatch.setitem(message_bus.BUS_CONFIG, "timeout_entrega_segundos", 0.05)
+
+    async def escenario():
+        agente = AgenteFalso()
+        agente.liberar = asyncio.Event()
+        message_bus.register_agent("B", agente, workers=1, mailbox_size=1)
+        await message_bus.start()
+        try:
+            assert message_bus.post(_mensaje("M0"))
+            while not agente.recibidos:
+                await asyncio.sleep(0)
+            assert message_bus.post(_mensaje("M1"))
+            # Buzón lleno: el timeout de entrega también acota la espera por sitio
+            respuesta = await asyncio.wait_for(message_bus.deliver(_mensaje("BLOQUEADO")), timeout=1.0)
+            agente.liberar.set()
+            await message_bus._MAILBOXES["B"].queue.join()
+            return respuesta, message_bus.get_stats()["B"], agente.recibidos
+        finally:
+            await message_bus.stop()
+
+    respuesta, stats, recibidos = asyncio.run(escenario())
+    assert respuesta == {"status": "error", "error": "mailbox_full", "agent": "B"}
+    assert stats["dropped"] == 1
+    assert recibidos == ["M0", "M1"]
+
+
+def test_mensaje_a_si_mismo_no_pasa_por_el_buzon():
+    class AgenteReentrante(AgenteFalso):
+        async def receive_message(self, message):
+            self.recibidos.append(message["type"])
+            if message["type"] == "EXTERNO":
+                # Con un único worker ocupado, pasar por el buzón sería un interbloqueo
+                return await message_bus.deliver(_mensaje("INTERNO", to="B", sender="B"))
+            return {"status": "ok", "type": message["type"]}
+
+    async def escenario():
+        agente = AgenteReentrante()
+        message_bus.register_agent("B", agente, workers=1, mailbox_size=1)
+        await message_bus.start()
+        try:
+            respuesta = await asyncio.wait_for(message_bus.deliver(_mensaje("EXTERNO")), timeout=1.0)
+            return respuesta, agente.recibidos
+        finally:
+            await message_bus.stop()
+
+    respuesta, recibidos = asyncio.run(escenario())
+    assert respuesta == {"status": "ok", "type": "INTERNO"}
+    assert recibidos == ["EXTERNO", "INTERNO"]
+
+
+def test_destinatario_desconocido():
+    async def escenario():
+        return await message_bus.deliver(_mensaje("X", to="Nadie")), message_bus.post(_mensaje("X", to="Nadie"))
+
+    respuesta, aceptado = asyncio.run(escenario())
+    assert respuesta["error"] == "agent_not_found"
+    assert aceptado is False
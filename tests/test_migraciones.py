@@ -0,0 +1,64 @@
+import importlib
+
+from sqlalchemy import create_engine, inspect
+
+import models  # noqa: F401  (registra los modelos en Base.metadata)
+from database import Base
+from migraciones import aplicar_migraciones
+
+
+def _motor(tmp_path, nombre):
+    return create_engine(f"sqlite:///{tmp_path / nombre}")
+
+
+def test_esquema_inicial_no_incluye_cambios_posteriores(tmp_path):
+    motor = _motor(tmp_path, "base.db")
+    inicial = importlib.import_module("migraciones.versiones.0001_esquema_inicial")
+    with motor.begin() as conn:
+        inicial.upgrade(conn)
+    inspector = inspect(motor)
+    columnas_usuarios = {c["name"] for c in inspector.get_columns("usuarios")}
+    columnas_transacciones = {c["name"] for c in inspector.get_columns("transacciones")}
+    assert "password_hash" not in columnas_usuarios
+    assert "categoria_automatica" not in columnas_transacciones
+    assert not inspector.has_table("pagos_recurrentes")
+    assert not inspector.has_table("resumen_mensual_categoria")
+
+
+def test_base_nueva_migrada_coincide_con_los_modelos(tmp_path):
+    motor = _motor(tmp_path, "migrada.db")
+    aplicadas = aplicar_migraciones(motor)
+    assert aplicadas == sorted(aplicadas) and aplicadas[0] == "0001"
+
+    referencia = _motor(tmp_path, "modelos.db")
+    Base.metadata.create_all(referencia)
+
+    migrada, esperada = inspect(motor), inspect(referencia)
+    for tabla in Base.metadata.tables:
+        assert migrada.has_table(tabla), tabla
+        assert ({c["name"] for c in migrada.get_columns(tabla)}
+                == {c["name"] for c in esperada.get_columns(tabla)}), tabla
+        indices_migrada = {i["name"] for i in migrada.get_indexes(tabla)}
+        indices_migrada |= {u["name"] for u in migrada.get_unique_constraints(tabla)}
+        indices_esperados = {i["name"] for i in esperada.get_indexes(tabla)}
+        indices_esperados |= {u["name"] for u in esperada.get_unique_constraints(tabla)}
+        assert indices_esperados <= indices_migrada, tabla
+
+
+def test_migraciones_son_idempotentes(tmp_path):
+    motor = _motor(tmp_path, "dos_veces.db")
+    assert aplicar_migraciones(motor)
+    assert aplicar_migraciones(motor) == []
+
+
+def test_versiones_no_dependen_de_los_modelos():
+    import os
+    import re
+
+    import migraciones.runner as runner
+
+    for archivo in sorted(os.listdir(runner._VERSIONES_DIR)):
+        if runner._PATRON_MODULO.match(archivo):
+            with open(os.path.join(runner._VERSIONES_DIR, archivo), encoding="utf-8") as f:
+                codigo = f.read()
+            assert not re.search(r"^\s*(from models |import models)", codigo, re.MULTILINE), archivo
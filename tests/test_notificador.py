@@ -0,0 +1,47 @@
+import asyncio
+
+from agentes.notificador_agent import NotificadorAgent
+
+
+class EscritorFalso:
+    def __init__(self):
+        self.filas = []
+
+    def encolar(self, fila, prioritaria=False):
+        self.filas.append(fila)
+        return True
+
+
+def _agente(monkeypatch):
+    agente = NotificadorAgent()
+    agente.alert_writer = EscritorFalso()
+
+    async def generar(prompt, temperature=0.6):
+        return '{"titulo": "Aviso", "mensaje": "Texto", "nivel": "warning", "recomendacion": "Revisar"}'
+
+    async def enviar(**kwargs):
+        return {"status": "sent"}
+
+    monkeypatch.setattr(agente, "agenerate_with_ai", generar)
+    monkeypatch.setattr(agente, "send_message", enviar)
+    return agente
+
+
+def test_tarea_del_planificador_no_crea_alerta_pendiente(monkeypatch):
+    agente = _agente(monkeypatch)
+    respuesta = asyncio.run(agente.process_message({
+        "type": "EXECUTE_TASK",
+        "content": {"task": {"tipo": "generar_alertas", "usuario_id": 7}}
+    }))
+    assert respuesta["persistida"] is False
+    assert agente.alert_writer.filas == []
+
+
+def test_alerta_de_presupuesto_se_persiste(monkeypatch):
+    agente = _agente(monkeypatch)
+    respuesta = asyncio.run(agente.process_message({
+        "type": "ALERT_REQUIRED",
+        "content": {"usuario_id": 7, "tipo": "presupuesto_cerca_limite", "datos": {"porcentaje": 95}}
+    }))
+    assert respuesta["persistida"] is True
+    assert [f["usuario_id"] for f in agente.alert_writer.filas] == [7]
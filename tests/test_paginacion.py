@@ -0,0 +1,58 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from migraciones import aplicar_migraciones
+from models import Transaccion, TipoTransaccion, Usuario
+from servicios.paginacion import CursorInvalido, apaginar, codificar_cursor, decodificar_cursor
+
+
+def test_cursor_ida_y_vuelta():
+    valores = (datetime(2025, 3, 1, 12, 30), 42)
+    assert decodificar_cursor(codificar_cursor(valores), 2) == valores
+    assert decodificar_cursor(codificar_cursor((None, 7)), 2) == (None, 7)
+
+
+@pytest.mark.parametrize("cursor", ["no-es-base64!", codificar_cursor([1])])
+def test_cursor_invalido(cursor):
+    with pytest.raises(CursorInvalido):
+        decodificar_cursor(cursor, 2)
+
+
+def test_paginas_incluyen_filas_con_fecha_nula(tmp_path):
+    ruta = tmp_path / "paginacion.db"
+    motor_sync = create_engine(f"sqlite:///{ruta}")
+    aplicar_migraciones(motor_sync)
+    base = datetime(2025, 1, 1)
+    fechas = [base + timedelta(days=i) for i in range(4)] + [None, None, None]
+    with motor_sync.begin() as conn:
+        conn.execute(insert(Usuario), {"id": 1, "nombre": "Ana", "email": "ana@example.com", "password_hash": "x"})
+        conn.execute(insert(Transaccion), [
+            {"usuario_id": 1, "tipo": TipoTransaccion.GASTO, "monto": 10.0 + i, "fecha": fecha}
+            for i, fecha in enumerate(fechas)
+        ])
+    motor = create_async_engine(f"sqlite+aiosqlite:///{ruta}")
+    Sesion = async_sessionmaker(bind=motor)
+    columnas = [Transaccion.fecha, Transaccion.id]
+
+    async def recorrer():
+        vistos, cursor = [], None
+        async with Sesion() as db:
+            while True:
+                items, cursor = await apaginar(db, select(Transaccion), columnas, cursor, 2)
+                vistos.extend((t.fecha, t.id) for t in items)
+                if cursor is None:
+                    break
+        await motor.dispose()
+        return vistos
+
+    vistos = asyncio.run(recorrer())
+    assert len(vistos) == 7 and len({i for _, i in vistos}) == 7
+    # Más recientes primero, las filas sin fecha al final ordenadas por id
+    assert [f for f, _ in vistos[:4]] == sorted(fechas[:4], reverse=True)
+    assert [f for f, _ in vistos[4:]] == [None, None, None]
+    assert [i for _, i in vistos[4:]] == [7, 6, 5]
@@ -0,0 +1,87 @@
+import asyncio
+
+from agentes.plan_executor import execute_plan, _find_cyclic
+
+
+def _ejecutar(subtareas, dispatch, timeout=1.0, max_concurrency=None):
+    return asyncio.run(execute_plan(subtareas, dispatch, timeout, max_concurrency))
+
+
+def test_find_cyclic_detecta_ciclos_y_sus_dependientes():
+    subtareas = [
+        {"id": 1},
+        {"id": 2, "depends_on": [3]},
+        {"id": 3, "depends_on": [2]},
+        {"id": 4, "depends_on": [3]},
+        {"id": 5, "depends_on": [1]},
+    ]
+    assert _find_cyclic(subtareas) == {2, 3, 4}
+
+
+def test_subtareas_en_ciclo_no_se_despachan():
+    despachadas = []
+
+    async def dispatch(tarea, deps):
+        despachadas.append(tarea["id"])
+        return {"status": "success"}
+
+    resultados = _ejecutar(
+        [{"id": 1}, {"id": 2, "depends_on": [3]}, {"id": 3, "depends_on": [2]}],
+        dispatch
+    )
+    assert despachadas == [1]
+    assert [r["response"]["status"] for r in resultados] == ["success", "error", "error"]
+    assert resultados[1]["response"]["error"] == "dependencia_ciclica"
+
+
+def test_depends_on_ordena_y_pasa_resultados():
+    eventos = []
+
+    async def dispatch(tarea, deps):
+        eventos.append(("inicio", tarea["id"]))
+        await asyncio.sleep(0.03 if tarea["id"] == 1 else 0.01)
+        eventos.append(("fin", tarea["id"]))
+        return {"status": "success", "id": tarea["id"], "deps": sorted(deps)}
+
+    resultados = _ejecutar(
+        [{"id": 1}, {"id": 2}, {"id": 3, "depends_on": [1, 2]}],
+        dispatch
+    )
+    # 1 y 2 arrancan juntas; 3 solo cuando ambas terminaron
+    assert eventos[:2] == [("inicio", 1), ("inicio", 2)]
+    assert eventos.index(("inicio", 3)) > eventos.index(("fin", 1))
+    assert resultados[2]["response"]["deps"] == [1, 2]
+    # Resultados en el orden original del plan
+    assert [r["tarea"]["id"] for r in resultados] == [1, 2, 3]
+
+
+def test_timeout_por_subtarea_y_dependiente_omitida():
+    async def dispatch(tarea, deps):
+        await asyncio.sleep(0.5 if tarea["id"] == 1 else 0.0)
+        return {"status": "success"}
+
+    resultados = _ejecutar(
+        [{"id": 1, "timeout_segundos": 0.05}, {"id": 2, "depends_on": [1]}, {"id": 3}],
+        dispatch,
+        timeout=5.0
+    )
+    assert resultados[0]["response"] == {"status": "error", "error": "timeout", "timeout_segundos": 0.05}
+    assert resultados[1]["response"]["status"] == "skipped"
+    assert resultados[1]["response"]["dependencia"] == 1
+    assert resultados[2]["response"]["status"] == "success"
+
+
+def test_max_concurrency_limita_despachos_simultaneos():
+    activas = 0
+    maximo = 0
+
+    async def dispatch(tarea, deps):
+        nonlocal activas, maximo
+        activas += 1
+        maximo = max(maximo, activas)
+        await asyncio.sleep(0.01)
+        activas -= 1
+        return {"status": "success"}
+
+    _ejecutar([{"id": i} for i in range(1, 7)], dispatch, max_concurrency=2)
+    assert maximo == 2
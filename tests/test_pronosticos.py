@@ -0,0 +1,42 @@
+import numpy as np
+
+from servicios.pronosticos import suavizar
+
+
+def _estacional(meses, base=100.0, pendiente=0.0, amplitud=10.0):
+    t = np.arange(meses)
+    return base + pendiente * t + amplitud * np.sin(2 * np.pi * t / 12)
+
+
+def test_holt_winters_aprende_la_estacionalidad():
+    r = suavizar(_estacional(36)[None, :], np.array([0]), 3)
+    assert r["estacional"][0]
+    np.testing.assert_allclose(r["pronostico"][0], [100.0, 105.0, 108.66], atol=0.05)
+
+
+def test_holt_winters_con_tendencia():
+    r = suavizar(_estacional(36, base=200.0, pendiente=3.0, amplitud=20.0)[None, :], np.array([0]), 3)
+    np.testing.assert_allclose(r["pronostico"][0], [308.0, 321.0, 331.32], atol=0.05)
+
+
+def test_holt_sin_estacionalidad_con_historia_corta():
+    serie = np.r_[np.zeros(20), 50 + 2 * np.arange(16)]
+    r = suavizar(serie[None, :], np.array([20]), 3)
+    assert not r["estacional"][0] and r["n"][0] == 16
+    np.testing.assert_allclose(r["pronostico"][0], [82.0, 84.0, 86.0], atol=0.1)
+
+
+def test_intervalo_crece_con_el_horizonte():
+    ruido = np.random.default_rng(7).normal(0, 5, 36)
+    r = suavizar((_estacional(36) + ruido)[None, :], np.array([0]), 14)
+    amplitud = r["superior"][0] - r["inferior"][0]
+    assert r["sigma"][0] > 0
+    assert np.all(np.diff(amplitud) >= 0)
+    assert np.all(r["inferior"][0] <= r["pronostico"][0])
+
+
+def test_series_sin_historia_y_varias_filas_a_la_vez():
+    matriz = np.vstack([_estacional(36), np.zeros(36)])
+    r = suavizar(matriz, np.array([0, 36]), 2)
+    np.testing.assert_allclose(r["pronostico"][0], [100.0, 105.0], atol=0.05)
+    assert np.all(r["pronostico"][1] == 0)
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+from servicios.recurrentes import (
+    EstadoRecurrente, banda_monto, clasificar_periodicidad, normalizar_descripcion
+)
+
+
+def test_normalizar_descripcion():
+    assert normalizar_descripcion("NETFLIX.COM 12/03 #4471") == "netflix com"
+    assert normalizar_descripcion("Café Ñandú") == "cafe nandu"
+    assert normalizar_descripcion("x 123 #") is None
+    assert normalizar_descripcion(None) is None
+    assert normalizar_descripcion("uno dos tres cuatro cinco seis siete") == "uno dos tres cuatro cinco seis"
+
+
+def test_banda_monto_agrupa_importes_cercanos():
+    assert banda_monto(110.0) == banda_monto(115.0)
+    assert banda_monto(100.0) != banda_monto(130.0)
+    assert banda_monto(0) == banda_monto(0.01)
+    assert banda_monto(10.0) < banda_monto(100.0)
+
+
+def test_clasificar_periodicidad():
+    assert clasificar_periodicidad(4, 3, 30.0, 2.0) == "mensual"
+    assert clasificar_periodicidad(5, 4, 7.2, 0.5) == "semanal"
+    assert clasificar_periodicidad(2, 1, 366.0, 0.0) == "anual"
+    # Pocas ocurrencias, intervalos irregulares o sin intervalos
+    assert clasificar_periodicidad(2, 1, 30.0, 0.0) is None
+    assert clasificar_periodicidad(6, 5, 30.0, 4 * 100.0) is None
+    assert clasificar_periodicidad(1, 0, None, 0.0) is None
+
+
+def test_estado_recurrente_detecta_suscripcion_mensual():
+    estado = EstadoRecurrente()
+    inicio = datetime(2025, 1, 5)
+    for mes in range(4):
+        estado.agregar(199.0, inicio + timedelta(days=30 * mes), "Netflix", None)
+    valores = estado.valores()
+    assert valores["periodicidad"] == "mensual"
+    assert valores["intervalo_medio"] == 30.0
+    assert valores["proxima_fecha"] == inicio + timedelta(days=120)
+
+
+def test_estado_recurrente_cargo_anterior_a_la_primera_fecha():
+    estado = EstadoRecurrente()
+    estado.agregar(50.0, datetime(2025, 3, 1), "Gym", None)
+    estado.agregar(50.0, datetime(2025, 3, 8), "Gym", None)
+    estado.agregar(50.0, datetime(2025, 2, 22), "Gym", None)
+    assert estado.primera_fecha == datetime(2025, 2, 22)
+    assert estado.intervalos == 2 and estado.intervalo_medio == 7.0
+    assert estado.valores()["periodicidad"] == "semanal"
+
+
+def test_cargo_duplicado_el_mismo_dia_no_rompe_la_periodicidad():
+    estado = EstadoRecurrente()
+    inicio = datetime(2025, 1, 5, 9, 0)
+    for mes in range(3):
+        estado.agregar(199.0, inicio + timedelta(days=30 * mes), "Netflix", None)
+    # La última fila importada dos veces, y la primera también
+    estado.agregar(199.0, inicio + timedelta(days=60, hours=2), "Netflix", None)
+    estado.agregar(199.0, inicio, "Netflix", None)
+    assert estado.ocurrencias == 3
+    assert estado.intervalos == 2 and estado.intervalo_medio == 30.0
+    assert estado.valores()["periodicidad"] == "mensual"
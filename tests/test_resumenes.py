@@ -0,0 +1,33 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from migraciones import aplicar_migraciones
+from models import ResumenMensualCategoria, TipoTransaccion, CategoriaGasto, Transaccion, Usuario
+from servicios.resumenes import asegurar_resumenes
+
+
+def test_asegurar_resumenes_reconstruye_una_sola_vez(tmp_path):
+    motor = create_engine(f"sqlite:///{tmp_path / 'resumenes.db'}")
+    aplicar_migraciones(motor)
+    Sesion = sessionmaker(bind=motor)
+
+    with Sesion() as db:
+        assert asegurar_resumenes(db) is False
+
+    with motor.begin() as conn:
+        conn.execute(insert(Usuario), {"id": 1, "nombre": "Ana", "email": "ana@example.com", "password_hash": "x"})
+        conn.execute(insert(Transaccion), [
+            {"usuario_id": 1, "tipo": TipoTransaccion.GASTO, "categoria": CategoriaGasto.SALUD,
+             "monto": monto, "fecha": datetime(2025, 2, dia)}
+            for dia, monto in ((3, 40.0), (17, 60.0))
+        ])
+
+    with Sesion() as db:
+        assert asegurar_resumenes(db) is True
+    with Sesion() as db:
+        # Ya lleno: otro worker que llegue después no vuelve a reconstruir
+        assert asegurar_resumenes(db) is False
+        filas = db.execute(select(ResumenMensualCategoria.total, ResumenMensualCategoria.cantidad)).all()
+    assert [tuple(f) for f in filas] == [(100.0, 2)]
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from agentes.single_flight import SingleFlight
+
+
+def test_llamadas_concurrentes_con_la_misma_clave_se_coalescen():
+    async def escenario():
+        sf = SingleFlight()
+        llamadas = 0
+
+        async def llamar():
+            nonlocal llamadas
+            llamadas += 1
+            await asyncio.sleep(0.02)
+            return "respuesta"
+
+        resultados = await asyncio.gather(*(sf.do("clave", llamar) for _ in range(5)))
+        return sf, llamadas, resultados
+
+    sf, llamadas, resultados = asyncio.run(escenario())
+    assert llamadas == 1
+    assert resultados == ["respuesta"] * 5
+    assert sf.get_stats() == {"leaders": 1, "followers": 4, "in_flight": 0}
+
+
+def test_claves_distintas_no_se_coalescen():
+    async def escenario():
+        sf = SingleFlight()
+
+        async def llamar(valor):
+            await asyncio.sleep(0.01)
+            return valor
+
+        return await asyncio.gather(sf.do("a", lambda: llamar(1)), sf.do("b", lambda: llamar(2)))
+
+    assert asyncio.run(escenario()) == [1, 2]
+
+
+def test_cancelar_un_llamador_no_cancela_a_los_demas():
+    async def escenario():
+        sf = SingleFlight()
+        liberar = asyncio.Event()
+
+        async def llamar():
+            await liberar.wait()
+            return "ok"
+
+        lider = asyncio.create_task(sf.do("clave", llamar))
+        seguidor = asyncio.create_task(sf.do("clave", llamar))
+        await asyncio.sleep(0)
+        lider.cancel()
+        await asyncio.sleep(0)
+        liberar.set()
+        resultado = await seguidor
+        with pytest.raises(asyncio.CancelledError):
+            await lider
+        return resultado
+
+    assert asyncio.run(escenario()) == "ok"
+
+
+def test_la_excepcion_llega_a_todos_y_la_clave_se_libera():
+    async def escenario():
+        sf = SingleFlight()
+
+        async def fallar():
+            await asyncio.sleep(0.01)
+            raise ValueError("fallo")
+
+        resultados = await asyncio.gather(sf.do("k", fallar), sf.do("k", fallar), return_exceptions=True)
+
+        async def reintentar():
+            return "recuperado"
+
+        # Tras terminar, la misma clave lanza una llamada nueva
+        return resultados, await sf.do("k", reintentar)
+
+    resultados, reintento = asyncio.run(escenario())
+    assert all(isinstance(r, ValueError) for r in resultados)
+    assert reintento == "recuperado"